@@ -0,0 +1,273 @@
+import asyncio
+import math
+import random
+import re
+from audiolibro_mp3 import parse_frame_header, silent_frame
+
+# --- Constantes ---
+DEFAULT_BACKEND = "edge-tts"
+EDGE_TTS_FRAME_HEADER = 0xFFF364C4  # MPEG-2 capa III, 24 kHz, 48 kbps, mono: el formato de edge-tts
+
+def rate_factor(rate: str) -> float:
+    """Factor de velocidad de un ajuste como '-5%' o '+20%': la duración del audio se divide por él."""
+    match = re.fullmatch(r"([+-]\d+)%", rate.strip()) if rate else None
+    return max(0.1, 1 + int(match.group(1)) / 100) if match else 1.0
+
+class BackendError(Exception):
+    """El motor de síntesis no pudo generar el audio (error del servicio, límite de uso, etc.)."""
+
+class NoSpeechError(BackendError):
+    """El texto no contiene nada pronunciable; no es un fallo real del servicio."""
+
+class SynthesisBackend:
+    """Interfaz común de los motores de síntesis.
+
+    Un motor sintetiza texto a un archivo MP3, lista sus voces y, si `supports_boundaries`,
+    informa del instante de cada palabra mientras sintetiza. `version` identifica el motor y la
+    versión de su audio; forma parte de la clave de la caché de síntesis.
+    """
+
+    name = ""
+    supports_boundaries = False
+
+    @property
+    def version(self) -> str:
+        return self.name
+
+    async def synthesize(self, text: str, voice: str, rate: str, output_path: str, on_boundary=None):
+        """Escribe en `output_path` el audio de `text`.
+
+        Si se indica `on_boundary` y el motor lo admite, se llama con (desplazamiento_s,
+        duración_s, palabra) por cada palabra. Lanza NoSpeechError si no hay nada que pronunciar
+        y BackendError (u otra excepción) si falla.
+        """
+        raise NotImplementedError
+
+    async def list_voices(self) -> list[dict]:
+        """Devuelve las voces disponibles como diccionarios con ShortName, Gender y Locale."""
+        raise NotImplementedError
+
+    async def open(self, concurrency: int = 1):
+        """Prepara los recursos compartidos (conexiones) para `concurrency` síntesis simultáneas.
+
+        Se puede llamar varias veces; quien abre el motor debe cerrarlo con close().
+        """
+
+    async def close(self):
+        """Libera los recursos abiertos por open()."""
+
+class EdgeTTSBackend(SynthesisBackend):
+    """Servicio de lectura en voz alta de Microsoft Edge, a través de la librería edge-tts."""
+
+    name = "edge-tts"
+    supports_boundaries = True
+
+    def __init__(self, pooled: int = 1):
+        # Con el motor abierto (open), los fragmentos reutilizan conexiones websocket en lugar de
+        # pagar una conexión nueva (TCP, TLS y handshake) cada uno. pooled=0 vuelve a una por fragmento,
+        # igual que si la versión instalada de edge-tts no es compatible (ver audiolibro_edge).
+        self.pooled = bool(pooled)
+        self._connections = None
+
+    @property
+    def version(self) -> str:
+        from edge_tts import __version__ as edge_tts_version # Importación local
+        return f"edge-tts {edge_tts_version}"
+
+    async def open(self, concurrency: int = 1):
+        if not self.pooled:
+            return
+        from audiolibro_edge import POOL_SUPPORTED, EdgeTTSConnectionPool # Importación local
+        if not POOL_SUPPORTED:
+            self.pooled = False
+            return
+        # Una conexión por síntesis simultánea más una de reserva que se abre mientras las demás trabajan.
+        if self._connections is None:
+            self._connections = EdgeTTSConnectionPool(concurrency + 1)
+        else:
+            self._connections.max_connections = max(self._connections.max_connections, concurrency + 1)
+
+    async def close(self):
+        if self._connections is not None:
+            await self._connections.close()
+            self._connections = None
+
+    def connection_stats(self) -> dict:
+        """Conexiones abiertas, reutilizadas y descartadas por error (vacío si no hay conjunto)."""
+        return self._connections.stats() if self._connections is not None else {}
+
+    async def synthesize(self, text: str, voice: str, rate: str, output_path: str, on_boundary=None):
+        if self._connections is not None:
+            return await self._synthesize_pooled(text, voice, rate, output_path, on_boundary)
+        from edge_tts import Communicate # Importación local
+        try:
+            if on_boundary is None:
+                await Communicate(text, voice, rate=rate).save(output_path)
+                return
+            communicate = Communicate(text, voice, rate=rate, boundary="WordBoundary")
+            with open(output_path, "wb") as f:
+                async for message in communicate.stream():
+                    if message["type"] == "audio":
+                        f.write(message["data"])
+                    elif message["type"] == "WordBoundary":
+                        # edge-tts expresa los tiempos en unidades de 100 ns
+                        on_boundary(message["offset"] / 1e7, message["duration"] / 1e7, message["text"])
+        except Exception as e:
+            # La librería lanza una excepción si el texto queda vacío después de sus propios filtros.
+            if "No text to speak" in str(e):
+                raise NoSpeechError(str(e)) from e
+            raise
+
+    async def _synthesize_pooled(self, text: str, voice: str, rate: str, output_path: str, on_boundary=None):
+        from audiolibro_edge import EdgeTTSConnectionError # Importación local
+        if not text.strip():
+            raise NoSpeechError("No text to speak")
+        while True:
+            connection = await self._connections.acquire()
+            reused = connection.turns > 0
+            healthy = False
+            try:
+                with open(output_path, "wb") as f:
+                    try:
+                        await connection.synthesize(text, voice, rate, f, on_boundary)
+                        healthy = True
+                        return
+                    except EdgeTTSConnectionError:
+                        # El servicio puede cerrar una conexión inactiva sin avisar: si era reutilizada
+                        # y aún no había llegado audio, se repite con otra sin contarlo como fallo.
+                        if not reused or f.tell():
+                            raise
+            finally:
+                await self._connections.release(connection, healthy)
+
+    async def list_voices(self) -> list[dict]:
+        from edge_tts import VoicesManager # Importación local
+        voices = await VoicesManager.create()
+        return voices.voices
+
+class OfflineBackend(SynthesisBackend):
+    """Motor local y determinista para pruebas, perfiles y pruebas de carga sin red.
+
+    Genera tramas MP3 válidas con el formato de edge-tts (silencio) cuya duración es
+    proporcional a la longitud del texto y a la velocidad indicada. Simula el servicio con una
+    latencia configurable, fallos aleatorios y una capacidad máxima de peticiones simultáneas
+    por encima de la cual responde con error, como haría un servicio que limita el uso.
+
+    Opciones (todas opcionales, por `--backend-option CLAVE=VALOR`):
+    chars_per_second, latency, latency_per_char, jitter, failure_rate, capacity, stall_rate,
+    stall_time, seed.
+    """
+
+    name = "offline"
+    supports_boundaries = True
+    VOICES = [
+        {"ShortName": "es-ES-AlvaroNeural", "Gender": "Male", "Locale": "es-ES"},
+        {"ShortName": "es-ES-ElviraNeural", "Gender": "Female", "Locale": "es-ES"},
+        {"ShortName": "es-MX-DaliaNeural", "Gender": "Female", "Locale": "es-MX"},
+        {"ShortName": "en-US-AriaNeural", "Gender": "Female", "Locale": "en-US"},
+        {"ShortName": "en-US-GuyNeural", "Gender": "Male", "Locale": "en-US"},
+    ]
+
+    def __init__(self, chars_per_second: float = 15.0, latency: float = 0.0, latency_per_char: float = 0.0,
+                 jitter: float = 0.0, failure_rate: float = 0.0, capacity: int = 0, stall_rate: float = 0.0,
+                 stall_time: float = 300.0, seed: int = None):
+        self.chars_per_second = chars_per_second
+        self.latency = latency  # Segundos fijos por petición
+        self.latency_per_char = latency_per_char
+        self.jitter = jitter  # Desviación relativa (distribución log-normal) de la latencia
+        self.failure_rate = failure_rate  # Probabilidad de que una petición falle
+        self.capacity = capacity  # Peticiones simultáneas admitidas (0 = sin límite)
+        self.stall_rate = stall_rate  # Probabilidad de que una petición se quede colgada
+        self.stall_time = stall_time  # Segundos que tarda una petición colgada
+        self.active = 0
+        self.requests = 0
+        self.failures = 0
+        self._random = random.Random(seed)
+        self._frame = silent_frame(EDGE_TTS_FRAME_HEADER)
+        frame = parse_frame_header(EDGE_TTS_FRAME_HEADER)
+        self._frame_seconds = frame.samples / frame.sample_rate
+
+    @property
+    def version(self) -> str:
+        return f"offline {self.chars_per_second:g}"
+
+    def duration(self, text: str, rate: str) -> float:
+        return len(text.strip()) / self.chars_per_second / rate_factor(rate)
+
+    async def synthesize(self, text: str, voice: str, rate: str, output_path: str, on_boundary=None):
+        if not text.strip():
+            raise NoSpeechError("No text to speak")
+        self.requests += 1
+        self.active += 1
+        try:
+            delay = self.latency + self.latency_per_char * len(text)
+            if self.jitter:
+                delay *= self._random.lognormvariate(0, self.jitter)
+            if self._random.random() < self.stall_rate:
+                delay += self.stall_time
+            if self.capacity and self.active > self.capacity:
+                # Un servicio saturado rechaza rápido, sin hacer esperar toda la latencia.
+                await asyncio.sleep(delay * 0.1)
+                self.failures += 1
+                raise BackendError("Simulación: demasiadas peticiones simultáneas (429)")
+            await asyncio.sleep(delay)
+            if self._random.random() < self.failure_rate:
+                self.failures += 1
+                raise BackendError("Simulación: fallo inyectado del servicio")
+
+            with open(output_path, "wb") as f:
+                f.write(self.render(text, rate))
+            if on_boundary is not None:
+                for boundary in self.word_boundaries(text, rate):
+                    on_boundary(*boundary)
+        finally:
+            self.active -= 1
+
+    def render(self, text: str, rate: str) -> bytes:
+        """Audio sintético de `text`: tramas de silencio que duran lo que tardaría en leerse."""
+        frames = max(1, math.ceil(self.duration(text, rate) / self._frame_seconds))
+        return self._frame * frames
+
+    def word_boundaries(self, text: str, rate: str):
+        """Genera (desplazamiento_s, duración_s, palabra), repartiendo la duración según la longitud de cada palabra."""
+        duration = self.duration(text, rate)
+        words = list(re.finditer(r"\S+", text))
+        total_chars = sum(len(word.group()) for word in words) or 1
+        offset = 0.0
+        for word in words:
+            word_duration = duration * len(word.group()) / total_chars
+            yield offset, word_duration, word.group()
+            offset += word_duration
+
+    async def list_voices(self) -> list[dict]:
+        return [dict(voice) for voice in self.VOICES]
+
+BACKENDS = {
+    EdgeTTSBackend.name: EdgeTTSBackend,
+    OfflineBackend.name: OfflineBackend,
+}
+
+def parse_backend_options(options) -> dict:
+    """Convierte una lista de "clave=valor" en argumentos del motor (números cuando lo son)."""
+    parsed = {}
+    for option in options or ():
+        key, separator, value = option.partition("=")
+        if not separator or not key:
+            raise ValueError(f"Opción de motor no válida: '{option}' (se esperaba CLAVE=VALOR)")
+        for convert in (int, float):
+            try:
+                value = convert(value)
+                break
+            except ValueError:
+                continue
+        parsed[key.strip().replace("-", "_")] = value
+    return parsed
+
+def create_backend(name: str = DEFAULT_BACKEND, options: dict = None) -> SynthesisBackend:
+    """Crea el motor `name` con sus opciones. Lanza ValueError si no existe o no admite una opción."""
+    if name not in BACKENDS:
+        raise ValueError(f"Motor de síntesis desconocido: '{name}' (disponibles: {', '.join(BACKENDS)})")
+    try:
+        return BACKENDS[name](**(options or {}))
+    except TypeError as e:
+        raise ValueError(f"Opciones no válidas para el motor '{name}': {e}") from e
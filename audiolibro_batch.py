@@ -0,0 +1,138 @@
+import asyncio
+import os
+import time
+from datetime import timedelta
+from rich.panel import Panel
+from rich.progress import Progress, BarColumn, TextColumn, TimeRemainingColumn
+from rich.table import Table
+from audiolibro_creator import (
+    console, process_audiobook_creation, resolve_output_file,
+    CHUNK_MAX_SIZE, DEFAULT_BATCH_JOBS, DEFAULT_CONCAT_ENGINE, DEFAULT_CONCURRENCY,
+)
+from audiolibro_backends import EdgeTTSBackend
+from audiolibro_hedge import DEFAULT_CHUNK_TIMEOUT
+from audiolibro_pool import SynthesisPool
+
+def collect_text_files(paths) -> list[str]:
+    """Expande la lista de rutas del modo por lotes: los directorios aportan sus archivos .txt."""
+    text_files = []
+    for path in paths:
+        if os.path.isdir(path):
+            text_files.extend(
+                os.path.join(path, name) for name in sorted(os.listdir(path))
+                if name.lower().endswith(".txt") and os.path.isfile(os.path.join(path, name))
+            )
+        elif os.path.isfile(path):
+            text_files.append(path)
+        else:
+            console.print(f"[yellow]ADVERTENCIA:[/yellow] '{path}' no existe; se omite.")
+    # Sin duplicados, conservando el orden indicado
+    return list(dict.fromkeys(os.path.abspath(f) for f in text_files))
+
+def output_collisions(text_files) -> list[list[str]]:
+    """Grupos de libros que irían al mismo MP3 (y al mismo directorio temporal).
+
+    La salida de cada libro depende solo del nombre de su archivo, así que `dirA/libro.txt` y
+    `dirB/libro.txt` chocarían. Se comparan sin distinguir mayúsculas, como en Windows.
+    """
+    groups = {}
+    for text_file in text_files:
+        groups.setdefault(os.path.splitext(os.path.basename(text_file))[0].lower(), []).append(text_file)
+    return [files for files in groups.values() if len(files) > 1]
+
+def describe_collisions(collisions) -> str:
+    return "; ".join(" y ".join(f"'{f}'" for f in files) for files in collisions)
+
+async def process_batch(text_files: list[str], voice: str, retries: int, rate: str, chunking_strategy: str, concurrency: int = DEFAULT_CONCURRENCY, cache=None, streaming: bool = False, incremental: bool = False, concat_engine: str = DEFAULT_CONCAT_ENGINE, max_active_jobs: int = DEFAULT_BATCH_JOBS, metrics=None, backend=None, chunk_size=CHUNK_MAX_SIZE, chunk_timeout=DEFAULT_CHUNK_TIMEOUT, hedging=None, progressive: bool = False, dedup: bool = True, latency_backoff: bool = False) -> dict:
+    """Convierte varios libros compartiendo un único conjunto de `concurrency` trabajadores.
+
+    Se procesan hasta `max_active_jobs` libros a la vez, cada uno en su propio directorio
+    temporal; los trabajadores reparten sus turnos entre ellos, así que el conjunto sigue lleno
+    mientras un libro concatena su salida o espera a que se lea su texto. Un libro que falla no
+    detiene a los demás. Devuelve {archivo de texto: (archivo de salida, error o None, segundos)}.
+    """
+    collisions = output_collisions(text_files)
+    if collisions:
+        raise ValueError(f"varios libros generarían el mismo archivo de salida: {describe_collisions(collisions)}")
+
+    console.print(Panel(
+        f"[bold]Libros:[/] [cyan]{len(text_files)}[/cyan]\n"
+        f"[bold]Voz seleccionada:[/] [cyan]{voice}[/cyan]\n"
+        f"[bold]Velocidad:[/] [cyan]{rate}[/cyan]\n"
+        f"[bold]Síntesis simultáneas (total):[/] [cyan]{concurrency}[/cyan]\n"
+        f"[bold]Libros simultáneos:[/] [cyan]{max_active_jobs}[/cyan]",
+        title="Generador de Audiolibros - Modo por lotes", border_style="green"
+    ))
+
+    pool = SynthesisPool(concurrency, latency_backoff)
+    # Un solo motor para todos los libros, así comparten también sus conexiones.
+    owns_backend = backend is None
+    if owns_backend:
+        backend = EdgeTTSBackend()
+        await backend.open(concurrency)
+    active = asyncio.Semaphore(max(1, max_active_jobs))
+    results = {}
+
+    progress = Progress(
+        TextColumn("[progress.description]{task.description}"),
+        BarColumn(),
+        TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
+        TextColumn("([progress.completed]{task.completed}/{task.total})"),
+        TimeRemainingColumn(),
+        TextColumn("[dim]{task.fields[rate]}"),
+        console=console,
+    )
+
+    async def run_book(text_file: str):
+        name = os.path.basename(text_file)
+        output_file = resolve_output_file(text_file, announce=False)
+        task = progress.add_task(f"[dim]{name} (en espera)", total=None, rate="")
+        async with active:
+            progress.update(task, description=f"[cyan]{name}")
+            start_time = time.monotonic()
+            error = None
+            try:
+                # Con callbacks cada libro trabaja en silencio; el progreso lo muestra este lote.
+                await process_audiobook_creation(
+                    text_file, output_file, voice, retries, rate, chunking_strategy,
+                    status_callback=lambda message: None,
+                    progress_callback=lambda completed, total: progress.update(task, completed=completed, total=total, rate=pool.limiter.describe()),
+                    concurrency=concurrency, cache=cache, streaming=streaming,
+                    incremental=incremental, concat_engine=concat_engine, pool=pool, metrics=metrics,
+                    backend=backend, chunk_size=chunk_size, chunk_timeout=chunk_timeout, hedging=hedging,
+                    progressive=progressive, dedup=dedup,
+                )
+            except SystemExit:
+                # process_audiobook_creation aborta con sys.exit(); aquí solo afecta a este libro.
+                error = "no se pudo completar (los fragmentos se conservan para reanudar)"
+            except Exception as e:
+                error = str(e) or type(e).__name__
+            elapsed = time.monotonic() - start_time
+            results[text_file] = (output_file, error, elapsed)
+            style = "red" if error else "green"
+            progress.update(task, description=f"[{style}]{name}")
+
+    try:
+        with progress:
+            await asyncio.gather(*(run_book(f) for f in text_files))
+    finally:
+        await pool.close()
+        if owns_backend:
+            await backend.close()
+
+    # --- Resumen ---
+    table = Table(title="Resumen del lote")
+    table.add_column("Libro", style="cyan")
+    table.add_column("Resultado")
+    table.add_column("Tiempo", style="yellow")
+    for text_file in text_files:
+        output_file, error, elapsed = results[text_file]
+        result = f"[red]Error: {error}[/red]" if error else f"[green]{output_file}[/green]"
+        table.add_row(os.path.basename(text_file), result, str(timedelta(seconds=elapsed)).split('.')[0])
+    console.print(table)
+    if cache is not None:
+        cache_stats = cache.stats()
+        console.print(f"Caché de síntesis: [yellow]{cache_stats['hits']}[/yellow] aciertos, [yellow]{cache_stats['misses']}[/yellow] fallos")
+    if hedging is not None:
+        console.print(f"Peticiones lentas: [yellow]{hedging.describe()}[/yellow]")
+    return results
@@ -0,0 +1,111 @@
+import hashlib
+import json
+import os
+import shutil
+from collections import OrderedDict
+
+# --- Constantes ---
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".audiolibros_cache")
+DEFAULT_CACHE_SIZE_MB = 2048  # Tamaño máximo de la caché en MB antes de expulsar entradas
+
+class SynthesisCache:
+    """Caché persistente en disco de fragmentos sintetizados, compartida entre ejecuciones y libros.
+
+    Cada entrada se identifica por el hash de (texto, voz, velocidad, versión del motor TTS),
+    de modo que cualquier fragmento idéntico ya sintetizado se reutiliza sin volver a llamar
+    al servicio. Cuando se supera el tamaño máximo se expulsan las entradas usadas hace más tiempo (LRU).
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_size_mb: float = DEFAULT_CACHE_SIZE_MB):
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # clave -> tamaño en bytes, de la menos a la más reciente
+        self._total_bytes = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def make_key(text: str, voice: str, rate: str, backend_version: str) -> str:
+        """Calcula la clave de contenido de un fragmento."""
+        payload = json.dumps([text, voice, rate, backend_version], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        # Se reparte en subdirectorios para no acumular miles de archivos en uno solo.
+        return os.path.join(self.cache_dir, key[:2], f"{key}.mp3")
+
+    def _load_index(self):
+        """Reconstruye el índice LRU a partir de las fechas de modificación de los archivos."""
+        found = []
+        for entry in os.scandir(self.cache_dir):
+            if not entry.is_dir():
+                continue
+            for item in os.scandir(entry.path):
+                if item.name.endswith(".mp3") and item.is_file():
+                    stat = item.stat()
+                    found.append((stat.st_mtime, item.name[:-4], stat.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total_bytes += size
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def fetch(self, key: str, output_path: str) -> bool:
+        """Copia la entrada a `output_path` si existe. Devuelve True en caso de acierto."""
+        if key in self._entries:
+            path = self._path(key)
+            try:
+                partial_path = output_path + ".part"
+                shutil.copyfile(path, partial_path)
+                os.replace(partial_path, output_path)
+                os.utime(path)  # La fecha de modificación marca el último uso entre ejecuciones
+            except OSError:
+                # Otra ejecución pudo expulsar la entrada; se trata como un fallo.
+                self._total_bytes -= self._entries.pop(key)
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True
+        self.misses += 1
+        return False
+
+    def store(self, key: str, source_path: str):
+        """Guarda en la caché el audio de `source_path` y expulsa entradas si hace falta."""
+        size = os.path.getsize(source_path)
+        if size == 0 or size > self.max_bytes:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial_path = path + ".part"
+        shutil.copyfile(source_path, partial_path)
+        os.replace(partial_path, path)
+
+        if key in self._entries:
+            self._total_bytes -= self._entries.pop(key)
+        self._entries[key] = size
+        self._total_bytes += size
+        self._evict()
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        """Devuelve los contadores de uso de la caché."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "size_bytes": self._total_bytes,
+        }
@@ -1,18 +1,30 @@
 import argparse
 import asyncio
+import hashlib
 import os
 import sys
 import time
 import shutil
 import re
 from datetime import timedelta
-import ctypes
 import warnings
 import logging
-from rich.console import Console
-from rich.panel import Panel
-from rich.progress import Progress, BarColumn, TextColumn, TimeRemainingColumn
-from rich.table import Table
+from audiolibro_backends import (
+    BACKENDS, DEFAULT_BACKEND, EdgeTTSBackend, NoSpeechError, SynthesisBackend,
+    create_backend, parse_backend_options,
+)
+from audiolibro_cache import SynthesisCache, DEFAULT_CACHE_DIR, DEFAULT_CACHE_SIZE_MB
+from audiolibro_dedup import DedupPlanner
+from audiolibro_events import CancellationToken
+from audiolibro_hedge import DEFAULT_CHUNK_TIMEOUT, DEFAULT_HEDGE_BUDGET, HedgePolicy, with_timeout
+from audiolibro_manifest import ResumeManifest
+from audiolibro_metrics import JobMetrics, MetricsRecorder
+from audiolibro_mp3 import Mp3FormatError, append_mp3_frames, build_info_frame, concatenate_mp3_ranges, scan_frames, write_info_frame
+from audiolibro_pool import SynthesisPool
+from audiolibro_progressive import ProgressivePublisher, progressive_dir
+from audiolibro_rate import AdaptiveLimiter, retry_delay
+from audiolibro_sizing import MIN_AUTO_CHUNK_SIZE, AutoChunkSize, ThroughputModel
+from audiolibro_voices import VoiceCatalogue
 # from pydub import AudioSegment #<- MOVEMOS ESTA LÍNEA
 
 # --- Silenciar warnings y logs de aiohttp/edge-tts ---
@@ -21,13 +33,46 @@ logging.getLogger("asyncio").setLevel(logging.CRITICAL)
 logging.getLogger("aiohttp").setLevel(logging.CRITICAL)
 
 # --- Inicialización de Rich Console ---
-console = Console()
+class _LazyConsole:
+    """Consola de Rich que se crea al usarla por primera vez.
+
+    Rich tarda en importarse más que el resto del script; así `--help`, los errores de argumentos
+    y la GUI no lo pagan. Los demás módulos siguen usando `console` como una Console normal.
+    """
+
+    _console = None
+
+    @staticmethod
+    def _get():
+        if _LazyConsole._console is None:
+            from rich.console import Console # Importación local
+            _LazyConsole._console = Console()
+        return _LazyConsole._console
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
+
+    # Rich usa la consola como contexto (Live, Progress); los métodos especiales no pasan por __getattr__.
+    def __enter__(self):
+        return self._get().__enter__()
+
+    def __exit__(self, *exc_info):
+        return self._get().__exit__(*exc_info)
+
+console = _LazyConsole()
 
 # --- Constantes ---
 TEMP_DIR = "temp_audio_chunks"
 DEFAULT_OUTPUT_DIR = "D:\\AUDIOLIBROS"
 DEFAULT_RETRIES = 3
+DEFAULT_VOICE = "es-ES-AlvaroNeural"
+DEFAULT_CONCURRENCY = 1  # Síntesis simultáneas; 1 reproduce el comportamiento secuencial
 CHUNK_MAX_SIZE = 2500  # Caracteres máximos por fragmento para evitar problemas con la API
+DEFAULT_CONCAT_ENGINE = "native"
+DEFAULT_BATCH_JOBS = 2  # Libros activos a la vez en modo por lotes; con más de uno el conjunto nunca se vacía entre libros
+DEFAULT_SHARD_RANGE = 16  # Fragmentos por rango en el modo repartido (ver audiolibro_shard)
+DEFAULT_SHARD_LEASE = 60.0  # Segundos que un rango sigue asignado a un trabajador que ha dejado de renovarlo
+FFMPEG_WINDOWS_PATH = "C:\\ffmpeg\\bin\\ffmpeg.exe"  # Ubicación habitual en Windows; si no, se busca en el PATH
 
 # --- Gestión de Suspensión de Windows ---
 def prevent_sleep():
@@ -36,6 +81,7 @@ def prevent_sleep():
         try:
             ES_CONTINUOUS = 0x80000000
             ES_SYSTEM_REQUIRED = 0x00000001
+            import ctypes # Importación local
             ctypes.windll.kernel32.SetThreadExecutionState(ES_CONTINUOUS | ES_SYSTEM_REQUIRED)
         except Exception:
             pass
@@ -45,10 +91,23 @@ def allow_sleep():
     if sys.platform == 'win32':
         try:
             ES_CONTINUOUS = 0x80000000
+            import ctypes # Importación local
             ctypes.windll.kernel32.SetThreadExecutionState(ES_CONTINUOUS)
         except Exception:
             pass
 
+def parse_chunk_size(value: str):
+    """Convierte el valor de --chunk-size: un número de caracteres o 'auto'."""
+    if value.strip().lower() == "auto":
+        return "auto"
+    try:
+        size = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'{value}' no es un número de caracteres ni 'auto'")
+    if size < MIN_AUTO_CHUNK_SIZE:
+        raise argparse.ArgumentTypeError(f"el tamaño mínimo de fragmento es {MIN_AUTO_CHUNK_SIZE} caracteres")
+    return size
+
 def create_arg_parser():
     """Crea y configura el analizador de argumentos de la línea de comandos."""
     parser = argparse.ArgumentParser(
@@ -67,8 +126,8 @@ def create_arg_parser():
     )
     parser.add_argument(
         "-v", "--voice",
-        default="es-ES-AlvaroNeural",
-        help="Voz a utilizar para la síntesis (default: es-ES-AlvaroNeural)."
+        default=DEFAULT_VOICE,
+        help=f"Voz a utilizar para la síntesis (default: {DEFAULT_VOICE})."
     )
     parser.add_argument(
         "--rate",
@@ -81,32 +140,191 @@ def create_arg_parser():
         choices=['smart', 'legacy'],
         help="Estrategia para dividir el texto: 'smart' agrupa párrafos, 'legacy' va uno por uno (default: smart)."
     )
+    parser.add_argument(
+        "--chunk-size",
+        type=parse_chunk_size,
+        default=CHUNK_MAX_SIZE,
+        metavar="{N,auto}",
+        help=f"Tamaño máximo de cada fragmento en caracteres, o 'auto' para ajustarlo según la latencia y los fallos medidos (y el historial de --metrics, si existe) buscando el máximo de caracteres por segundo (default: {CHUNK_MAX_SIZE})."
+    )
     parser.add_argument(
         "--list-voices",
         action="store_true",
         help="Muestra las voces disponibles y sale."
     )
+    parser.add_argument(
+        "--backend",
+        default=DEFAULT_BACKEND,
+        choices=list(BACKENDS),
+        help="Motor de síntesis: 'edge-tts' usa el servicio de Microsoft; 'offline' genera audio de silencio de duración proporcional al texto, sin red, para pruebas y mediciones (default: edge-tts)."
+    )
+    parser.add_argument(
+        "--backend-option",
+        action="append",
+        default=[],
+        metavar="CLAVE=VALOR",
+        help="Opción del motor de síntesis, repetible. Para 'offline': latency, latency_per_char, jitter, failure_rate, capacity, stall_rate, stall_time, chars_per_second, seed."
+    )
     parser.add_argument(
         "--retries",
         type=int,
         default=DEFAULT_RETRIES,
         help=f"Número de reintentos por fragmento (default: {DEFAULT_RETRIES})."
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help=f"Número máximo de fragmentos sintetizándose a la vez (default: {DEFAULT_CONCURRENCY})."
+    )
+    parser.add_argument(
+        "--latency-backoff",
+        action="store_true",
+        help="Reduce también las síntesis simultáneas cuando la latencia crece de forma sostenida (no solo ante errores), para servicios que encolan en lugar de rechazar."
+    )
+    parser.add_argument(
+        "--chunk-timeout",
+        type=float,
+        default=DEFAULT_CHUNK_TIMEOUT,
+        help=f"Segundos máximos de cada petición de síntesis; si se superan, se cancela y se reintenta. 0 desactiva el límite (default: {DEFAULT_CHUNK_TIMEOUT:g})."
+    )
+    parser.add_argument(
+        "--hedge",
+        type=float,
+        default=None,
+        metavar="PERCENTIL",
+        help="Duplica la petición de un fragmento cuando tarda más que este percentil de la latencia de la ejecución (p. ej. 95) y usa la que termine antes. Desactivado por defecto."
+    )
+    parser.add_argument(
+        "--hedge-budget",
+        type=float,
+        default=DEFAULT_HEDGE_BUDGET,
+        help=f"Fracción máxima de peticiones que --hedge puede duplicar (default: {DEFAULT_HEDGE_BUDGET:g})."
+    )
+    parser.add_argument(
+        "--progressive",
+        action="store_true",
+        help="Publicación progresiva: sintetiza primero el principio del libro y publica, en la carpeta '<salida>_progresivo', los segmentos ya terminados con listas de reproducción (HLS .m3u8 y .m3u) y un prefijo reproducible del MP3."
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=DEFAULT_CACHE_DIR,
+        help=f"Directorio de la caché de síntesis compartida entre ejecuciones (default: {DEFAULT_CACHE_DIR})."
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=float,
+        default=DEFAULT_CACHE_SIZE_MB,
+        help=f"Tamaño máximo de la caché en MB; se expulsan primero las entradas menos usadas (default: {DEFAULT_CACHE_SIZE_MB})."
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Desactiva la caché de síntesis."
+    )
+    parser.add_argument(
+        "--no-dedup",
+        action="store_true",
+        help="Sintetiza cada aparición de los fragmentos repetidos dentro del libro en lugar de reutilizar el audio de la primera."
+    )
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Lee y fragmenta el archivo de forma incremental mientras se sintetiza (para textos muy grandes)."
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Añade cada fragmento al MP3 final en cuanto está listo, en lugar de concatenar todo al terminar."
+    )
+    parser.add_argument(
+        "--concat-engine",
+        default=DEFAULT_CONCAT_ENGINE,
+        choices=['native', 'ffmpeg'],
+        help="Motor de concatenación: 'native' une las tramas MP3 sin programas externos, 'ffmpeg' usa ffmpeg (default: native)."
+    )
+    parser.add_argument(
+        "--metrics",
+        metavar="RUTA",
+        help="Añade a este archivo JSONL un registro por fragmento (caracteres, bytes, latencia, intentos, origen, espera en cola) y los tiempos por fase de cada libro."
+    )
+    parser.add_argument(
+        "--metrics-prometheus",
+        metavar="RUTA",
+        help="Escribe además los acumulados de la ejecución en un archivo de texto de Prometheus (textfile collector). Requiere --metrics."
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="No sintetiza: muestra los fragmentos que se generarían, su distribución de tamaños y una estimación de la duración del audio, el tamaño del MP3 y el tiempo, calibrada con el historial de métricas (--metrics o el de la GUI)."
+    )
+    parser.add_argument(
+        "--batch",
+        nargs="+",
+        metavar="RUTA",
+        help="Modo por lotes: directorios o archivos .txt a convertir, compartiendo un único conjunto de síntesis."
+    )
+    parser.add_argument(
+        "--batch-jobs",
+        type=int,
+        default=DEFAULT_BATCH_JOBS,
+        help=f"Libros procesándose a la vez en modo por lotes (default: {DEFAULT_BATCH_JOBS})."
+    )
+    parser.add_argument(
+        "--shard",
+        metavar="DIR",
+        help="Modo repartido: publica los fragmentos del libro en este directorio compartido para que los sinteticen varios procesos trabajadores, y ensambla el resultado."
+    )
+    parser.add_argument(
+        "--shard-workers",
+        type=int,
+        default=0,
+        help="Trabajadores locales que lanza --shard; con 0 se esperan trabajadores iniciados aparte con --shard-worker (default: 0)."
+    )
+    parser.add_argument(
+        "--shard-range",
+        type=int,
+        default=DEFAULT_SHARD_RANGE,
+        help=f"Fragmentos consecutivos que se asignan juntos a un trabajador en el modo repartido (default: {DEFAULT_SHARD_RANGE})."
+    )
+    parser.add_argument(
+        "--shard-worker",
+        metavar="DIR",
+        help="Trabaja para el libro publicado con --shard en este directorio compartido: sintetiza rangos hasta que no quede ninguno. Usa --backend, --concurrency, --retries y la caché de este proceso."
+    )
+    parser.add_argument(
+        "--shard-worker-id",
+        help="Identificador del trabajador, único en el reparto; con el mismo identificador, un trabajador reiniciado retoma sus rangos (default: equipo y proceso)."
+    )
+    parser.add_argument(
+        "--shard-lease",
+        type=float,
+        default=DEFAULT_SHARD_LEASE,
+        help=f"Segundos tras los que otro trabajador puede reclamar un rango que ya no se renueva (default: {DEFAULT_SHARD_LEASE:g})."
+    )
     return parser
 
-async def list_available_voices():
-    """Obtiene y muestra las voces disponibles directamente desde la librería edge_tts."""
-    console.print("[bold cyan]Obteniendo lista de voces disponibles...[/bold cyan]")
+async def list_available_voices(backend: SynthesisBackend = None, catalogue: VoiceCatalogue = None):
+    """Muestra las voces disponibles del motor de síntesis (edge-tts por defecto).
+
+    Se leen del catálogo guardado en disco; solo se piden al servicio si no existe o ha caducado.
+    """
+    if backend is None:
+        backend = EdgeTTSBackend()
+    if catalogue is None:
+        catalogue = VoiceCatalogue(backend)
+    if catalogue.stale:
+        console.print("[bold cyan]Obteniendo lista de voces disponibles...[/bold cyan]")
+    from rich.table import Table # Importación local
     try:
-        from edge_tts import VoicesManager # Importación local
-        voices = await VoicesManager.create()
+        voices = await catalogue.get(wait=True)
         
-        table = Table(title="Voces Disponibles para Edge-TTS", show_lines=True)
+        table = Table(title=f"Voces Disponibles para {backend.name}", show_lines=True)
         table.add_column("Nombre Corto (ShortName)", style="cyan", no_wrap=True)
         table.add_column("Género", style="magenta")
         table.add_column("Localidad", style="green")
 
-        for voice in voices.voices:
+        for voice in voices:
             table.add_row(voice['ShortName'], voice['Gender'], voice['Locale'])
         
         console.print(table)
@@ -119,141 +337,273 @@ async def list_available_voices():
         console.print(f"[bold red]Ocurrió un error inesperado al obtener las voces: {e}[/bold red]")
         sys.exit(1)
 
-def chunk_text_legacy(text: str) -> list[str]:
-    """[LEGACY] Divide el texto en fragmentos manejables basados en párrafos y longitud."""
-    paragraphs = re.split(r'\n\s*\n', text)
-
-    chunks = []
-    for para in paragraphs:
-        para = para.strip()
-        if not para:
-            continue
-
-        if len(para) > CHUNK_MAX_SIZE:
-            sentences = re.split(r'(?<=[.!?])\s+', para)
-            current_chunk = ""
-            for sentence in sentences:
-                if len(current_chunk) + len(sentence) + 1 < CHUNK_MAX_SIZE:
-                    current_chunk += sentence + " "
-                else:
-                    chunks.append(current_chunk.strip())
-                    current_chunk = sentence + " "
-            if current_chunk:
-                chunks.append(current_chunk.strip())
+# --- Motor de Fragmentación ---
+# Patrones precompilados: separador de párrafos (línea en blanco) y final de frase.
+# El grupo 1 de SENTENCE_END_RE es el espacio en blanco tras . ! ?, que separa las frases;
+# equivale a r'(?<=[.!?])\s+' pero evita evaluar la aserción en cada posición del texto.
+PARAGRAPH_SEPARATOR_RE = re.compile(r'\n\s*\n')
+SENTENCE_END_RE = re.compile(r'[.!?](\s+)')
+
+def split_paragraphs(text: str):
+    """Genera los párrafos no vacíos (ya recortados) de un texto completo."""
+    start = 0
+    for match in PARAGRAPH_SEPARATOR_RE.finditer(text):
+        paragraph = text[start:match.start()].strip()
+        if paragraph:
+            yield paragraph
+        start = match.end()
+    paragraph = text[start:].strip()
+    if paragraph:
+        yield paragraph
+
+def iter_paragraphs(lines):
+    """Genera los párrafos de un iterable de líneas (p. ej. un archivo abierto) sin leerlo entero.
+
+    Produce exactamente los mismos párrafos que `split_paragraphs`: una o más líneas formadas
+    solo por espacios en blanco separan párrafos.
+    """
+    buffer = []
+    for line in lines:
+        if line.strip():
+            buffer.append(line)
+        elif buffer:
+            yield "".join(buffer).strip()
+            buffer = []
+    if buffer:
+        yield "".join(buffer).strip()
+
+def _iter_sentences(paragraph: str):
+    """Genera las frases de un párrafo sin construir listas intermedias."""
+    start = 0
+    for match in SENTENCE_END_RE.finditer(paragraph):
+        yield paragraph[start:match.start(1)]
+        start = match.end(1)
+    yield paragraph[start:]
+
+def _size_limit(max_size):
+    """Normaliza el tamaño máximo: un entero fijo o una función que se consulta por fragmento."""
+    return max_size if callable(max_size) else lambda: max_size
+
+def _pack_sentences(paragraph: str, next_limit, max_size: int):
+    """Divide un párrafo demasiado largo en fragmentos de frases completas unidas por un espacio.
+
+    `max_size` es el límite del primer fragmento; tras cada fragmento emitido se pide el
+    siguiente a `next_limit`. Devuelve el límite pendiente para el fragmento que siga al párrafo.
+    """
+    group = []
+    length = 0  # Longitud del fragmento en curso contando un espacio tras cada frase
+    for sentence in _iter_sentences(paragraph):
+        if length + len(sentence) + 1 < max_size:
+            group.append(sentence)
+            length += len(sentence) + 1
         else:
-            chunks.append(para)
-
-    return chunks
-
-def chunk_text_smart(text: str) -> list[str]:
-    """[SMART] Agrupa párrafos pequeños en fragmentos más grandes y eficientes."""
-    paragraphs = re.split(r'\n\s*\n', text)
-
-    final_chunks = []
-    current_chunk = ""
+            # Si la primera frase ya no cabe se emite un fragmento vacío, como siempre ha hecho el script.
+            yield " ".join(group)
+            max_size = next_limit()
+            group = [sentence]
+            length = len(sentence) + 1
+    yield " ".join(group)
+    return next_limit()
+
+def _iter_chunks(paragraphs, group_paragraphs: bool, max_size=CHUNK_MAX_SIZE, standalone=None):
+    """Motor común de fragmentación en una sola pasada.
+
+    Los párrafos que superan el tamaño máximo se parten por frases; el resto se emite tal cual
+    o, si `group_paragraphs` es verdadero, se agrupa con los siguientes mientras quepan.
+    `max_size` puede ser una función: se consulta una vez por fragmento, justo antes de
+    empezarlo, para que el tamaño automático use las medidas más recientes. Los párrafos para
+    los que `standalone(párrafo)` es verdadero nunca se agrupan (ver DedupPlanner).
+    """
+    next_limit = _size_limit(max_size)
+    max_size = next_limit()
+    group = []
+    length = 0  # Longitud del fragmento agrupado en curso, separadores incluidos
 
     for paragraph in paragraphs:
-        paragraph = paragraph.strip()
-        if not paragraph:
-            continue
-
-        if len(paragraph) > CHUNK_MAX_SIZE:
-            if current_chunk:
-                final_chunks.append(current_chunk)
-                current_chunk = ""
-
-            sentences = re.split(r'(?<=[.!?])\s+', paragraph)
-            oversized_paragraph_chunk = ""
-            for sentence in sentences:
-                if len(oversized_paragraph_chunk) + len(sentence) + 1 < CHUNK_MAX_SIZE:
-                    oversized_paragraph_chunk += sentence + " "
-                else:
-                    final_chunks.append(oversized_paragraph_chunk.strip())
-                    oversized_paragraph_chunk = sentence + " "
-            if oversized_paragraph_chunk:
-                final_chunks.append(oversized_paragraph_chunk.strip())
-
-        elif len(current_chunk) + len(paragraph) + 2 < CHUNK_MAX_SIZE:
-            if current_chunk:
-                current_chunk += "\n\n" + paragraph
+        alone = standalone is not None and standalone(paragraph)
+        if len(paragraph) > max_size:
+            if group:
+                yield "\n\n".join(group)
+                max_size = next_limit()
+                group = []
+                length = 0
+            if len(paragraph) > max_size:
+                max_size = yield from _pack_sentences(paragraph, next_limit, max_size)
+            elif alone:
+                yield paragraph
+                max_size = next_limit()
             else:
-                current_chunk = paragraph
+                # El límite del nuevo fragmento admite el párrafo entero: empieza un grupo con él.
+                group = [paragraph]
+                length = len(paragraph)
+
+        elif not group_paragraphs:
+            yield paragraph
+            max_size = next_limit()
+
+        elif alone:
+            if group:
+                yield "\n\n".join(group)
+                group = []
+                length = 0
+            yield paragraph
+            max_size = next_limit()
+
+        elif length + len(paragraph) + 2 < max_size:
+            length = length + len(paragraph) + 2 if group else len(paragraph)
+            group.append(paragraph)
 
         else:
-            final_chunks.append(current_chunk)
-            current_chunk = paragraph
+            yield "\n\n".join(group)
+            max_size = next_limit()
+            group = [paragraph]
+            length = len(paragraph)
+
+    if group:
+        yield "\n\n".join(group)
+
+def iter_chunks_legacy(paragraphs, max_size=CHUNK_MAX_SIZE):
+    """[LEGACY] Genera fragmentos manejables a partir de párrafos, uno por párrafo salvo si es muy largo."""
+    return _iter_chunks(paragraphs, group_paragraphs=False, max_size=max_size)
+
+def iter_chunks_smart(paragraphs, max_size=CHUNK_MAX_SIZE, standalone=None):
+    """[SMART] Agrupa párrafos pequeños en fragmentos más grandes y eficientes, generándolos según se completan."""
+    return _iter_chunks(paragraphs, group_paragraphs=True, max_size=max_size, standalone=standalone)
+
+def iter_chunks(paragraphs, strategy: str, max_size=CHUNK_MAX_SIZE, standalone=None):
+    """Genera los fragmentos de una secuencia de párrafos usando la estrategia especificada.
 
-    if current_chunk:
-        final_chunks.append(current_chunk)
+    `standalone` solo afecta a la estrategia smart: la legacy ya emite cada párrafo por separado.
+    """
+    if strategy == 'legacy':
+        return iter_chunks_legacy(paragraphs, max_size)
+    return iter_chunks_smart(paragraphs, max_size, standalone)
 
-    return final_chunks
+def chunk_text_legacy(text: str, max_size=CHUNK_MAX_SIZE) -> list[str]:
+    """[LEGACY] Divide el texto en fragmentos manejables basados en párrafos y longitud."""
+    return list(iter_chunks_legacy(split_paragraphs(text), max_size))
+
+def chunk_text_smart(text: str, max_size=CHUNK_MAX_SIZE) -> list[str]:
+    """[SMART] Agrupa párrafos pequeños en fragmentos más grandes y eficientes."""
+    return list(iter_chunks_smart(split_paragraphs(text), max_size))
 
-def chunk_text(text: str, strategy: str) -> list[str]:
+def chunk_text(text: str, strategy: str, max_size=CHUNK_MAX_SIZE) -> list[str]:
     """Divide el texto en fragmentos usando la estrategia especificada."""
     if strategy == 'smart':
-        return chunk_text_smart(text)
+        return chunk_text_smart(text, max_size)
     elif strategy == 'legacy':
-        return chunk_text_legacy(text)
+        return chunk_text_legacy(text, max_size)
     else:
-        return chunk_text_smart(text)
-
-async def synthesize_chunk(text: str, voice: str, output_path: str, rate: str) -> bool:
-    """Sintetiza un solo fragmento de texto a audio usando la librería edge_tts."""
+        return chunk_text_smart(text, max_size)
+
+def plan_chunks(text: str, strategy: str, max_size=CHUNK_MAX_SIZE, planner: DedupPlanner = None) -> list[str]:
+    """Fragmenta un texto completo; con `planner`, aislando los párrafos repetidos si compensa (ver DedupPlanner.plan)."""
+    if planner is None:
+        return chunk_text(text, strategy, max_size)
+    paragraphs = list(split_paragraphs(text))
+    return planner.plan(lambda standalone: list(iter_chunks(paragraphs, strategy, max_size, standalone)), paragraphs)
+
+class ChunkSynthesisError(Exception):
+    """Un fragmento no pudo generarse tras agotar los reintentos."""
+
+    def __init__(self, index: int):
+        super().__init__(f"No se pudo generar el fragmento {index+1}")
+        self.index = index
+
+async def synthesize_chunk(text: str, voice: str, output_path: str, rate: str, cache: SynthesisCache = None, limiter: AdaptiveLimiter = None, details: dict = None, backend: SynthesisBackend = None, timeout: float = None, hedging: HedgePolicy = None, priority: int = None) -> bool:
+    """Sintetiza un solo fragmento de texto a audio con el motor indicado (edge-tts por defecto).
+
+    Si se indica una caché, se consulta antes de llamar al servicio y se alimenta con el resultado.
+    Con `limiter`, la petición al servicio espera su turno (antes cuanto menor sea `priority`) y
+    su resultado ajusta el límite.
+    En `details` se anota el origen del audio ("empty", "cache" o "synth") y la duración de la petición.
+    Una petición que tarda más de `timeout` segundos se cancela y cuenta como fallo; con
+    `hedging`, las que superan el percentil de latencia de la ejecución se duplican.
+    """
+    if details is None:
+        details = {}
+    details["source"] = "empty"
+    if backend is None:
+        backend = EdgeTTSBackend()
     try:
-        from edge_tts import Communicate
-        
         # Filtra los chunks que están vacíos o solo contienen espacios en blanco
         if not text.strip():
             return True # Considerado un éxito para no detener el proceso
 
-        communicate = Communicate(text, voice, rate=rate)
-        await communicate.save(output_path)
+        if cache is not None:
+            cache_key = cache.make_key(text, voice, rate, backend.version)
+            if cache.fetch(cache_key, output_path):
+                details["source"] = "cache"
+                return True
+
+        # Se escribe en un archivo parcial y se renombra al terminar, para que la
+        # reanudación nunca confunda un fragmento a medio escribir con uno completo.
+        partial_path = output_path + ".part"
+        started = await limiter.acquire(priority) if limiter is not None else time.monotonic()
+        outcome = None
+        try:
+            if hedging is None:
+                await with_timeout(backend.synthesize(text, voice, rate, partial_path), timeout)
+            else:
+                partial_path = await hedging.run(
+                    lambda path: backend.synthesize(text, voice, rate, path), partial_path, len(text), limiter, timeout,
+                )
+            outcome = True
+            details["source"] = "synth"
+            details["latency"] = time.monotonic() - started
+            if hedging is not None:
+                hedging.observe(len(text), details["latency"])
+        except NoSpeechError:
+            # Un fragmento sin texto pronunciable no indica saturación del servicio.
+            outcome = True
+            raise
+        except Exception:
+            outcome = False
+            raise
+        finally:
+            if limiter is not None:
+                limiter.release(started, outcome, len(text))
+        os.replace(partial_path, output_path)
+        if cache is not None:
+            cache.store(cache_key, output_path)
+        return True
+    except NoSpeechError:
+        # El motor descarta el texto tras sus propios filtros: no es un error real, el fragmento estaba vacío.
         return True
     except Exception as e:
-        # La librería puede lanzar una excepción si el texto está vacío después de sus propios filtros,
-        # la capturamos aquí para evitar que el programa se detenga.
-        if "No text to speak" in str(e):
-            return True # No es un error real, el fragmento estaba vacío.
-        
-        console.print(f"\n[bold red]Error de la librería edge-tts al procesar un fragmento: {e}[/bold red]")
+        console.print(f"\n[bold red]Error del motor {backend.name} al procesar un fragmento: {e}[/bold red]")
         return False
 
-async def concatenate_chunks(output_file: str):
-    """Concatena todos los archivos MP3 usando ffmpeg directamente."""
-    console.print("\n[bold cyan]Concatenando archivos de audio con ffmpeg...[/bold cyan]")
+def find_ffmpeg():
+    """Devuelve la ruta del ejecutable de ffmpeg, o None si no está disponible."""
+    if os.path.isfile(FFMPEG_WINDOWS_PATH):
+        return FFMPEG_WINDOWS_PATH
+    return shutil.which("ffmpeg")
 
-    # 1. Obtener la ruta absoluta del directorio temporal y del archivo de salida
-    temp_dir_abs = os.path.abspath(TEMP_DIR)
-    output_file_abs = os.path.abspath(output_file)
+async def concatenate_with_ffmpeg(pack_path_abs: str, ranges: list[tuple], output_file_abs: str):
+    """Concatena los fragmentos con el demuxer concat de ffmpeg (copia de flujo, sin recodificar).
 
-    # 2. Obtener la lista ordenada de rutas de archivo ABSOLUTAS
-    try:
-        chunk_files_abs = sorted(
-            [os.path.join(temp_dir_abs, f) for f in os.listdir(temp_dir_abs) if f.endswith(".mp3")],
-            key=lambda f: int(os.path.basename(f).split('_')[1].split('.')[0])
-        )
-        if not chunk_files_abs:
-            console.print("[bold red]Error: No se encontraron fragmentos de audio para concatenar.[/bold red]")
-            sys.exit(1)
-    except Exception as e:
-        console.print(f"[bold red]Error al listar los fragmentos de audio: {e}[/bold red]")
+    Cada fragmento es un tramo (desplazamiento, longitud) del paquete, que ffmpeg lee con el
+    protocolo `subfile`.
+    """
+    ffmpeg_executable = find_ffmpeg()
+    if ffmpeg_executable is None:
+        console.print("[bold red]Error: `ffmpeg` no encontrado. Asegúrate de que esté instalado y en el PATH.[/bold red]")
         sys.exit(1)
 
-    # 3. Crear un archivo temporal con la lista de archivos para ffmpeg
-    filelist_path_abs = os.path.join(temp_dir_abs, "filelist.txt")
+    # Crear un archivo temporal con la lista de tramos para ffmpeg
+    filelist_path_abs = os.path.join(os.path.dirname(pack_path_abs), "filelist.txt")
+    # ffmpeg necesita rutas con barras inclinadas hacia adelante.
+    safe_path = pack_path_abs.replace('\\', '/')
     with open(filelist_path_abs, 'w', encoding='utf-8') as f:
-        for chunk_file in chunk_files_abs:
-            # ffmpeg necesita rutas con barras inclinadas hacia adelante.
-            safe_path = chunk_file.replace('\\', '/')
-            f.write(f"file '{safe_path}'\n")
-
-    # 4. Construir y ejecutar el comando de ffmpeg con rutas absolutas (silenciando warnings)
-    ffmpeg_executable = "C:\\ffmpeg\\bin\\ffmpeg.exe"
-    command = f'"{ffmpeg_executable}" -y -loglevel error -f concat -safe 0 -i "{filelist_path_abs}" -c copy "{output_file_abs}"'
+        for offset, length in ranges:
+            f.write(f"file 'subfile,,start,{offset},end,{offset + length},,:{safe_path}'\n")
 
+    # Ejecutar ffmpeg directamente, sin pasar por la shell (silenciando warnings)
     try:
-        process = await asyncio.create_subprocess_shell(
-            command,
+        process = await asyncio.create_subprocess_exec(
+            ffmpeg_executable, "-y", "-loglevel", "error", "-f", "concat", "-safe", "0",
+            "-protocol_whitelist", "file,subfile", "-i", filelist_path_abs, "-c", "copy", output_file_abs,
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.PIPE
         )
@@ -271,15 +621,129 @@ async def concatenate_chunks(output_file: str):
         console.print(f"[bold red]Ocurrió un error inesperado al ejecutar ffmpeg: {e}[/bold red]")
         sys.exit(1)
 
+async def concatenate_chunks(output_file: str, manifest: ResumeManifest, total_chunks: int, engine: str = DEFAULT_CONCAT_ENGINE):
+    """Concatena en orden el audio de los fragmentos guardado en el paquete, con el motor nativo o con ffmpeg."""
+    console.print(f"\n[bold cyan]Concatenando archivos de audio ({engine})...[/bold cyan]")
 
-def cleanup():
-    """Elimina el directorio temporal si existe."""
-    if os.path.isdir(TEMP_DIR):
-        shutil.rmtree(TEMP_DIR)
+    # 1. Obtener la ruta absoluta del paquete y del archivo de salida
+    output_file_abs = os.path.abspath(output_file)
+    pack_path_abs = os.path.abspath(manifest.store.path)
 
-async def process_audiobook_creation(text_file: str, output_file: str, voice: str, retries: int, rate: str, chunking_strategy: str, status_callback=None, progress_callback=None):
-    """Función orquestadora principal para la creación del audiolibro."""
+    # 2. Tramos del paquete en el orden del texto, según el índice (los fragmentos sin audio no tienen)
+    ranges = [(offset, size) for path, offset, size in map(manifest.locate, range(total_chunks)) if size is not None]
+    if not ranges:
+        console.print("[bold red]Error: No se encontraron fragmentos de audio para concatenar.[/bold red]")
+        sys.exit(1)
+
+    if engine == 'ffmpeg':
+        await concatenate_with_ffmpeg(pack_path_abs, ranges, output_file_abs)
+        return
+
+    # 3. Motor nativo: copia de tramas MP3 leídas por mmap, en un hilo aparte para no bloquear el bucle de eventos
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(None, concatenate_mp3_ranges, pack_path_abs, ranges, output_file_abs)
+    except Mp3FormatError as e:
+        if find_ffmpeg() is None:
+            console.print(f"[bold red]Error durante la concatenación: {e}[/bold red]")
+            sys.exit(1)
+        console.print(f"[yellow]ADVERTENCIA:[/yellow] {e} Se usará ffmpeg.")
+        await concatenate_with_ffmpeg(pack_path_abs, ranges, output_file_abs)
+
+class IncrementalAssembler:
+    """Añade cada fragmento a la salida parcial en cuanto él y todos los anteriores están listos.
+
+    Los fragmentos terminan en cualquier orden; los que llegan adelantados esperan en `_ready`
+    hasta que se completa el hueco. El audio de cada fragmento añadido se lee del paquete y su
+    posición en la salida queda registrada en el manifiesto para poder reanudar. Antes del
+    primer audio se reserva el hueco de la cabecera Info/Xing, que `finish` rellena al terminar:
+    el resultado es idéntico al de la concatenación nativa.
+    """
+
+    def __init__(self, manifest: ResumeManifest):
+        self.manifest = manifest
+        self._ready = set()
+        self._output = open(manifest.assembly_path, 'ab')
+
+    def mark_ready(self, index: int):
+        """Indica que el fragmento `index` ya tiene su audio registrado en el manifiesto."""
+        if self.manifest.is_assembled(index):
+            return
+        self._ready.add(index)
+        while self.manifest.assembled_chunks in self._ready:
+            i = self.manifest.assembled_chunks
+            self._ready.discard(i)
+            data = self.manifest.read(i)
+            if not self.manifest.assembly_header and data:
+                first_header = scan_frames(data)[2]
+                if first_header is not None:
+                    header_size = len(build_info_frame(first_header, 0, 0, False))
+                    self._output.write(b"\0" * header_size)
+                    self.manifest.reserve_assembly_header(header_size)
+            # Solo se copian las tramas de audio, sin etiquetas ni cabeceras VBR del fragmento.
+            size, frames, _, bitrates = append_mp3_frames(data, self._output)
+            self._output.flush()
+            self.manifest.mark_assembled(i, size, frames, bitrates)
+
+    def close(self):
+        self._output.close()
+
+    def finish(self):
+        """Escribe la cabecera Info/Xing de la salida completa (tras `close`, antes de renombrarla)."""
+        if self.manifest.assembly_header:
+            totals = self.manifest.assembly_totals()
+            write_info_frame(self.manifest.assembly_path, self.manifest.assembly_header, *(totals or ()))
+
+
+def job_temp_dir(output_file: str) -> str:
+    """Directorio de trabajo propio de un audiolibro dentro de TEMP_DIR.
+
+    Se deriva de la ruta absoluta del archivo de salida: dos libros procesados a la vez nunca
+    comparten fragmentos, y volver a lanzar el mismo libro reanuda en el mismo directorio.
+    """
+    output_abs = os.path.abspath(output_file)
+    name = re.sub(r'[^\w.-]+', '_', os.path.splitext(os.path.basename(output_abs))[0])[:40]
+    digest = hashlib.sha1(output_abs.encode('utf-8')).hexdigest()[:8]
+    return os.path.join(TEMP_DIR, f"{name}_{digest}")
+
+def cleanup(temp_dir: str = TEMP_DIR):
+    """Elimina el directorio temporal si existe (y TEMP_DIR si queda vacío)."""
+    if os.path.isdir(temp_dir):
+        shutil.rmtree(temp_dir)
+    try:
+        os.rmdir(TEMP_DIR)
+    except OSError:
+        pass  # No existe o aún contiene otros libros
+
+async def process_audiobook_creation(text_file: str, output_file: str, voice: str, retries: int, rate: str, chunking_strategy: str, status_callback=None, progress_callback=None, concurrency: int = DEFAULT_CONCURRENCY, cache: SynthesisCache = None, streaming: bool = False, incremental: bool = False, concat_engine: str = DEFAULT_CONCAT_ENGINE, temp_dir: str = None, pool: SynthesisPool = None, metrics: MetricsRecorder = None, backend: SynthesisBackend = None, chunk_size=CHUNK_MAX_SIZE, chunk_timeout: float = DEFAULT_CHUNK_TIMEOUT, hedging: HedgePolicy = None, progressive: bool = False, cancel_token: CancellationToken = None, dedup: bool = True, latency_backoff: bool = False):
+    """Función orquestadora principal para la creación del audiolibro.
+
+    `temp_dir` es el directorio de trabajo del libro (por defecto, uno propio dentro de TEMP_DIR)
+    y `pool` un conjunto de trabajadores compartido con otros libros (por defecto, uno propio de
+    `concurrency` trabajadores). Con `metrics` se exporta un registro por fragmento y los
+    tiempos de cada fase. `backend` es el motor de síntesis (por defecto, edge-tts); quien lo
+    pasa se encarga de abrirlo y cerrarlo. `chunk_size` es el tamaño máximo de los fragmentos o
+    un ThroughputModel que lo ajusta según el rendimiento medido (`--chunk-size auto`).
+    `chunk_timeout` limita la duración de cada petición de síntesis y `hedging` duplica las
+    que tardan demasiado (ver HedgePolicy). Con `progressive`, los fragmentos del principio
+    tienen prioridad y el audio terminado se publica mientras avanza (ver ProgressivePublisher).
+    `cancel_token` permite detener el proceso desde otro hilo: se abortan las peticiones en
+    curso, se guarda el manifiesto para reanudar y se lanza asyncio.CancelledError. Con `dedup`,
+    los fragmentos repetidos dentro del libro se sintetizan una sola vez (ver DedupPlanner).
+    """
+    from rich.panel import Panel # Importación local
+    from rich.progress import Progress, BarColumn, TextColumn, TimeRemainingColumn # Importación local
+    owns_backend = backend is None
+    if owns_backend:
+        backend = EdgeTTSBackend()
+        await backend.open(concurrency)
+    chunk_model = chunk_size if isinstance(chunk_size, ThroughputModel) else None
     prevent_sleep()
+    text_source = None
+    job_metrics = (metrics.open_job(output_file, voice, rate, concurrency) if metrics is not None
+                   else JobMetrics(None, output_file, voice, rate, concurrency))
+    status = "failed"
+    unbind_cancel = cancel_token.bind(asyncio.current_task()) if cancel_token is not None else None
     try:
         start_time = time.monotonic()
 
@@ -291,20 +755,47 @@ async def process_audiobook_creation(text_file: str, output_file: str, voice: st
             summary = (
                 f"[bold]Archivo de entrada:[/] [cyan]{text_file}[/cyan]\n"
                 f"[bold]Archivo de salida:[/] [cyan]{output_file}[/cyan]\n"
+                f"[bold]Motor de síntesis:[/] [cyan]{backend.name}[/cyan]\n"
                 f"[bold]Voz seleccionada:[/] [cyan]{voice}[/cyan]\n"
                 f"[bold]Velocidad:[/] [cyan]{rate}[/cyan]\n"
                 f"[bold]Estrategia de Fragmentación:[/] [cyan]{chunking_strategy}[/cyan]\n"
-                f"[bold]Reintentos por fragmento:[/] [cyan]{retries}[/cyan]"
+                f"[bold]Reintentos por fragmento:[/] [cyan]{retries}[/cyan]\n"
+                f"[bold]Síntesis simultáneas:[/] [cyan]{concurrency}[/cyan]\n"
+                f"[bold]Lectura en streaming:[/] [cyan]{'sí' if streaming else 'no'}[/cyan]\n"
+                f"[bold]Ensamblado incremental:[/] [cyan]{'sí' if incremental else 'no'}[/cyan]\n"
+                f"[bold]Tamaño de fragmento:[/] [cyan]{'automático' if chunk_model else chunk_size}[/cyan]"
+                + (f"\n[bold]Publicación progresiva:[/] [cyan]{progressive_dir(output_file)}[/cyan]" if progressive else "")
             )
             console.print(Panel(summary, title="Generador de Audiolibros", border_style="green"))
 
         # --- Preparación ---
-        # No borra el directorio si existe, permitiendo la reanudación.
-        os.makedirs(TEMP_DIR, exist_ok=True)
+        # Cada libro trabaja en su propio directorio; no se borra si existe, permitiendo la reanudación.
+        if temp_dir is None:
+            temp_dir = job_temp_dir(output_file or text_file)
+        os.makedirs(temp_dir, exist_ok=True)
+        # En modo automático el tamaño se decide fragmento a fragmento, así que el texto se
+        # fragmenta a medida que avanza la síntesis y no de antemano.
+        chunk_sizer = AutoChunkSize(chunk_model, temp_dir) if chunk_model else None
+        max_size = chunk_sizer or chunk_size
+        planner = DedupPlanner() if dedup else None
 
         try:
-            with open(text_file, 'r', encoding='utf-8') as f:
-                text = f.read()
+            if streaming:
+                # El archivo se lee y se fragmenta a medida que avanza la síntesis.
+                # La lectura ocurre dentro de la fragmentación y se contabiliza en esa fase.
+                text_source = open(text_file, 'r', encoding='utf-8')
+                chunk_source = job_metrics.timed(iter_chunks(iter_paragraphs(text_source), chunking_strategy, max_size), "chunk")
+                total_chunks = None
+            else:
+                with job_metrics.phase("read"), open(text_file, 'r', encoding='utf-8') as f:
+                    text = f.read()
+                if chunk_sizer is not None:
+                    chunk_source = job_metrics.timed(iter_chunks(split_paragraphs(text), chunking_strategy, max_size), "chunk")
+                    total_chunks = None
+                else:
+                    with job_metrics.phase("chunk"):
+                        chunk_source = plan_chunks(text, chunking_strategy, max_size, planner)
+                    total_chunks = len(chunk_source)
         except FileNotFoundError:
             if not is_gui_mode:
                 console.print(f"[bold red]Error: El archivo de texto '{text_file}' no fue encontrado.[/bold red]")
@@ -314,9 +805,6 @@ async def process_audiobook_creation(text_file: str, output_file: str, voice: st
                 console.print(f"[bold red]Error al leer el archivo de texto: {e}[/bold red]")
             sys.exit(1)
 
-        text_chunks = chunk_text(text, chunking_strategy)
-        total_chunks = len(text_chunks)
-
         # --- Barra de Progreso ---
         progress_columns = [
             TextColumn("[progress.description]{task.description}"),
@@ -324,6 +812,7 @@ async def process_audiobook_creation(text_file: str, output_file: str, voice: st
             TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
             TextColumn("([progress.completed]{task.completed}/{task.total})"),
             TimeRemainingColumn(),
+            TextColumn("[dim]{task.fields[rate]}"),
         ]
 
         # Solo mostrar barra de progreso en modo CLI
@@ -337,56 +826,177 @@ async def process_audiobook_creation(text_file: str, output_file: str, voice: st
         with progress_context as progress:
             # Solo crear tarea si estamos en modo CLI
             if not is_gui_mode:
-                task = progress.add_task("Procesando fragmentos...", total=total_chunks)
+                task = progress.add_task("Procesando fragmentos...", total=total_chunks, rate="")
 
-            for i, chunk in enumerate(text_chunks):
-                chunk_filename = os.path.join(TEMP_DIR, f"chunk_{i:04d}.mp3")
+            completed = 0
+            discovered = 0  # Fragmentos producidos hasta ahora (el total en modo streaming)
 
-                # Actualizar estado en GUI si existe callback
-                if status_callback:
-                    status_callback(f"Procesando fragmento {i+1}/{total_chunks}")
+            def report_progress():
+                total = total_chunks if total_chunks is not None else discovered
+                if not is_gui_mode:
+                    progress.update(task, completed=completed, total=total, rate=pool.limiter.describe())
                 if progress_callback:
-                    progress_callback(i, total_chunks)
+                    progress_callback(completed, total)
+
+            # --- Lógica de Reanudación ---
+            # El manifiesto decide qué fragmentos ya generados siguen siendo válidos para el
+            # texto actual; esos cuentan como completados sin pasar por los trabajadores.
+            assembly_path = output_file + ".part" if incremental else None
+            manifest = ResumeManifest(temp_dir, assembly_path)
+            assembler = IncrementalAssembler(manifest) if incremental else None
+            publisher = None
+            if progressive:
+                title = os.path.splitext(os.path.basename(output_file))[0]
+                publisher = ProgressivePublisher(progressive_dir(output_file), manifest.locate, title)
+
+            def mark_ready(i: int):
+                # El publicador copia el audio antes de que el ensamblado incremental borre el fragmento.
+                if publisher:
+                    publisher.mark_ready(i)
+                if assembler:
+                    assembler.mark_ready(i)
+
+            async def synthesize_item(item):
+                """Sintetiza un fragmento con sus reintentos; lo ejecuta un trabajador del conjunto."""
+                nonlocal completed
+                i, chunk, queued_at = item
+                queue_wait = time.monotonic() - queued_at
+                chunk_filename = os.path.join(temp_dir, f"chunk_{i:04d}.mp3")
+                total = total_chunks if total_chunks is not None else discovered
 
-                # --- Lógica de Reanudación ---
-                if os.path.exists(chunk_filename) and os.path.getsize(chunk_filename) > 0:
-                    if not is_gui_mode:
-                        progress.update(task, advance=1)
-                    continue
+                # Actualizar estado en GUI si existe callback
+                if status_callback:
+                    status_callback(f"Procesando fragmento {i+1}/{total} ({pool.limiter.describe()})")
+                if not is_gui_mode:
+                    progress.update(task, description=f"Procesando fragmento [cyan]({i+1}/{total})[/cyan]")
 
                 success = False
+                details = {}
                 for attempt in range(retries):
-                    if not is_gui_mode:
-                        progress.update(task, description=f"Procesando fragmento [cyan]({i+1}/{total_chunks})[/cyan]")
-
-                    success = await synthesize_chunk(chunk, voice, chunk_filename, rate)
+                    success = await synthesize_chunk(chunk, voice, chunk_filename, rate, cache, pool.limiter, details, backend, chunk_timeout, hedging,
+                                                     priority=i if progressive and owns_pool else None)
 
                     if success:
+                        if chunk_model and details["source"] == "synth":
+                            chunk_model.observe(len(chunk), details["latency"])
                         break
                     else:
-                        if not is_gui_mode:
-                            console.print(f"[yellow]ADVERTENCIA:[/yellow] Fallo al generar el fragmento {i+1}. Reintentando (intento {attempt+1}/{retries})...")
+                        if chunk_model:
+                            chunk_model.observe_failure(len(chunk))
+                        report_progress()  # El fallo ha podido reducir el límite de simultáneas
                         if attempt < retries - 1:
-                            time.sleep(5)
+                            # Espera exponencial con jitter; no retiene el turno del limitador.
+                            delay = retry_delay(attempt)
+                            if not is_gui_mode:
+                                console.print(f"[yellow]ADVERTENCIA:[/yellow] Fallo al generar el fragmento {i+1}. Reintentando en {delay:.1f} s (intento {attempt+1}/{retries})...")
+                            await asyncio.sleep(delay)
 
                 if not success:
-                    if not is_gui_mode:
-                        console.print(f"[bold red]ERROR FATAL:[/bold red] No se pudo generar el fragmento {i+1} después de {retries} intentos. Abortando.")
-                    # No se borra la carpeta para poder revisar los logs o archivos.
-                    sys.exit(1)
-
+                    raise ChunkSynthesisError(i)
+
+                manifest.record(i, chunk, voice, rate)
+                job_metrics.chunk(i, len(chunk), manifest.size(i), details["source"], attempts=attempt + 1,
+                                  latency=details.get("latency"), queue_wait=queue_wait)
+                mark_ready(i)
+
+                # Los fragmentos pueden terminar fuera de orden; el progreso cuenta completados.
+                completed += 1
+                if planner:
+                    for copy_index, copy_chunk in planner.ready(i):
+                        reuse_audio(copy_index, copy_chunk, i)
+                report_progress()
+
+            def reuse_audio(i: int, chunk: str, source: int):
+                """Completa el fragmento `i` con una copia del audio del fragmento idéntico `source`."""
+                nonlocal completed
+                planner.reuse(manifest.locate, source, os.path.join(temp_dir, f"chunk_{i:04d}.mp3"))
+                manifest.record(i, chunk, voice, rate)
+                job_metrics.chunk(i, len(chunk), manifest.size(i), "dedup")
+                mark_ready(i)
+                completed += 1
+
+            # Sin conjunto compartido (modo por lotes), el libro usa uno propio. Con un conjunto
+            # compartido se mantiene el orden de llegada: la prioridad por índice dejaría sin turno a los demás libros.
+            owns_pool = pool is None
+            if owns_pool:
+                pool = SynthesisPool(concurrency, latency_backoff)
+            # Cola acotada: en modo streaming limita cuánto texto se adelanta a la síntesis.
+            job = pool.open_job(synthesize_item)
+
+            async def producer():
+                """Fragmenta el texto en orden y encola los fragmentos pendientes."""
+                nonlocal completed, discovered
+                for i, chunk in enumerate(chunk_source):
+                    discovered = i + 1
+                    if manifest.claim(i, chunk, voice, rate):
+                        job_metrics.chunk(i, len(chunk), manifest.size(i), "resume")
+                        mark_ready(i)
+                        completed += 1
+                        if planner:
+                            planner.resumed(i, chunk)
+                        report_progress()
+                        continue
+                    source = planner.original(i, chunk) if planner else None
+                    if source is None:
+                        await job.submit((i, chunk, time.monotonic()))
+                    elif not planner.defer(i, chunk, source):
+                        # Repetición de un fragmento ya listo; si no lo está, se copia al terminar él.
+                        reuse_audio(i, chunk, source)
+                        report_progress()
+                manifest.drop_orphans(discovered)
+                report_progress()
+                job.close()
+
+            report_progress()
+            producer_task = asyncio.ensure_future(producer())
+            synthesized = False
+            synthesis_start = time.perf_counter()
+            try:
+                # Termina cuando se han sintetizado todos los fragmentos o en cuanto algo falla.
+                done, _ = await asyncio.wait({producer_task, job.finished}, return_when=asyncio.FIRST_EXCEPTION)
+                for future in done:
+                    future.result()
+                synthesized = True
+            except ChunkSynthesisError as e:
                 if not is_gui_mode:
-                    progress.update(task, advance=1)
+                    console.print(f"[bold red]ERROR FATAL:[/bold red] No se pudo generar el fragmento {e.index+1} después de {retries} intentos. Abortando.")
+                # No se borra la carpeta para poder revisar los logs o archivos.
+                sys.exit(1)
+            finally:
+                producer_task.cancel()
+                job.cancel()
+                await asyncio.gather(producer_task, return_exceptions=True)
+                job_metrics.add_phase("synthesize", time.perf_counter() - synthesis_start)
+                if owns_pool:
+                    await pool.close()
+                if assembler:
+                    assembler.close()
+                if publisher:
+                    publisher.close(complete=synthesized)
+                # Se guarda también si el proceso se interrumpe, para reanudar sin perder trabajo.
+                manifest.save()
+                manifest.close()
+                if chunk_sizer is not None:
+                    chunk_sizer.save()
+
+        total_chunks = discovered
 
         # --- Concatenación y Limpieza ---
         # Solo se borra el directorio temporal si la concatenación es exitosa.
-        if status_callback:
-            status_callback("Concatenando fragmentos de audio...")
         if progress_callback:
             progress_callback(total_chunks, total_chunks)
 
-        await concatenate_chunks(output_file)
-        cleanup()
+        with job_metrics.phase("concatenate"):
+            if incremental:
+                # La salida parcial ya contiene todos los fragmentos en orden; falta su cabecera.
+                assembler.finish()
+                os.replace(assembly_path, output_file)
+            else:
+                if status_callback:
+                    status_callback("Concatenando fragmentos de audio...")
+                await concatenate_chunks(output_file, manifest, total_chunks, concat_engine)
+        cleanup(temp_dir)
+        status = "ok"
 
         # --- Panel de Éxito ---
         end_time = time.monotonic()
@@ -400,12 +1010,47 @@ async def process_audiobook_creation(text_file: str, output_file: str, voice: st
                 f"¡Audiolibro [bold green]'{output_file}'[/bold green] creado con éxito!\n\n"
                 f"Tiempo total empleado: [yellow]{str(duration).split('.')[0]}[/yellow]"
             )
+            if cache is not None:
+                cache_stats = cache.stats()
+                success_message += (
+                    f"\nCaché de síntesis: [yellow]{cache_stats['hits']}[/yellow] aciertos, "
+                    f"[yellow]{cache_stats['misses']}[/yellow] fallos"
+                )
+            if planner and planner.chars_saved > 0:
+                if planner.requests_saved >= 0:
+                    saved = f"[yellow]{planner.requests_saved}[/yellow] peticiones y [yellow]{planner.chars_saved}[/yellow] caracteres ahorrados"
+                else:
+                    saved = (f"[yellow]{planner.chars_saved}[/yellow] caracteres ahorrados a cambio de "
+                             f"[yellow]{-planner.requests_saved}[/yellow] peticiones más")
+                success_message += f"\nFragmentos repetidos: {saved}"
+            if publisher:
+                success_message += f"\nPublicación progresiva: [yellow]{publisher.directory}[/yellow]"
+            if hedging is not None:
+                success_message += f"\nPeticiones lentas: [yellow]{hedging.describe()}[/yellow]"
+            if chunk_model:
+                success_message += f"\nTamaño automático al terminar: [yellow]{chunk_model.describe()}[/yellow]"
+            if concurrency > 1:
+                rate_stats = pool.limiter.stats()
+                success_message += (
+                    f"\nSíntesis simultáneas al terminar: [yellow]{rate_stats['limit']}[/yellow] de "
+                    f"[yellow]{rate_stats['max_limit']}[/yellow] ({rate_stats['failures']} peticiones fallidas)"
+                )
             console.print(Panel(
                 success_message,
                 title="Proceso Completado",
                 border_style="green"
             ))
+    except asyncio.CancelledError:
+        status = "cancelled"
+        raise
     finally:
+        if unbind_cancel is not None:
+            unbind_cancel()
+        if text_source is not None:
+            text_source.close()
+        job_metrics.finish(status)
+        if owns_backend:
+            await backend.close()
         allow_sleep()
 
 def suppress_asyncio_exceptions(loop, context):
@@ -418,38 +1063,17 @@ def suppress_asyncio_exceptions(loop, context):
     # Para otros errores, usar el comportamiento por defecto
     loop.default_exception_handler(context)
 
-async def main():
-    """Función principal asíncrona que coordina todo."""
-    # Configurar manejador de excepciones de asyncio
-    loop = asyncio.get_event_loop()
-    loop.set_exception_handler(suppress_asyncio_exceptions)
-
-    parser = create_arg_parser()
-    args = parser.parse_args()
-
-    if args.list_voices:
-        await list_available_voices()
-        sys.exit(0)
-    
-    # --- Validación de Argumentos ---
-
-    # El archivo de texto de entrada es siempre requerido para la creación.
-    if not args.text_file:
-        console.print("[bold red]Error: El argumento --text-file (-t) es requerido para crear un audiolibro.[/bold red]")
-        parser.print_help()
-        sys.exit(1)
+def resolve_output_file(text_file: str, output_file: str = None, announce: bool = True) -> str:
+    """Determina la ruta final del MP3 y crea su directorio.
 
-    # Validar que el archivo de entrada existe
-    if not os.path.isfile(args.text_file):
-        console.print(f"[bold red]Error: El archivo de entrada '{args.text_file}' no existe o no es un archivo válido.[/bold red]")
-        sys.exit(1)
-
-    # Determinar el nombre del archivo de salida y su directorio
-    output_file = args.output_file
+    Sin archivo de salida se usa el nombre del texto; las rutas relativas se colocan en
+    DEFAULT_OUTPUT_DIR, dentro de una carpeta con el nombre del archivo.
+    """
     if not output_file:
-        base_name = os.path.splitext(os.path.basename(args.text_file))[0]
+        base_name = os.path.splitext(os.path.basename(text_file))[0]
         output_file = f"{base_name}.mp3"
-        console.print(f"\n[cyan]No se especificó archivo de salida. Usando por defecto:[/] [bold magenta]{output_file}[/bold magenta]")
+        if announce:
+            console.print(f"\n[cyan]No se especificó archivo de salida. Usando por defecto:[/] [bold magenta]{output_file}[/bold magenta]")
     
     # Crear el directorio de salida por defecto si no existe
     if not os.path.isabs(output_file):
@@ -460,14 +1084,182 @@ async def main():
         output_dir = os.path.join(DEFAULT_OUTPUT_DIR, base_name)
         os.makedirs(output_dir, exist_ok=True)
         output_file = os.path.join(output_dir, output_file)
-        console.print(f"\n[cyan]Archivo de salida configurado en:[/] [bold magenta]{output_file}[/bold magenta]")
+        if announce:
+            console.print(f"\n[cyan]Archivo de salida configurado en:[/] [bold magenta]{output_file}[/bold magenta]")
     else:
         # Si es una ruta absoluta, crear el directorio si no existe
         output_dir = os.path.dirname(output_file)
         if output_dir:
             os.makedirs(output_dir, exist_ok=True)
+    return output_file
+
+async def plan_audiobook(args, backend: SynthesisBackend):
+    """`--plan`: fragmenta el libro como lo haría la creación y estima el resultado, sin llamar al servicio."""
+    from audiolibro_plan import BookPlan, PlanEstimator, DEFAULT_HISTORY_FILE, print_plan # Importación local
+    history = args.metrics or DEFAULT_HISTORY_FILE
+    chunk_size = args.chunk_size
+    if chunk_size == "auto":
+        # El tamaño con el que empezaría el modo automático (luego se ajusta durante la síntesis).
+        model = ThroughputModel(CHUNK_MAX_SIZE)
+        model.load_history(history)
+        chunk_size = model.best_size()
+    with open(args.text_file, "r", encoding="utf-8") as f:
+        text = f.read()
+    plan = BookPlan(text, args.chunking_strategy, chunk_size, dedup=not args.no_dedup)
+    cache = None if args.no_cache else SynthesisCache(args.cache_dir, args.cache_size)
+    estimate = PlanEstimator(history).estimate(plan, args.voice, args.rate, args.concurrency, cache, backend.version)
+    print_plan(plan, estimate, args.text_file, args.voice, args.rate, args.concurrency)
+
+async def main():
+    """Función principal asíncrona que coordina todo."""
+    # Configurar manejador de excepciones de asyncio
+    loop = asyncio.get_event_loop()
+    loop.set_exception_handler(suppress_asyncio_exceptions)
+
+    parser = create_arg_parser()
+    args = parser.parse_args()
+
+    try:
+        backend = create_backend(args.backend, parse_backend_options(args.backend_option))
+    except ValueError as e:
+        console.print(f"[bold red]Error: {e}[/bold red]")
+        sys.exit(1)
+
+    catalogue = VoiceCatalogue(backend, args.cache_dir)
+    if args.list_voices:
+        await list_available_voices(backend, catalogue)
+        sys.exit(0)
     
-    await process_audiobook_creation(args.text_file, output_file, args.voice, args.retries, args.rate, args.chunking_strategy)
+    # --- Validación de Argumentos ---
+
+    if args.concurrency < 1:
+        console.print("[bold red]Error: --concurrency debe ser un número entero mayor o igual que 1.[/bold red]")
+        sys.exit(1)
+
+    if args.chunk_timeout < 0:
+        console.print("[bold red]Error: --chunk-timeout no puede ser negativo.[/bold red]")
+        sys.exit(1)
+
+    if args.hedge is not None and not 0 < args.hedge < 100:
+        console.print("[bold red]Error: --hedge debe ser un percentil entre 0 y 100.[/bold red]")
+        sys.exit(1)
+
+    if args.metrics_prometheus and not args.metrics:
+        console.print("[bold red]Error: --metrics-prometheus requiere --metrics.[/bold red]")
+        sys.exit(1)
+
+    if args.shard_worker:
+        from audiolibro_shard import run_shard_worker # Importación local
+        if args.shard_lease <= 0:
+            console.print("[bold red]Error: --shard-lease debe ser mayor que 0.[/bold red]")
+            sys.exit(1)
+        # El libro, la voz y la velocidad los fija el coordinador; el trabajador solo sintetiza.
+        cache = None if args.no_cache else SynthesisCache(args.cache_dir, args.cache_size)
+        hedging = HedgePolicy(args.hedge, args.hedge_budget) if args.hedge is not None else None
+        await backend.open(args.concurrency)
+        try:
+            await run_shard_worker(args.shard_worker, backend, args.retries, args.concurrency, cache, args.chunk_timeout,
+                                   hedging, args.shard_worker_id, args.shard_lease, args.latency_backoff)
+        except ChunkSynthesisError:
+            sys.exit(1)
+        finally:
+            await backend.close()
+        return
+
+    if args.shard:
+        if args.batch or args.streaming or args.progressive or args.chunk_size == "auto":
+            console.print("[bold red]Error: --shard no admite --batch, --streaming, --progressive ni --chunk-size auto: "
+                          "los fragmentos se fijan de antemano para repartirlos.[/bold red]")
+            sys.exit(1)
+        if args.shard_workers < 0 or args.shard_range < 1 or args.shard_lease <= 0:
+            console.print("[bold red]Error: --shard-workers no puede ser negativo, y --shard-range y --shard-lease deben ser mayores que 0.[/bold red]")
+            sys.exit(1)
+
+    if args.plan and args.batch:
+        console.print("[bold red]Error: --plan estima un solo libro; no admite --batch.[/bold red]")
+        sys.exit(1)
+
+    if args.batch:
+        from audiolibro_batch import collect_text_files, describe_collisions, output_collisions, process_batch # Importación local
+        text_files = collect_text_files(args.batch)
+        if not text_files:
+            console.print("[bold red]Error: No se encontraron archivos .txt para el modo por lotes.[/bold red]")
+            sys.exit(1)
+        collisions = output_collisions(text_files)
+        if collisions:
+            # Cada libro se guarda con el nombre de su archivo: dos con el mismo nombre se pisarían.
+            console.print(f"[bold red]Error: Varios libros generarían el mismo archivo de salida: {describe_collisions(collisions)}. "
+                          "Renombra uno de ellos o conviértelos en lotes separados.[/bold red]")
+            sys.exit(1)
+        if args.output_file:
+            console.print("[yellow]ADVERTENCIA:[/yellow] --output-file se ignora en modo por lotes; cada libro usa su nombre.")
+    else:
+        # Fuera del modo por lotes, el archivo de texto de entrada es siempre requerido para la creación.
+        if not args.text_file:
+            console.print("[bold red]Error: El argumento --text-file (-t) es requerido para crear un audiolibro.[/bold red]")
+            parser.print_help()
+            sys.exit(1)
+
+        # Validar que el archivo de entrada existe
+        if not os.path.isfile(args.text_file):
+            console.print(f"[bold red]Error: El archivo de entrada '{args.text_file}' no existe o no es un archivo válido.[/bold red]")
+            sys.exit(1)
+
+        if args.plan:
+            await plan_audiobook(args, backend)
+            return
+
+        output_file = resolve_output_file(args.text_file, args.output_file)
+
+    # La voz se comprueba antes de empezar: un error de escritura no debe descubrirse tras horas de trabajo.
+    try:
+        await catalogue.get()
+    except Exception as e:
+        console.print(f"[yellow]ADVERTENCIA:[/yellow] No se pudo obtener el catálogo de voces ({e}); no se comprueba la voz.")
+    else:
+        if catalogue.find(args.voice) is None:
+            console.print(f"[bold red]Error: {catalogue.unknown_voice_message(args.voice)}. Usa --list-voices para verlas todas.[/bold red]")
+            sys.exit(1)
+
+    cache = None if args.no_cache else SynthesisCache(args.cache_dir, args.cache_size)
+    hedging = HedgePolicy(args.hedge, args.hedge_budget) if args.hedge is not None else None
+    chunk_size = args.chunk_size
+    if chunk_size == "auto":
+        # Un solo modelo para toda la ejecución: en modo por lotes, cada libro aprovecha lo medido en los anteriores.
+        chunk_size = ThroughputModel(CHUNK_MAX_SIZE)
+        if args.metrics:
+            history = chunk_size.load_history(args.metrics)
+            if history:
+                console.print(f"[cyan]Tamaño automático de fragmento: se parte de {history} fragmentos del historial de métricas ({chunk_size.describe()}).[/cyan]")
+    metrics = MetricsRecorder(args.metrics, args.metrics_prometheus) if args.metrics else None
+
+    if args.shard:
+        # El coordinador no sintetiza: el motor lo abren los trabajadores.
+        from audiolibro_shard import process_sharded_creation, worker_argv # Importación local
+        try:
+            await process_sharded_creation(args.text_file, output_file, args.voice, args.rate, args.chunking_strategy, args.shard,
+                                           workers=args.shard_workers, worker_arguments=worker_argv(args), range_size=args.shard_range,
+                                           lease_seconds=args.shard_lease, chunk_size=chunk_size, incremental=args.incremental,
+                                           concat_engine=args.concat_engine, dedup=not args.no_dedup, metrics=metrics)
+        finally:
+            if metrics is not None:
+                metrics.close()
+        return
+
+    # Las conexiones del motor se comparten entre todos los fragmentos (y libros) de la ejecución.
+    await backend.open(args.concurrency)
+    try:
+        if args.batch:
+            results = await process_batch(text_files, args.voice, args.retries, args.rate, args.chunking_strategy, concurrency=args.concurrency, cache=cache, streaming=args.streaming, incremental=args.incremental, concat_engine=args.concat_engine, max_active_jobs=args.batch_jobs, metrics=metrics, backend=backend, chunk_size=chunk_size, chunk_timeout=args.chunk_timeout, hedging=hedging, progressive=args.progressive, dedup=not args.no_dedup, latency_backoff=args.latency_backoff)
+            if any(error for _, error, _ in results.values()):
+                sys.exit(1)
+        else:
+            await process_audiobook_creation(args.text_file, output_file, args.voice, args.retries, args.rate, args.chunking_strategy, concurrency=args.concurrency, cache=cache, streaming=args.streaming, incremental=args.incremental, concat_engine=args.concat_engine, metrics=metrics, backend=backend, chunk_size=chunk_size, chunk_timeout=args.chunk_timeout, hedging=hedging, progressive=args.progressive, dedup=not args.no_dedup, latency_backoff=args.latency_backoff)
+    finally:
+        await backend.close()
+        # Las métricas se escriben también si el proceso falla o se interrumpe.
+        if metrics is not None:
+            metrics.close()
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,118 @@
+import hashlib
+import os
+import re
+import unicodedata
+from collections import Counter
+
+# --- Constantes ---
+# Coste fijo de cada petición al servicio, expresado en caracteres de texto sintetizado (es el
+# tamaño por debajo del cual domina; ver MIN_AUTO_CHUNK_SIZE). Un párrafo repetido más corto no
+# compensa aislarlo: partir el grupo que lo contiene cuesta más de lo que ahorra reutilizar su audio.
+REQUEST_COST_CHARS = 500
+HORIZONTAL_SPACE_RE = re.compile(r"[^\S\n]+")  # Espacios, tabuladores y similares, pero no saltos de línea
+
+def normalize_segment(text: str) -> str:
+    """Forma canónica de un texto para compararlo: Unicode NFC y espacios colapsados dentro de cada línea.
+
+    Los saltos de línea se conservan: un salto de párrafo cambia la pausa de la lectura, así que
+    un texto que termina en uno no puede reutilizar el audio de otro que no.
+    """
+    text = unicodedata.normalize("NFC", text).replace("\r\n", "\n").replace("\r", "\n")
+    return "\n".join(HORIZONTAL_SPACE_RE.sub(" ", line).strip() for line in text.split("\n"))
+
+def _digest(text: str) -> bytes:
+    return hashlib.blake2b(normalize_segment(text).encode("utf-8"), digest_size=16).digest()
+
+def repeated_paragraphs(paragraphs, min_chars: int = 0) -> set:
+    """Huellas de los párrafos de al menos `min_chars` caracteres que aparecen más de una vez."""
+    counts = Counter(_digest(p) for p in paragraphs if len(p) >= min_chars)
+    return {digest for digest, count in counts.items() if count > 1}
+
+def _synthesis_cost(chunks: list[str]) -> int:
+    """Coste, en caracteres, de sintetizar `chunks` enviando cada texto distinto una sola vez."""
+    unique = {_digest(chunk): len(chunk) for chunk in chunks if chunk.strip()}
+    return len(unique) * REQUEST_COST_CHARS + sum(unique.values())
+
+class DedupPlanner:
+    """Planifica la síntesis de un libro para que cada texto distinto se pida una sola vez.
+
+    `original` detecta los fragmentos idénticos, tras normalizar, a uno anterior: esos no se
+    envían al servicio y reciben una copia de su audio cuando está listo (`reuse`). Con el texto
+    completo, `plan` decide además si conviene que los párrafos repetidos largos vayan en su
+    propio fragmento (un párrafo ya se lee con una pausa, así que aislarlo no cambia la
+    entonación); en modo streaming o con tamaño automático solo se reutilizan los fragmentos
+    que ya salen idénticos.
+
+    `requests_saved` y `chars_saved` se cuentan frente a fragmentar sin deduplicar; aislar
+    párrafos puede ahorrar caracteres a cambio de alguna petición más (`requests_saved` negativo).
+    """
+
+    def __init__(self):
+        self.requests_saved = 0
+        self.chars_saved = 0
+        self._first = {}  # Huella del texto -> índice del primer fragmento con él
+        self._ready = set()  # Fragmentos originales que ya tienen su audio
+        self._waiting = {}  # Índice original -> [(índice, texto)] de sus copias pendientes
+
+    def plan(self, chunker, paragraphs: list[str]) -> list[str]:
+        """Fragmentos del libro: `chunker(standalone)` fragmenta aislando los párrafos para los que
+        `standalone(párrafo)` es verdadero (o ninguno si es None).
+
+        Los párrafos repetidos largos se aíslan solo si así la síntesis cuesta menos, contando
+        cada petición como REQUEST_COST_CHARS caracteres más.
+        """
+        plain = chunker(None)
+        repeated = repeated_paragraphs(paragraphs, REQUEST_COST_CHARS)
+        if not repeated:
+            return plain
+        isolated = chunker(lambda paragraph: _digest(paragraph) in repeated)
+        if _synthesis_cost(isolated) >= _synthesis_cost(plain):
+            return plain
+        # Aislar añade fragmentos (y quita separadores); las copias tienen que compensarlo.
+        self.requests_saved = len(plain) - len(isolated)
+        self.chars_saved = sum(map(len, plain)) - sum(map(len, isolated))
+        return isolated
+
+    def original(self, index: int, chunk: str):
+        """Índice del fragmento anterior con el mismo texto, o None si hay que sintetizarlo."""
+        if not chunk.strip():
+            return None
+        first = self._first.setdefault(_digest(chunk), index)
+        if first == index:
+            return None
+        self.requests_saved += 1
+        self.chars_saved += len(chunk)
+        return first
+
+    def resumed(self, index: int, chunk: str):
+        """Registra un fragmento cuyo audio ya existía (reanudación); sus repeticiones lo reutilizan."""
+        if chunk.strip():
+            self._first.setdefault(_digest(chunk), index)
+        self._ready.add(index)
+
+    def defer(self, index: int, chunk: str, source: int) -> bool:
+        """Aplaza la copia `index` hasta que `source` tenga audio; False si ya lo tiene."""
+        if source in self._ready:
+            return False
+        self._waiting.setdefault(source, []).append((index, chunk))
+        return True
+
+    def ready(self, index: int) -> list:
+        """Marca el fragmento `index` como listo; devuelve las copias [(índice, texto)] que esperaban por él."""
+        self._ready.add(index)
+        return self._waiting.pop(index, [])
+
+    @staticmethod
+    def reuse(locate, source: int, target_path: str):
+        """Escribe en `target_path` el audio del fragmento `source` (esté suelto o ya en la salida parcial)."""
+        path, offset, size = locate(source)
+        try:
+            with open(path, "rb") as f:
+                f.seek(offset)
+                data = f.read() if size is None else f.read(size)
+        except FileNotFoundError:
+            return  # El original no tenía texto pronunciable: la copia tampoco tiene audio
+        partial_path = target_path + ".part"
+        with open(partial_path, "wb") as f:
+            f.write(data)
+        os.replace(partial_path, target_path)
@@ -0,0 +1,261 @@
+import asyncio
+import json
+import time
+from collections import deque
+from xml.sax.saxutils import escape, unescape
+
+import aiohttp
+from edge_tts.exceptions import NoAudioReceived, UnexpectedResponse, UnknownResponse, WebSocketError
+
+# Las conexiones reutilizables se apoyan en partes internas de edge-tts que no son API pública y
+# pueden cambiar entre versiones (probadas con la indicada en requirements.txt). Si alguna falta,
+# POOL_SUPPORTED queda en False y EdgeTTSBackend usa edge_tts.Communicate, una conexión por fragmento.
+try:
+    import edge_tts.communicate as edge_communicate
+    from edge_tts.communicate import (
+        _SSL_CTX, connect_id, date_to_string, get_headers_and_data, mkssml,
+        remove_incompatible_characters, split_text_by_byte_length, ssml_headers_plus_data,
+    )
+    from edge_tts.constants import MP3_BITRATE_BPS, SEC_MS_GEC_VERSION, TICKS_PER_SECOND, WSS_HEADERS
+    from edge_tts.data_classes import TTSConfig
+    from edge_tts.drm import DRM
+    POOL_SUPPORTED = hasattr(edge_communicate, "WSS_URL")
+except ImportError:
+    POOL_SUPPORTED = False
+
+# --- Constantes ---
+CONNECT_TIMEOUT = 10  # Segundos para abrir una conexión (como edge-tts)
+RECEIVE_TIMEOUT = 60  # Segundos máximos sin recibir nada del servicio (como edge-tts)
+IDLE_TIMEOUT = 20.0  # Las conexiones inactivas más tiempo se cierran en lugar de reutilizarse
+MAX_TEXT_BYTES = 4096  # Tamaño máximo de cada turno SSML, el mismo que usa edge-tts
+
+class EdgeTTSConnectionError(WebSocketError):
+    """La conexión se cerró o se rompió antes de terminar el turno."""
+
+class EdgeTTSConnection:
+    """Una conexión websocket con el servicio de edge-tts que admite varios turnos seguidos.
+
+    edge-tts abre una conexión nueva (TCP, TLS y handshake websocket) para cada texto; aquí la
+    conexión se mantiene abierta y cada fragmento se envía como un turno SSML más. A diferencia
+    de edge-tts, un turno solo se da por bueno si llega su turn.end: un corte a mitad de audio es
+    un error y no un fragmento truncado.
+    """
+
+    def __init__(self, session: aiohttp.ClientSession):
+        self.session = session
+        self.ws = None
+        self.turns = 0
+        self.last_used = time.monotonic()
+        self._boundary = None  # Tipo de límites configurado en esta conexión
+
+    async def open(self):
+        for attempt in range(2):
+            try:
+                # La URL se lee en cada conexión para respetar redirecciones (servidor de pruebas).
+                self.ws = await self.session.ws_connect(
+                    f"{edge_communicate.WSS_URL}&ConnectionId={connect_id()}"
+                    f"&Sec-MS-GEC={DRM.generate_sec_ms_gec()}"
+                    f"&Sec-MS-GEC-Version={SEC_MS_GEC_VERSION}",
+                    compress=15,
+                    headers=DRM.headers_with_muid(WSS_HEADERS),
+                    ssl=_SSL_CTX,
+                )
+                return
+            except aiohttp.ClientResponseError as e:
+                # Un 403 suele deberse a la diferencia de reloj con el servicio: se corrige y se reintenta.
+                if e.status != 403 or attempt:
+                    raise
+                DRM.handle_client_response_error(e)
+
+    @property
+    def closed(self) -> bool:
+        return self.ws is None or self.ws.closed
+
+    async def close(self):
+        if self.ws is not None:
+            await self.ws.close()
+
+    async def _configure(self, boundary: str):
+        if boundary == self._boundary:
+            return
+        word_boundary = boundary == "WordBoundary"
+        await self.ws.send_str(
+            f"X-Timestamp:{date_to_string()}\r\n"
+            "Content-Type:application/json; charset=utf-8\r\n"
+            "Path:speech.config\r\n\r\n"
+            '{"context":{"synthesis":{"audio":{"metadataoptions":{'
+            f'"sentenceBoundaryEnabled":"{str(not word_boundary).lower()}",'
+            f'"wordBoundaryEnabled":"{str(word_boundary).lower()}"'
+            "},"
+            '"outputFormat":"audio-24khz-48kbitrate-mono-mp3"'
+            "}}}}\r\n"
+        )
+        self._boundary = boundary
+
+    async def synthesize(self, text: str, voice: str, rate: str, output, on_boundary=None) -> int:
+        """Sintetiza `text` escribiendo el audio en el archivo abierto `output`. Devuelve los bytes de audio."""
+        boundary = "WordBoundary" if on_boundary is not None else "SentenceBoundary"
+        config = TTSConfig(voice, rate, "+0%", "+0Hz", boundary)
+        try:
+            await self._configure(boundary)
+        except (aiohttp.ClientConnectionError, ConnectionError) as e:
+            raise EdgeTTSConnectionError(f"No se pudo configurar la conexión: {e}") from e
+        audio_bytes = 0
+        for part in split_text_by_byte_length(escape(remove_incompatible_characters(text)), MAX_TEXT_BYTES):
+            # Los tiempos de cada parte empiezan en cero: se desplazan por el audio ya recibido (CBR).
+            offset = audio_bytes * 8 * TICKS_PER_SECOND // MP3_BITRATE_BPS
+            try:
+                await self.ws.send_str(ssml_headers_plus_data(connect_id(), date_to_string(), mkssml(config, part)))
+            except (aiohttp.ClientConnectionError, ConnectionError) as e:
+                raise EdgeTTSConnectionError(f"No se pudo enviar el texto: {e}") from e
+            audio_bytes += await self._receive_turn(output, on_boundary, offset)
+        self.turns += 1
+        self.last_used = time.monotonic()
+        return audio_bytes
+
+    async def _receive_turn(self, output, on_boundary, offset: int) -> int:
+        received_audio = 0
+        while True:
+            message = await self.ws.receive(timeout=RECEIVE_TIMEOUT)
+            if message.type == aiohttp.WSMsgType.TEXT:
+                data = message.data.encode("utf-8")
+                parameters, body = get_headers_and_data(data, data.find(b"\r\n\r\n"))
+                path = parameters.get(b"Path")
+                if path == b"audio.metadata":
+                    if on_boundary is not None:
+                        for meta in json.loads(body)["Metadata"]:
+                            if meta["Type"] == "WordBoundary":
+                                on_boundary((meta["Data"]["Offset"] + offset) / TICKS_PER_SECOND,
+                                            meta["Data"]["Duration"] / TICKS_PER_SECOND,
+                                            unescape(meta["Data"]["text"]["Text"]))
+                elif path == b"turn.end":
+                    if not received_audio:
+                        raise NoAudioReceived("No audio was received. Please verify that your parameters are correct.")
+                    return received_audio
+                elif path not in (b"response", b"turn.start"):
+                    raise UnknownResponse("Unknown path received")
+            elif message.type == aiohttp.WSMsgType.BINARY:
+                if len(message.data) < 2:
+                    raise UnexpectedResponse("We received a binary message, but it is missing the header length.")
+                header_length = int.from_bytes(message.data[:2], "big")
+                parameters, body = get_headers_and_data(message.data, header_length)
+                if parameters.get(b"Path") != b"audio":
+                    raise UnexpectedResponse("Received binary message, but the path is not audio.")
+                if parameters.get(b"Content-Type") is None:
+                    if body:
+                        raise UnexpectedResponse("Received binary message with no Content-Type, but with data.")
+                    continue
+                output.write(body)
+                received_audio += len(body)
+            elif message.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSING, aiohttp.WSMsgType.CLOSED):
+                raise EdgeTTSConnectionError("El servicio cerró la conexión antes de terminar el turno.")
+            elif message.type == aiohttp.WSMsgType.ERROR:
+                raise WebSocketError(message.data if message.data else "Unknown error")
+
+class EdgeTTSConnectionPool:
+    """Conexiones websocket reutilizables con el servicio, compartidas por los trabajadores.
+
+    Como mucho hay `max_connections` conexiones abiertas (en uso o inactivas). Cuando se entrega
+    la última conexión inactiva se abre otra en segundo plano, de modo que el siguiente fragmento
+    encuentra una conexión ya preparada en lugar de esperar al handshake. Las conexiones que
+    fallan o llevan demasiado tiempo inactivas se cierran y se sustituyen por otras nuevas.
+    Todas comparten una única sesión HTTP, que es la propietaria del conector.
+    """
+
+    def __init__(self, max_connections: int = 0):
+        self.max_connections = max_connections  # 0 = sin límite
+        self.opened = 0
+        self.reused = 0
+        self.recycled = 0
+        self._session = None
+        self._idle = deque()
+        self._open_count = 0  # Conexiones abiertas o abriéndose
+        self._spare = None  # Tarea que abre la conexión de reserva
+        self._available = None
+
+    def _has_room(self) -> bool:
+        return not self.max_connections or self._open_count < self.max_connections
+
+    async def _new_connection(self) -> EdgeTTSConnection:
+        if self._session is None or self._session.closed:
+            timeout = aiohttp.ClientTimeout(total=None, connect=None, sock_connect=CONNECT_TIMEOUT, sock_read=RECEIVE_TIMEOUT)
+            self._session = aiohttp.ClientSession(trust_env=True, timeout=timeout)
+        connection = EdgeTTSConnection(self._session)
+        self._open_count += 1
+        try:
+            await connection.open()
+        except BaseException:
+            self._open_count -= 1
+            self._notify()
+            raise
+        self.opened += 1
+        return connection
+
+    async def _open_spare(self):
+        try:
+            self._idle.append(await self._new_connection())
+            self._notify()
+        except Exception:
+            pass  # La conexión se abrirá cuando se necesite y entonces se verá el error.
+        finally:
+            self._spare = None
+
+    def _prepare_spare(self):
+        if not self._idle and self._spare is None and self._has_room():
+            self._spare = asyncio.ensure_future(self._open_spare())
+
+    def _notify(self):
+        if self._available is not None and not self._available.done():
+            self._available.set_result(None)
+
+    async def acquire(self) -> EdgeTTSConnection:
+        """Entrega una conexión preparada, abriendo una nueva si no hay ninguna inactiva."""
+        while True:
+            while self._idle:
+                connection = self._idle.popleft()
+                if connection.closed or time.monotonic() - connection.last_used > IDLE_TIMEOUT:
+                    await self._discard(connection)
+                    continue
+                self.reused += 1
+                self._prepare_spare()
+                return connection
+            if self._has_room():
+                connection = await self._new_connection()
+                self._prepare_spare()
+                return connection
+            # Todas las conexiones están en uso (o abriéndose): se espera a que se libere una.
+            if self._available is None or self._available.done():
+                self._available = asyncio.get_running_loop().create_future()
+            # shield: cancelar a un trabajador en espera no debe despertar a los demás con el error.
+            await asyncio.shield(self._available)
+
+    async def release(self, connection: EdgeTTSConnection, healthy: bool):
+        """Devuelve la conexión; si el turno falló, se cierra para no reutilizar un estado dudoso."""
+        if healthy and not connection.closed:
+            self._idle.append(connection)
+        else:
+            self.recycled += 1
+            await self._discard(connection)
+        self._notify()
+
+    async def _discard(self, connection: EdgeTTSConnection):
+        self._open_count -= 1
+        try:
+            await connection.close()
+        except Exception:
+            pass
+        self._notify()
+
+    async def close(self):
+        """Cierra todas las conexiones inactivas y la sesión HTTP."""
+        if self._spare is not None:
+            self._spare.cancel()
+            await asyncio.gather(self._spare, return_exceptions=True)
+        while self._idle:
+            await self._discard(self._idle.popleft())
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def stats(self) -> dict:
+        return {"opened": self.opened, "reused": self.reused, "recycled": self.recycled}
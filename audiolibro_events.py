@@ -0,0 +1,71 @@
+import threading
+
+class CancellationToken:
+    """Petición de cancelación que puede hacerse desde cualquier hilo.
+
+    Quien ejecuta el trabajo enlaza su tarea con `bind`; `cancel` (por ejemplo, desde el botón
+    Detener de la GUI) la cancela dentro de su propio bucle de eventos. Las peticiones en curso se
+    abortan en su siguiente punto de espera y los bloques finally guardan el estado para reanudar.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cancelled = False
+        self._tasks = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def cancel(self):
+        """Pide la cancelación; solo tiene efecto la primera vez."""
+        with self._lock:
+            if self._cancelled:
+                return
+            self._cancelled = True
+            tasks = list(self._tasks)
+        for task in tasks:
+            task.get_loop().call_soon_threadsafe(task.cancel)
+
+    def bind(self, task):
+        """Cancela `task` cuando se pida (enseguida si ya se pidió); devuelve la función que deshace el enlace."""
+        with self._lock:
+            self._tasks.append(task)
+            cancelled = self._cancelled
+        if cancelled:
+            task.get_loop().call_soon_threadsafe(task.cancel)
+
+        def unbind():
+            with self._lock:
+                if task in self._tasks:
+                    self._tasks.remove(task)
+        return unbind
+
+class ProgressChannel:
+    """Canal entre el hilo de síntesis y la interfaz que agrupa las actualizaciones.
+
+    El orquestador publica con `progress` y `status` tantas veces como quiera (una por fragmento);
+    el canal solo conserva el último valor de cada uno y la interfaz lo recoge con `poll` a su
+    propio ritmo, de modo que recibe como mucho una actualización por intervalo de sondeo por
+    grande que sea el libro.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._progress = None
+        self._status = None
+
+    def progress(self, current: int, total: int):
+        with self._lock:
+            self._progress = (current, total)
+
+    def status(self, text: str):
+        with self._lock:
+            self._status = text
+
+    def poll(self) -> tuple:
+        """(progreso, estado) publicados desde la última llamada; cada uno es None si no ha cambiado."""
+        with self._lock:
+            progress, status = self._progress, self._status
+            self._progress = self._status = None
+        return progress, status
@@ -10,9 +10,21 @@ import queue
 
 # Importar las funciones del script original
 from audiolibro_creator import (
-    create_arg_parser, list_available_voices, process_audiobook_creation,
-    DEFAULT_OUTPUT_DIR, console, suppress_asyncio_exceptions
+    process_audiobook_creation,
+    DEFAULT_OUTPUT_DIR, DEFAULT_CONCURRENCY, DEFAULT_VOICE, suppress_asyncio_exceptions
 )
+from audiolibro_backends import EdgeTTSBackend
+from audiolibro_cache import SynthesisCache
+from audiolibro_events import CancellationToken, ProgressChannel
+from audiolibro_metrics import MetricsRecorder
+from audiolibro_plan import BookPlan, PlanEstimator, DEFAULT_HISTORY_FILE, describe_estimate
+from audiolibro_voices import VoiceCatalogue
+
+# --- Constantes ---
+GENDER_LABELS = {"Todos": None, "Mujer": "Female", "Hombre": "Male"}  # Filtro de la ventana de voces
+FALLBACK_VOICES = ["es-ES-AlvaroNeural", "es-MX-DaliaNeural", "es-ES-ElviraNeural"]  # Sin catálogo guardado ni conexión
+PROGRESS_INTERVAL_MS = 200  # Cada cuánto se refleja en la ventana el último progreso publicado
+ESTIMATE_DELAY_MS = 500  # Pausa tras el último cambio de la configuración antes de recalcular la estimación
 
 # Configurar CustomTkinter
 ctk.set_appearance_mode("dark")
@@ -27,20 +39,43 @@ class AudiobookCreatorGUI:
         # Variables
         self.text_file_path = tk.StringVar()
         self.output_file_name = tk.StringVar()
-        self.selected_voice = tk.StringVar(value="es-ES-AlvaroNeural")
+        self.selected_voice = tk.StringVar(value=DEFAULT_VOICE)
         self.rate_value = tk.StringVar(value="-5%")
         self.chunking_strategy = tk.StringVar(value="smart")
         self.retries_value = tk.IntVar(value=3)
+        self.concurrency_value = tk.IntVar(value=DEFAULT_CONCURRENCY)
+        self.use_cache = tk.BooleanVar(value=True)
+        self.record_history = tk.BooleanVar(value=False)  # Como --metrics en la CLI: solo si se pide
 
         # Cola para comunicación entre hilos
         self.log_queue = queue.Queue()
+        # Progreso y estado del proceso: se guarda solo el último y se muestra a intervalos fijos
+        self.progress_channel = ProgressChannel()
+        self.cancel_token = None
+
+        # Catálogo de voces guardado en disco: las listas se rellenan al instante
+        self.voice_catalogue = VoiceCatalogue(EdgeTTSBackend())
+        self.voices_listbox = None
 
         # Variables de progreso
         self.start_time = None
         self.total_chunks = 0
+
+        # Estimación previa: se recalcula en segundo plano y solo se muestra la más reciente
+        self.estimator = None  # Historial de métricas leído; se vuelve a leer tras cada audiolibro
+        self.estimate_job = None
+        self.estimate_generation = 0
         
         self.setup_ui()
+        for variable in (self.text_file_path, self.selected_voice, self.rate_value, self.chunking_strategy,
+                         self.concurrency_value, self.use_cache):
+            variable.trace_add("write", self.schedule_estimate)
         self.update_log()
+        self.poll_progress()
+        self.fill_voice_combo()
+        if self.voice_catalogue.stale:
+            # Se renueva en segundo plano; mientras, se usa la copia guardada (o la lista mínima).
+            self.voice_catalogue.refresh_in_thread(lambda voices, error: self.root.after(0, self.on_voices_refreshed, error))
     
     def setup_ui(self):
         # Frame principal
@@ -105,7 +140,7 @@ class AudiobookCreatorGUI:
         ctk.CTkLabel(voice_row, text="Voz:").pack(side="left", padx=(10,10))
         self.voice_combo = ctk.CTkComboBox(
             voice_row, 
-            values=["es-ES-AlvaroNeural", "es-MX-DaliaNeural", "es-ES-ElviraNeural"],
+            values=FALLBACK_VOICES,
             variable=self.selected_voice,
             width=200
         )
@@ -148,6 +183,38 @@ class AudiobookCreatorGUI:
         self.retries_spinbox = ctk.CTkEntry(retries_row, textvariable=self.retries_value, width=80)
         self.retries_spinbox.pack(side="left", padx=(0,10))
         
+        # Concurrencia
+        concurrency_row = ctk.CTkFrame(voice_frame)
+        concurrency_row.pack(fill="x", padx=10, pady=5)
+        
+        ctk.CTkLabel(concurrency_row, text="Concurrencia:").pack(side="left", padx=(10,10))
+        self.concurrency_entry = ctk.CTkEntry(concurrency_row, textvariable=self.concurrency_value, width=80)
+        self.concurrency_entry.pack(side="left", padx=(0,10))
+        ctk.CTkLabel(concurrency_row, text="(fragmentos sintetizándose a la vez)").pack(side="left")
+        
+        # Caché de síntesis
+        cache_row = ctk.CTkFrame(voice_frame)
+        cache_row.pack(fill="x", padx=10, pady=5)
+        
+        ctk.CTkCheckBox(
+            cache_row,
+            text="Reutilizar fragmentos ya sintetizados (caché)",
+            variable=self.use_cache
+        ).pack(side="left", padx=(10,10))
+        ctk.CTkCheckBox(
+            cache_row,
+            text="Guardar historial para afinar la estimación",
+            variable=self.record_history
+        ).pack(side="left", padx=(10,10))
+        
+        # Estimación de duración, tamaño y tiempo antes de crear
+        estimate_row = ctk.CTkFrame(voice_frame)
+        estimate_row.pack(fill="x", padx=10, pady=5)
+        
+        ctk.CTkLabel(estimate_row, text="Estimación:").pack(side="left", padx=(10,10))
+        self.estimate_label = ctk.CTkLabel(estimate_row, text="(selecciona un archivo de texto)", anchor="w", text_color="gray")
+        self.estimate_label.pack(side="left", fill="x", expand=True)
+        
         # Botones de acción
         button_frame = ctk.CTkFrame(main_frame)
         button_frame.pack(fill="x", padx=20, pady=20)
@@ -222,55 +289,93 @@ class AudiobookCreatorGUI:
                 base_name = os.path.splitext(os.path.basename(file_path))[0]
                 self.output_file_name.set(base_name)
     
+    def voice_language(self) -> str:
+        """Idioma de la voz seleccionada (p. ej. 'es'), para filtrar las listas de voces."""
+        return self.selected_voice.get().split("-")[0]
+
+    def fill_voice_combo(self):
+        """Rellenar el desplegable con las voces del catálogo en el idioma de la voz seleccionada"""
+        voices = self.voice_catalogue.search(locale=self.voice_language())
+        if voices:
+            self.voice_combo.configure(values=[voice["ShortName"] for voice in voices])
+
+    def on_voices_refreshed(self, error):
+        """Actualizar las listas de voces tras renovar el catálogo (en el hilo principal)"""
+        if error is not None:
+            if not self.voice_catalogue.voices:
+                self.log_message(f"No se pudo obtener el catálogo de voces: {error}")
+            return
+        self.fill_voice_combo()
+        if self.voices_listbox is not None and self.voices_listbox.winfo_exists():
+            self.filter_voices()
+
     def show_voices_window(self):
         """Mostrar ventana con todas las voces disponibles"""
         voices_window = ctk.CTkToplevel(self.root)
         voices_window.title("Voces Disponibles")
         voices_window.geometry("600x400")
-        
-        # Crear lista de voces
-        voices_frame = ctk.CTkFrame(voices_window)
-        voices_frame.pack(fill="both", expand=True, padx=20, pady=20)
-        
-        ctk.CTkLabel(voices_frame, text="Cargando voces...", font=ctk.CTkFont(size=16)).pack(pady=20)
-        
-        # Ejecutar en hilo separado
-        def load_voices():
-            try:
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                voices = loop.run_until_complete(list_available_voices())
-                loop.close()
-                
-                # Actualizar UI en el hilo principal
-                self.root.after(0, lambda: self.update_voices_window(voices_window))
-            except Exception as e:
-                self.root.after(0, lambda: messagebox.showerror("Error", f"Error al cargar voces: {e}"))
-        
-        threading.Thread(target=load_voices, daemon=True).start()
-    
-    def update_voices_window(self, window):
-        """Actualizar ventana de voces con la lista cargada"""
-        # Limpiar contenido anterior
-        for widget in window.winfo_children():
-            widget.destroy()
-        
-        # Crear nueva interfaz
-        main_frame = ctk.CTkFrame(window)
+
+        main_frame = ctk.CTkFrame(voices_window)
         main_frame.pack(fill="both", expand=True, padx=20, pady=20)
-        
-        ctk.CTkLabel(main_frame, text="Voces Disponibles", font=ctk.CTkFont(size=18, weight="bold")).pack(pady=(0,20))
-        
-        # Crear scrollable frame para las voces
-        scroll_frame = ctk.CTkScrollableFrame(main_frame)
-        scroll_frame.pack(fill="both", expand=True)
-        
-        # Aquí podrías agregar las voces dinámicamente
-        # Por ahora, mostrar un mensaje
-        ctk.CTkLabel(scroll_frame, text="Usa el comando --list-voices en CLI para ver todas las voces").pack(pady=20)
-        
-        ctk.CTkButton(window, text="Cerrar", command=window.destroy).pack(pady=10)
-    
+
+        # Filtros: idioma o localidad (es, es-MX...), género y texto del nombre
+        filter_row = ctk.CTkFrame(main_frame)
+        filter_row.pack(fill="x", pady=(0,10))
+        self.voices_locale = tk.StringVar(value=self.voice_language())
+        self.voices_gender = tk.StringVar(value="Todos")
+        self.voices_query = tk.StringVar()
+        ctk.CTkLabel(filter_row, text="Idioma:").pack(side="left", padx=(10,5))
+        ctk.CTkEntry(filter_row, textvariable=self.voices_locale, width=70).pack(side="left", padx=(0,10))
+        ctk.CTkComboBox(
+            filter_row, values=list(GENDER_LABELS), variable=self.voices_gender,
+            width=100, command=lambda _: self.filter_voices()
+        ).pack(side="left", padx=(0,10))
+        ctk.CTkLabel(filter_row, text="Buscar:").pack(side="left", padx=(0,5))
+        ctk.CTkEntry(filter_row, textvariable=self.voices_query, width=150).pack(side="left")
+        for variable in (self.voices_locale, self.voices_query):
+            variable.trace_add("write", lambda *_: self.filter_voices())
+
+        list_frame = ctk.CTkFrame(main_frame)
+        list_frame.pack(fill="both", expand=True)
+        scrollbar = tk.Scrollbar(list_frame)
+        scrollbar.pack(side="right", fill="y")
+        self.voices_listbox = tk.Listbox(list_frame, yscrollcommand=scrollbar.set, font=("Consolas", 11))
+        self.voices_listbox.pack(side="left", fill="both", expand=True)
+        scrollbar.configure(command=self.voices_listbox.yview)
+        self.voices_listbox.bind("<Double-Button-1>", lambda _: self.select_listed_voice(voices_window))
+
+        self.voices_count_label = ctk.CTkLabel(main_frame, text="", text_color="gray")
+        self.voices_count_label.pack(anchor="w", pady=(5,0))
+        ctk.CTkButton(voices_window, text="Usar voz seleccionada", command=lambda: self.select_listed_voice(voices_window)).pack(side="left", padx=20, pady=10)
+        ctk.CTkButton(voices_window, text="Cerrar", command=voices_window.destroy).pack(side="right", padx=20, pady=10)
+
+        self.filter_voices()
+
+    def filter_voices(self):
+        """Mostrar en la ventana de voces las que cumplen los filtros"""
+        gender = self.voices_gender.get()
+        self.listed_voices = self.voice_catalogue.search(
+            locale=self.voices_locale.get().strip() or None,
+            gender=GENDER_LABELS.get(gender),
+            query=self.voices_query.get().strip() or None,
+        )
+        self.voices_listbox.delete(0, "end")
+        for voice in self.listed_voices:
+            self.voices_listbox.insert("end", f"{voice['ShortName']:<36}{voice.get('Gender', ''):<8}{voice.get('Locale', '')}")
+        if not self.voice_catalogue.voices:
+            self.voices_count_label.configure(text="Cargando voces...")
+        else:
+            self.voices_count_label.configure(text=f"{len(self.listed_voices)} de {len(self.voice_catalogue.voices)} voces (doble clic para usarla)")
+
+    def select_listed_voice(self, window):
+        """Usar la voz marcada en la ventana de voces"""
+        selection = self.voices_listbox.curselection()
+        if not selection:
+            return
+        self.selected_voice.set(self.listed_voices[selection[0]]["ShortName"])
+        self.fill_voice_combo()
+        window.destroy()
+
     def log_message(self, message):
         """Agregar mensaje al log"""
         timestamp = datetime.now().strftime("%H:%M:%S")
@@ -279,7 +384,7 @@ class AudiobookCreatorGUI:
 
     def update_status(self, status_text):
         """Actualizar zona de estado (sin acumular)"""
-        self.root.after(0, lambda: self.status_label.configure(text=status_text))
+        self.status_label.configure(text=status_text)
 
     def update_progress(self, current, total):
         """Actualizar barra de progreso y calcular tiempo estimado"""
@@ -291,7 +396,7 @@ class AudiobookCreatorGUI:
             self.total_chunks = total
 
         progress = current / total if total > 0 else 0
-        self.root.after(0, lambda: self.progress_bar.set(progress))
+        self.progress_bar.set(progress)
 
         # Calcular tiempo estimado
         if current > 0:
@@ -304,7 +409,20 @@ class AudiobookCreatorGUI:
             time_str = str(timedelta(seconds=int(estimated_remaining)))
 
             info_text = f"{percentage:.0f}% ({current}/{total}) - Tiempo restante: {time_str}"
-            self.root.after(0, lambda: self.time_label.configure(text=info_text))
+            self.time_label.configure(text=info_text)
+
+    def apply_progress(self):
+        """Mostrar el último progreso y estado publicados por el proceso"""
+        progress, status_text = self.progress_channel.poll()
+        if progress is not None:
+            self.update_progress(*progress)
+        if status_text is not None:
+            self.update_status(status_text)
+
+    def poll_progress(self):
+        """Recoger periódicamente el progreso; el proceso nunca programa eventos de Tk por fragmento"""
+        self.apply_progress()
+        self.root.after(PROGRESS_INTERVAL_MS, self.poll_progress)
     
     def update_log(self):
         """Actualizar área de logs desde la cola"""
@@ -319,6 +437,51 @@ class AudiobookCreatorGUI:
         # Programar próxima actualización
         self.root.after(100, self.update_log)
     
+    def schedule_estimate(self, *_):
+        """Recalcula la estimación cuando la configuración deja de cambiar durante ESTIMATE_DELAY_MS."""
+        if self.estimate_job is not None:
+            self.root.after_cancel(self.estimate_job)
+        self.estimate_job = self.root.after(ESTIMATE_DELAY_MS, self.start_estimate)
+
+    def start_estimate(self):
+        """Lanza el cálculo de la estimación en un hilo, con la configuración leída aquí."""
+        self.estimate_job = None
+        self.estimate_generation += 1
+        generation = self.estimate_generation
+        text_file = self.text_file_path.get()
+        if not os.path.isfile(text_file):
+            self.estimate_label.configure(text="(selecciona un archivo de texto)")
+            return
+        try:
+            concurrency = self.concurrency_value.get()
+        except tk.TclError:
+            concurrency = 0
+        if concurrency < 1:
+            self.estimate_label.configure(text="(concurrencia no válida)")
+            return
+        voice, rate, strategy = self.selected_voice.get(), self.rate_value.get(), self.chunking_strategy.get()
+        use_cache = self.use_cache.get()
+        self.estimate_label.configure(text="Calculando...")
+
+        def run_estimate():
+            try:
+                with open(text_file, 'r', encoding='utf-8') as f:
+                    plan = BookPlan(f.read(), strategy)
+                if self.estimator is None:
+                    self.estimator = PlanEstimator(DEFAULT_HISTORY_FILE)
+                cache = SynthesisCache() if use_cache else None
+                estimate = self.estimator.estimate(plan, voice, rate, concurrency, cache, EdgeTTSBackend().version)
+                text = describe_estimate(estimate)
+            except Exception as e:
+                text = f"(no se pudo estimar: {e})"
+            self.root.after(0, self.show_estimate, generation, text)
+
+        threading.Thread(target=run_estimate, daemon=True).start()
+
+    def show_estimate(self, generation: int, text: str):
+        if generation == self.estimate_generation:  # Descarta cálculos de una configuración anterior
+            self.estimate_label.configure(text=text)
+
     def create_audiobook(self):
         """Crear audiolibro en hilo separado"""
         if not self.text_file_path.get():
@@ -329,6 +492,19 @@ class AudiobookCreatorGUI:
             messagebox.showerror("Error", "El archivo de texto no existe")
             return
         
+        voice = self.selected_voice.get()
+        if self.voice_catalogue.voices and self.voice_catalogue.find(voice) is None:
+            messagebox.showerror("Error", f"{self.voice_catalogue.unknown_voice_message(voice).capitalize()}.")
+            return
+        
+        try:
+            concurrency = self.concurrency_value.get()
+        except tk.TclError:
+            concurrency = 0
+        if concurrency < 1:
+            messagebox.showerror("Error", "La concurrencia debe ser un número entero mayor o igual que 1")
+            return
+        
         # Deshabilitar botón durante el proceso
         self.create_button.configure(state="disabled")
         self.stop_button.configure(state="normal")
@@ -340,9 +516,13 @@ class AudiobookCreatorGUI:
         self.time_label.configure(text="")
         self.start_time = None
         self.total_chunks = 0
+        self.progress_channel.poll()  # Descarta lo que quedara del proceso anterior
+        cancel_token = self.cancel_token = CancellationToken()
         
         # Ejecutar en hilo separado
         def run_creation():
+            loop = None
+            metrics = None
             try:
                 # Preparar argumentos
                 output_file = self.output_file_name.get() + ".mp3" if self.output_file_name.get() else None
@@ -360,6 +540,11 @@ class AudiobookCreatorGUI:
                 asyncio.set_event_loop(loop)
                 loop.set_exception_handler(suppress_asyncio_exceptions)
 
+                cache = SynthesisCache() if self.use_cache.get() else None
+                # Con la opción marcada, el audiolibro queda en el historial con el que se calibra la estimación.
+                if self.record_history.get():
+                    metrics = MetricsRecorder(DEFAULT_HISTORY_FILE)
+
                 loop.run_until_complete(process_audiobook_creation(
                     self.text_file_path.get(),
                     output_file,
@@ -367,18 +552,38 @@ class AudiobookCreatorGUI:
                     self.retries_value.get(),
                     self.rate_value.get(),
                     self.chunking_strategy.get(),
-                    status_callback=self.update_status,
-                    progress_callback=self.update_progress
+                    status_callback=self.progress_channel.status,
+                    progress_callback=self.progress_channel.progress,
+                    concurrency=concurrency,
+                    cache=cache,
+                    metrics=metrics,
+                    cancel_token=cancel_token
                 ))
 
-                loop.close()
+                if cache is not None:
+                    cache_stats = cache.stats()
+                    self.log_message(f"Caché de síntesis: {cache_stats['hits']} aciertos, {cache_stats['misses']} fallos")
 
                 # Mostrar mensaje de éxito
                 self.root.after(0, lambda: messagebox.showinfo("Éxito", f"Audiolibro creado exitosamente:\n{output_file}"))
 
+            except asyncio.CancelledError:
+                self.progress_channel.status("Detenido")
+                self.log_message("Proceso detenido. Los fragmentos generados se conservan: "
+                                 "crea de nuevo el audiolibro con el mismo texto y nombre para reanudarlo.")
+            except SystemExit:
+                # El orquestador termina así cuando un fragmento agota sus reintentos.
+                self.root.after(0, lambda: messagebox.showerror("Error", "No se pudo crear el audiolibro: "
+                                                                 "un fragmento falló tras agotar los reintentos"))
             except Exception as e:
                 self.root.after(0, lambda: messagebox.showerror("Error", f"Error al crear audiolibro: {e}"))
             finally:
+                if loop is not None:
+                    loop.close()
+                if metrics is not None:
+                    metrics.close()
+                    self.estimator = None
+                    self.root.after(0, self.schedule_estimate)
                 # Restaurar botones
                 self.root.after(0, self.restore_buttons)
         
@@ -387,16 +592,24 @@ class AudiobookCreatorGUI:
     
     def stop_process(self):
         """Detener proceso de creación"""
-        # Implementar lógica de detención si es necesario
-        messagebox.showinfo("Info", "Proceso detenido")
-        self.restore_buttons()
+        # Se cancelan las peticiones en curso; los botones se restauran cuando termina el hilo,
+        # tras guardar el estado para reanudar.
+        if self.cancel_token is not None:
+            self.cancel_token.cancel()
+        self.stop_button.configure(state="disabled")
+        self.status_label.configure(text="Deteniendo...")
     
     def restore_buttons(self):
         """Restaurar estado de botones"""
+        self.apply_progress()  # Lo último que publicó el proceso antes de terminar
+        self.cancel_token = None
         self.create_button.configure(state="normal")
         self.stop_button.configure(state="disabled")
+        status_text = self.status_label.cget("text")
+        if status_text == "Detenido":
+            return
         self.progress_bar.set(1.0)
-        if "Completado" not in self.status_label.cget("text"):
+        if "Completado" not in status_text:
             self.status_label.configure(text="Listo")
             self.time_label.configure(text="")
     
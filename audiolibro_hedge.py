@@ -0,0 +1,106 @@
+import asyncio
+import os
+import time
+from collections import deque
+from audiolibro_rate import MIN_LATENCY_CHARS
+
+# --- Constantes ---
+DEFAULT_CHUNK_TIMEOUT = 120.0  # Segundos máximos de una petición de síntesis antes de darla por fallida
+DEFAULT_HEDGE_BUDGET = 0.1  # Peticiones duplicadas admitidas por cada petición normal
+HEDGE_MIN_SAMPLES = 20  # Peticiones medidas antes de empezar a duplicar
+HEDGE_WINDOW = 500  # Peticiones recientes con las que se calcula el percentil
+
+class HedgePolicy:
+    """Peticiones duplicadas ("hedging") para los fragmentos que tardan más de lo normal.
+
+    Si una petición supera el percentil `percentile` de la latencia de la ejecución, se lanza
+    una segunda petición idéntica y se usa la que termine antes; la otra se cancela. La
+    latencia se mide por carácter para comparar fragmentos de distinto tamaño. Como mucho se
+    duplica una fracción `budget` de las peticiones. El duplicado ocupa un turno del limitador de
+    simultáneas, así que mientras dura se retrasa otra petición en lugar de sumarse a las demás.
+    """
+
+    def __init__(self, percentile: float = 95.0, budget: float = DEFAULT_HEDGE_BUDGET):
+        self.percentile = percentile
+        self.budget = budget
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._costs = deque(maxlen=HEDGE_WINDOW)
+
+    def observe(self, chars: int, latency: float):
+        """Registra la duración de una petición correcta."""
+        self._costs.append(latency / max(chars, MIN_LATENCY_CHARS))
+
+    def hedge_delay(self, chars: int):
+        """Segundos tras los que se duplica una petición de `chars` caracteres (None: aún no se sabe)."""
+        if len(self._costs) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._costs)
+        cost = ordered[min(len(ordered) - 1, int(self.percentile / 100 * len(ordered)))]
+        return cost * max(chars, MIN_LATENCY_CHARS)
+
+    def _within_budget(self) -> bool:
+        return self.hedges < self.budget * self.requests
+
+    async def run(self, request, output_path: str, chars: int, limiter=None, timeout: float = None) -> str:
+        """Ejecuta `request(ruta)` con duplicado si tarda demasiado; devuelve la ruta del audio ganador.
+
+        `request` es una función que crea la corrutina de síntesis hacia la ruta indicada. La
+        petición principal ya tiene su turno en `limiter`; el duplicado toma otro y lo devuelve al terminar.
+        """
+        self.requests += 1
+        primary = asyncio.ensure_future(with_timeout(request(output_path), timeout))
+        attempts = {primary: output_path}
+        hedge = None
+        hedge_started = None
+        winner = None
+        try:
+            delay = self.hedge_delay(chars)
+            if delay is not None:
+                done, _ = await asyncio.wait({primary}, timeout=delay)
+                if not done and self._within_budget():
+                    hedge_started = limiter.acquire_now() if limiter is not None else time.monotonic()
+                    self.hedges += 1
+                    hedge = asyncio.ensure_future(with_timeout(request(output_path + ".hedge"), timeout))
+                    attempts[hedge] = output_path + ".hedge"
+
+            # Gana la primera petición que termina bien; si una falla, se espera a la otra.
+            pending = set(attempts)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = task
+                        if task is hedge:
+                            self.hedge_wins += 1
+                        return attempts[task]
+                    error = task.exception()
+            raise error
+        finally:
+            for task in attempts:
+                task.cancel()
+            await asyncio.gather(*attempts, return_exceptions=True)
+            if hedge is not None and limiter is not None:
+                success = None if hedge.cancelled() else hedge.exception() is None
+                limiter.release(hedge_started, success, chars)
+            # El audio de la petición perdedora (o a medio escribir) se descarta.
+            for task, path in attempts.items():
+                if task is not winner and os.path.exists(path):
+                    os.remove(path)
+
+    def describe(self) -> str:
+        return f"{self.hedges} peticiones duplicadas ({self.hedge_wins} más rápidas que la original)"
+
+    def stats(self) -> dict:
+        return {"requests": self.requests, "hedges": self.hedges, "hedge_wins": self.hedge_wins}
+
+async def with_timeout(coroutine, timeout: float):
+    """Espera a `coroutine` como mucho `timeout` segundos (sin límite si es 0 o None)."""
+    if not timeout:
+        return await coroutine
+    try:
+        return await asyncio.wait_for(coroutine, timeout)
+    except asyncio.TimeoutError:
+        raise TimeoutError(f"la petición de síntesis superó {timeout:g} s") from None
@@ -0,0 +1,354 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from audiolibro_pack import COMPACT_MIN_BYTES, ChunkStore
+
+# --- Constantes ---
+MANIFEST_FILENAME = "manifest.json"
+MANIFEST_VERSION = 1
+STASH_DIRNAME = "stash"  # Audio desplazado de versiones anteriores, que guardaban un archivo por fragmento
+SAVE_INTERVAL = 2.0  # Segundos mínimos entre escrituras del manifiesto durante la síntesis
+
+CHUNK_FILE_RE = re.compile(r"^chunk_(\d+)\.mp3$")
+
+def chunk_text_hash(text: str) -> str:
+    """Hash del texto de un fragmento tal y como se envía al servicio."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def _store_key(content_key: str) -> bytes:
+    """Clave del audio en el ChunkStore: el SHA-256 del contenido (texto, voz y velocidad)."""
+    return hashlib.sha256(content_key.encode("utf-8")).digest()
+
+class ResumeManifest:
+    """Manifiesto de reanudación guardado junto a los fragmentos temporales.
+
+    Registra para cada índice el hash del texto, la voz, la velocidad y el tamaño del audio
+    generado; los fragmentos que terminan sin audio (texto vacío o nada que pronunciar) llevan
+    además `silent`, para distinguirlos de los que aún no se han generado. El audio se guarda en un ChunkStore (un paquete con su índice) identificado por
+    ese contenido, así que al reanudar basta con consultar el índice en memoria: el audio de
+    un fragmento se reutiliza aunque su texto se haya desplazado a otro índice (por una edición
+    o un cambio de estrategia de fragmentación), y el que ya no aparece en el texto se descarta.
+
+    Con ensamblado incremental (`assembly_path`), los fragmentos ya añadidos a la salida parcial
+    no se leen del paquete: su entrada guarda la posición (`offset`) que ocupan en ella, contada
+    tras el hueco de `assembly_header` bytes reservado al principio para la cabecera Info/Xing, y
+    cuántas tramas y con qué bitrates aportan, para escribir esa cabecera al terminar.
+
+    Los fragmentos recién sintetizados llegan como `chunk_NNNN.mp3` sueltos y `record` los pasa
+    al paquete; los de directorios de versiones anteriores se importan al abrirlo.
+    """
+
+    def __init__(self, temp_dir: str, assembly_path: str = None):
+        self.temp_dir = temp_dir
+        self.path = os.path.join(temp_dir, MANIFEST_FILENAME)
+        self.stash_dir = os.path.join(temp_dir, STASH_DIRNAME)
+        self.assembly_path = os.path.abspath(assembly_path) if assembly_path else None
+        self.assembled_chunks = 0  # Fragmentos consecutivos desde el 0 ya presentes en la salida parcial
+        self.assembled_bytes = 0
+        self.assembly_header = 0  # Bytes reservados al principio de la salida parcial para la cabecera
+        self.reused = 0
+        self.relocated = 0
+        self.store = ChunkStore(temp_dir)
+        self._entries = {}
+        self._dirty = False
+        self._last_save = 0.0
+        self._compacted_at = 0  # Tamaño del paquete en la última comprobación de compactación
+        self._unassembled = set()  # Audio sacado de una salida parcial anterior que aún puede reubicarse
+
+        # Sin manifiesto (directorio de una versión anterior), se confía en los archivos
+        # existentes por índice, como hacía la reanudación original.
+        self._legacy = not os.path.exists(self.path)
+        self._previous = {}
+        previous_assembly = None
+        if not self._legacy:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("version") == MANIFEST_VERSION:
+                    self._previous = {int(i): entry for i, entry in data["chunks"].items()}
+                    previous_assembly = data.get("assembly")
+            except (OSError, ValueError, KeyError):
+                self._previous = {}
+
+        self._loose = self._import_loose_files()
+        # Solo se reubica audio de ejecuciones anteriores; el de esta lo reparte DedupPlanner.
+        self._reusable = set(self.store.keys())
+        self._assembly_intact = self._check_previous_assembly(previous_assembly)
+
+    @staticmethod
+    def _content_key(entry: dict) -> str:
+        return f"{entry['hash']}:{entry['voice']}:{entry['rate']}"
+
+    def _chunk_path(self, index: int) -> str:
+        return os.path.join(self.temp_dir, f"chunk_{index:04d}.mp3")
+
+    def _has_audio(self, entry: dict) -> bool:
+        """Indica si el audio de `entry` está completo (o si el fragmento no tiene audio a propósito)."""
+        if entry.get("silent"):
+            return entry["size"] == 0
+        return entry["size"] > 0 and self.store.length(_store_key(self._content_key(entry))) == entry["size"]
+
+    def _import_loose_files(self) -> dict:
+        """Pasa al paquete los archivos sueltos de una versión anterior (o de una síntesis interrumpida).
+
+        Devuelve {índice: ruta} de los que no se pueden identificar por no haber manifiesto:
+        se identifican al reclamarlos, como hacía la reanudación original.
+        """
+        loose = {}
+        for name in os.listdir(self.temp_dir):
+            match = CHUNK_FILE_RE.match(name)
+            if not match:
+                continue
+            index = int(match.group(1))
+            path = os.path.join(self.temp_dir, name)
+            entry = self._previous.get(index)
+            if self._legacy:
+                if os.path.getsize(path) > 0:
+                    loose[index] = path
+                    continue
+            elif entry is not None and "offset" not in entry and os.path.getsize(path) == entry["size"]:
+                key = _store_key(self._content_key(entry))
+                if key not in self.store:
+                    self.store.put_file(key, path)
+                    continue
+            os.remove(path)
+        if os.path.isdir(self.stash_dir):
+            for name in os.listdir(self.stash_dir):
+                # El nombre del audio apartado ya es el SHA-256 de su contenido.
+                self.store.put_file(bytes.fromhex(os.path.splitext(name)[0]), os.path.join(self.stash_dir, name))
+            shutil.rmtree(self.stash_dir)
+        return loose
+
+    # --- Ensamblado incremental ---
+    def _check_previous_assembly(self, previous_assembly) -> bool:
+        """Valida la salida parcial de la ejecución anterior; devuelve si puede seguir ampliándose."""
+        assembled = {i: e for i, e in self._previous.items() if "offset" in e}
+        old_path = previous_assembly.get("path") if previous_assembly else None
+        header = previous_assembly.get("header", 0) if previous_assembly else 0
+        if not assembled:
+            self._discard_assembly()
+            return self.assembly_path is not None
+        end = header + max(e["offset"] + e["size"] for e in assembled.values())
+        try:
+            usable = old_path is not None and os.path.getsize(old_path) >= end
+        except OSError:
+            usable = False
+
+        if not usable:
+            # El audio ensamblado se ha perdido: esos fragmentos tendrán que volver a generarse.
+            for i in assembled:
+                self._previous.pop(i)
+            self._discard_assembly()
+            return self.assembly_path is not None
+        if old_path != self.assembly_path:
+            # Otra salida u otro modo: el audio se recupera para reubicarlo y se descarta la salida parcial.
+            self._unassemble(old_path, header, assembled, truncate_at=None)
+            os.remove(old_path)
+            self._discard_assembly()
+            return self.assembly_path is not None
+
+        # Se descarta lo que se hubiera escrito tras la última entrada registrada.
+        with open(old_path, "r+b") as f:
+            f.truncate(end)
+        self.assembly_header = header
+        return True
+
+    def _discard_assembly(self):
+        """Borra una salida parcial cuyo contenido no registra el manifiesto (p. ej. tras un corte antes de guardarlo)."""
+        if self.assembly_path and os.path.exists(self.assembly_path):
+            os.remove(self.assembly_path)
+
+    def _unassemble(self, path: str, header: int, entries: dict, truncate_at):
+        """Pasa al paquete el audio de `entries` guardado en `path` (tras `header` bytes) y lo quita del manifiesto."""
+        with open(path, "rb") as source:
+            for i, entry in entries.items():
+                self._previous.pop(i)
+                if entry["size"] == 0:
+                    continue
+                source.seek(header + entry["offset"])
+                key = _store_key(self._content_key(entry))
+                self.store.put(key, source.read(entry["size"]))
+                self._unassembled.add(key)
+                self._reusable.add(key)
+        if truncate_at is not None:
+            with open(path, "r+b") as f:
+                f.truncate(truncate_at)
+
+    def _break_assembly(self):
+        """La salida parcial deja de coincidir con el texto a partir del fragmento actual."""
+        later = {i: e for i, e in self._previous.items() if "offset" in e}
+        if later:
+            self._unassemble(self.assembly_path, self.assembly_header, later,
+                             truncate_at=self.assembly_header + self.assembled_bytes)
+        self._assembly_intact = False
+
+    def is_assembled(self, index: int) -> bool:
+        return index < self.assembled_chunks
+
+    def reserve_assembly_header(self, size: int):
+        """Registra que la salida parcial empieza con `size` bytes reservados para la cabecera Info/Xing."""
+        self.assembly_header = size
+        self._dirty = True
+
+    def mark_assembled(self, index: int, size: int, frames: int = None, bitrates=None):
+        """Registra que el audio del fragmento `index` (`frames` tramas) se ha añadido al final de la salida parcial."""
+        # El tamaño pasa a ser el de las tramas añadidas, que es lo que ocupa en la salida.
+        self._entries[index]["offset"] = self.assembled_bytes
+        self._entries[index]["size"] = size
+        if frames is not None:
+            self._entries[index]["frames"] = frames
+            self._entries[index]["bitrates"] = sorted(bitrates or ())
+        self.assembled_chunks = index + 1
+        self.assembled_bytes += size
+        self._dirty = True
+        # El audio ensamblado ya no se lee del paquete; se libera de vez en cuando para que no
+        # ocupe tanto como la salida parcial.
+        if self.store.size - self._compacted_at >= COMPACT_MIN_BYTES:
+            self._compact_store()
+            self._compacted_at = self.store.size
+
+    # --- Reanudación ---
+    def claim(self, index: int, text: str, voice: str, rate: str) -> bool:
+        """Indica si el fragmento `index` ya tiene audio válido para `text`, reubicándolo si hace falta."""
+        entry = {"hash": chunk_text_hash(text), "voice": voice, "rate": rate}
+        key = self._content_key(entry)
+        store_key = _store_key(key)
+
+        if self._assembly_intact and index == self.assembled_chunks:
+            previous = self._previous.get(index)
+            if (previous is not None and "offset" in previous and self._content_key(previous) == key
+                    and previous["offset"] == self.assembled_bytes):
+                self._previous.pop(index)
+                self._keep(index, entry, previous["size"])
+                self.mark_assembled(index, previous["size"], previous.get("frames"), previous.get("bitrates"))
+                self.reused += 1
+                return True
+            self._break_assembly()
+
+        previous = self._previous.pop(index, None)
+        loose_path = self._loose.pop(index, None)
+        if previous is not None and self._content_key(previous) == key and self._has_audio(previous):
+            self._keep(index, entry, previous["size"])
+            self.reused += 1
+            return True
+        if loose_path is not None:
+            # Directorio sin manifiesto: se confía en el archivo de esa posición.
+            self.store.put_file(store_key, loose_path)
+            self._keep(index, entry, self.store.length(store_key))
+            self.reused += 1
+            return True
+
+        # El mismo contenido pudo estar en otra posición de la ejecución anterior.
+        size = self.store.length(store_key) if store_key in self._reusable else None
+        if not size:
+            return False
+        self._keep(index, entry, size)
+        self.relocated += 1
+        return True
+
+    def assembly_totals(self):
+        """(tramas, bitrates) del audio de la salida parcial, o None si alguna entrada no los registró."""
+        frames = 0
+        bitrates = set()
+        for entry in self._entries.values():
+            if "offset" in entry:
+                if "frames" not in entry:
+                    return None  # Ensamblado por una versión anterior
+                frames += entry["frames"]
+                bitrates.update(entry["bitrates"])
+        return frames, bitrates
+
+    def _keep(self, index: int, entry: dict, size: int):
+        self._entries[index] = dict(entry, size=size)
+        if not size:
+            self._entries[index]["silent"] = True
+        self._dirty = True
+
+    def locate(self, index: int) -> tuple:
+        """Dónde está el audio del fragmento `index`: (ruta, desplazamiento, tamaño).
+
+        Normalmente es su tramo dentro del paquete o, si ya se ha añadido a la salida parcial,
+        dentro de ella. Si no se ha registrado, es el archivo suelto del fragmento (tamaño None),
+        que no existe cuando el fragmento no tiene audio.
+        """
+        entry = self._entries.get(index)
+        if entry is not None:
+            if "offset" in entry:
+                return self.assembly_path, self.assembly_header + entry["offset"], entry["size"]
+            location = self.store.locate(_store_key(self._content_key(entry)))
+            if location is not None:
+                return self.store.path, location[0], location[1]
+        return self._chunk_path(index), 0, None
+
+    def read(self, index: int) -> bytes:
+        """Audio del fragmento registrado `index` guardado en el paquete (vacío si no tiene)."""
+        key = _store_key(self._content_key(self._entries[index]))
+        return self.store.read(key) if key in self.store else b""
+
+    def size(self, index: int) -> int:
+        """Tamaño en bytes del audio registrado para el fragmento `index`."""
+        return self._entries[index]["size"]
+
+    def record(self, index: int, text: str, voice: str, rate: str):
+        """Registra el audio recién sintetizado del fragmento `index` y pasa su archivo al paquete."""
+        path = self._chunk_path(index)
+        entry = {"hash": chunk_text_hash(text), "voice": voice, "rate": rate}
+        key = _store_key(self._content_key(entry))
+        if os.path.exists(path):
+            if key in self.store:
+                os.remove(path)  # Mismo contenido que otro fragmento: su audio ya está en el paquete
+            else:
+                self.store.put_file(key, path)
+        # Los fragmentos vacíos no generan audio y se registran con tamaño 0.
+        self._keep(index, entry, self.store.length(key) or 0)
+        if time.monotonic() - self._last_save >= SAVE_INTERVAL:
+            self.save()
+
+    def _compact_store(self):
+        """Libera del paquete el audio que ya no puede necesitarse."""
+        keep = {
+            _store_key(self._content_key(entry))
+            for entries in (self._entries, self._previous) for entry in entries.values() if "offset" not in entry
+        }
+        self.store.compact(keep | self._unassembled)
+
+    def drop_orphans(self, total_chunks: int):
+        """Elimina el audio que ya no corresponde a ningún fragmento del texto actual."""
+        if self._assembly_intact and any("offset" in e for e in self._previous.values()):
+            # El texto se ha acortado: sobra el final de la salida parcial.
+            with open(self.assembly_path, "r+b") as f:
+                f.truncate(self.assembly_header + self.assembled_bytes)
+        for path in self._loose.values():
+            os.remove(path)
+        self._loose.clear()
+        self._previous.clear()
+        self._unassembled.clear()
+        self._reusable.clear()
+        self._legacy = False
+        self._compact_store()
+        self._dirty = True
+        self.save()
+
+    def save(self):
+        """Escribe el manifiesto de forma atómica."""
+        if not self._dirty:
+            return
+        # Las entradas anteriores aún sin revisar se conservan por si la ejecución se interrumpe.
+        chunks = {str(i): entry for i, entry in self._previous.items()}
+        chunks.update({str(i): entry for i, entry in self._entries.items()})
+        data = {"version": MANIFEST_VERSION, "chunks": chunks}
+        if self.assembly_path:
+            data["assembly"] = {"path": self.assembly_path, "header": self.assembly_header}
+        partial_path = self.path + ".part"
+        with open(partial_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(partial_path, self.path)
+        self._dirty = False
+        self._last_save = time.monotonic()
+
+    def close(self):
+        """Cierra el paquete; el manifiesto se sigue pudiendo consultar (p. ej. para concatenar)."""
+        self.store.close()
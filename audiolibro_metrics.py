@@ -0,0 +1,212 @@
+import json
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+# --- Constantes ---
+# Límites superiores (s) de los intervalos del histograma de latencia de síntesis
+LATENCY_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+PHASES = ("read", "chunk", "synthesize", "concatenate")
+
+class JobMetrics:
+    """Métricas de un audiolibro: tiempos por fase y acumulados de sus fragmentos.
+
+    Sin `recorder` solo se llevan los acumulados en memoria y no se exporta nada. La voz, la
+    velocidad y la concurrencia acompañan a los registros para calibrar estimaciones (ver PlanEstimator).
+    """
+
+    def __init__(self, recorder, job: str, voice: str = None, rate: str = None, concurrency: int = None):
+        self.recorder = recorder
+        self.job = job
+        self.voice = voice
+        self.rate = rate
+        self.concurrency = concurrency
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.chunks = 0
+        self.chars = 0
+        self.bytes = 0
+        self.sources = defaultdict(int)
+        self.synth_chars = 0  # Caracteres enviados al servicio (origen "synth" o "shard")
+        self._start = time.monotonic()
+
+    @contextmanager
+    def phase(self, name: str):
+        """Suma al total de la fase `name` el tiempo que pasa dentro del bloque."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase(name, time.perf_counter() - start)
+
+    def timed(self, iterable, name: str):
+        """Recorre `iterable` sumando a la fase `name` el tiempo que tarda en producir cada elemento."""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.add_phase(name, time.perf_counter() - start)
+            yield item
+
+    def add_phase(self, name: str, seconds: float):
+        self.phases[name] += seconds
+        if self.recorder is not None:
+            self.recorder.phase_seconds[name] += seconds
+
+    def chunk(self, index: int, chars: int, size: int, source: str, attempts: int = 0,
+              latency: float = None, queue_wait: float = None):
+        """Registra un fragmento terminado.
+
+        `source` indica de dónde sale su audio: "synth" (servicio), "cache", "resume" (ya estaba
+        en el directorio temporal), "dedup" (copia de un fragmento idéntico del mismo libro), "shard"
+        (sintetizado por un trabajador del modo repartido) o "empty" (fragmento sin texto pronunciable).
+        """
+        self.chunks += 1
+        self.chars += chars
+        self.bytes += size
+        self.sources[source] += 1
+        if source in ("synth", "shard"):
+            self.synth_chars += chars
+        if self.recorder is None:
+            return
+        self.recorder._chunk({
+            "type": "chunk",
+            "job": self.job,
+            "voice": self.voice,
+            "rate": self.rate,
+            "index": index,
+            "chars": chars,
+            "bytes": size,
+            "source": source,
+            "attempts": attempts,
+            "latency_s": None if latency is None else round(latency, 4),
+            "queue_wait_s": None if queue_wait is None else round(queue_wait, 4),
+        }, latency, queue_wait, attempts)
+
+    def finish(self, status: str):
+        """Escribe el registro final del libro con los totales por fase."""
+        if self.recorder is None:
+            return
+        wall = time.monotonic() - self._start
+        synthesize = self.phases["synthesize"]
+        self.recorder._run({
+            "type": "run",
+            "job": self.job,
+            "voice": self.voice,
+            "rate": self.rate,
+            "concurrency": self.concurrency,
+            "status": status,
+            "wall_s": round(wall, 3),
+            "phases_s": {name: round(seconds, 4) for name, seconds in self.phases.items()},
+            "chunks": self.chunks,
+            "chars": self.chars,
+            "bytes": self.bytes,
+            "sources": dict(self.sources),
+            "synth_chars": self.synth_chars,
+            "chars_per_s": round(self.chars / synthesize, 1) if synthesize else None,
+        }, status)
+
+class MetricsRecorder:
+    """Exporta métricas de rendimiento por fragmento y por fase.
+
+    Cada fragmento y cada libro terminado añaden una línea JSON a `path` (se abre en modo
+    anexar, así que varias ejecuciones pueden compartir archivo). Con `prometheus_path`, al cerrar
+    se escribe además un archivo de texto en el formato de exposición de Prometheus, apto para
+    el "textfile collector" de node_exporter, con los acumulados de toda la ejecución.
+    """
+
+    def __init__(self, path: str, prometheus_path: str = None):
+        self.path = path
+        self.prometheus_path = prometheus_path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        self.phase_seconds = dict.fromkeys(PHASES, 0.0)
+        self._chunks = defaultdict(int)
+        self._chars = 0
+        self._bytes = 0
+        self._attempts = 0
+        self._latency_buckets = [0] * len(LATENCY_BUCKETS)
+        self._latency_sum = 0.0
+        self._latency_count = 0
+        self._queue_wait_sum = 0.0
+        self._queue_wait_count = 0
+        self._runs = defaultdict(int)
+
+    def open_job(self, job: str, voice: str = None, rate: str = None, concurrency: int = None) -> JobMetrics:
+        """Empieza a medir un libro; `job` lo identifica en los registros."""
+        return JobMetrics(self, job, voice, rate, concurrency)
+
+    def _write(self, record: dict):
+        record["ts"] = round(time.time(), 3)
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def _chunk(self, record: dict, latency, queue_wait, attempts: int):
+        self._write(record)
+        self._chunks[record["source"]] += 1
+        self._chars += record["chars"]
+        self._bytes += record["bytes"]
+        self._attempts += attempts
+        if latency is not None:
+            self._latency_sum += latency
+            self._latency_count += 1
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if latency <= bound:
+                    self._latency_buckets[i] += 1
+        if queue_wait is not None:
+            self._queue_wait_sum += queue_wait
+            self._queue_wait_count += 1
+
+    def _run(self, record: dict, status: str):
+        self._write(record)
+        self._runs[status] += 1
+
+    def close(self):
+        """Cierra el archivo JSONL y escribe el archivo de Prometheus si se pidió."""
+        self._file.close()
+        if self.prometheus_path:
+            partial_path = self.prometheus_path + ".part"
+            with open(partial_path, "w", encoding="utf-8") as f:
+                f.write(self.prometheus_text())
+            # El colector lee el archivo en cualquier momento: nunca debe verlo a medio escribir.
+            os.replace(partial_path, self.prometheus_path)
+
+    def prometheus_text(self) -> str:
+        """Acumulados de la ejecución en el formato de texto de Prometheus."""
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{labels} {value}")
+
+        metric("audiolibro_chunks_total", "counter", "Fragmentos terminados por origen del audio.",
+               [(f'{{source="{source}"}}', count) for source, count in sorted(self._chunks.items())])
+        metric("audiolibro_chunk_chars_total", "counter", "Caracteres de texto procesados.", [("", self._chars)])
+        metric("audiolibro_chunk_bytes_total", "counter", "Bytes de audio de los fragmentos.", [("", self._bytes)])
+        metric("audiolibro_synthesis_attempts_total", "counter", "Peticiones de síntesis, incluidos los reintentos.",
+               [("", self._attempts)])
+
+        # Los intervalos ya son acumulativos: cada latencia cuenta en todos los que la contienen.
+        buckets = [(f'_bucket{{le="{bound}"}}', count) for bound, count in zip(LATENCY_BUCKETS, self._latency_buckets)]
+        buckets.append(('_bucket{le="+Inf"}', self._latency_count))
+        buckets.append(("_sum", round(self._latency_sum, 4)))
+        buckets.append(("_count", self._latency_count))
+        metric("audiolibro_synthesis_latency_seconds", "histogram",
+               "Duración de la petición de síntesis que tuvo éxito.", buckets)
+
+        metric("audiolibro_queue_wait_seconds", "summary", "Espera en cola de los fragmentos antes de sintetizarse.",
+               [("_sum", round(self._queue_wait_sum, 4)), ("_count", self._queue_wait_count)])
+        metric("audiolibro_phase_seconds_total", "counter", "Tiempo acumulado por fase.",
+               [(f'{{phase="{name}"}}', round(seconds, 4)) for name, seconds in self.phase_seconds.items()])
+        metric("audiolibro_runs_total", "counter", "Libros terminados por resultado.",
+               [(f'{{status="{status}"}}', count) for status, count in sorted(self._runs.items())])
+        metric("audiolibro_last_run_timestamp_seconds", "gauge", "Momento en que terminó la ejecución.",
+               [("", round(time.time(), 3))])
+        return "\n".join(lines) + "\n"
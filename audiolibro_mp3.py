@@ -0,0 +1,271 @@
+import mmap
+import os
+import struct
+from collections import namedtuple
+from functools import lru_cache
+
+# --- Constantes ---
+WRITE_BUFFER_SIZE = 1024 * 1024  # Búfer de escritura del archivo concatenado
+
+# Versión MPEG según los bits 19-20 de la cabecera: 3 = MPEG-1, 2 = MPEG-2, 0 = MPEG-2.5
+SAMPLE_RATES = {
+    3: (44100, 48000, 32000),
+    2: (22050, 24000, 16000),
+    0: (11025, 12000, 8000),
+}
+# Bitrates en kbps por (MPEG-1 o no, capa)
+BITRATES = {
+    (True, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+
+FrameHeader = namedtuple("FrameHeader", "mpeg1 layer bitrate sample_rate mono length samples")
+
+class Mp3FormatError(Exception):
+    """El archivo no contiene tramas MP3 reconocibles."""
+
+@lru_cache(maxsize=None)
+def parse_frame_header(header: int):
+    """Interpreta los 4 bytes de cabecera de una trama. Devuelve None si no es una cabecera válida."""
+    if header & 0xFFE00000 != 0xFFE00000:
+        return None
+    version_bits = (header >> 19) & 0x3
+    layer = 4 - ((header >> 17) & 0x3)
+    bitrate_index = (header >> 12) & 0xF
+    sample_rate_index = (header >> 10) & 0x3
+    # Versión reservada, capa reservada, bitrate libre o inválido y frecuencia reservada
+    if version_bits == 1 or layer == 4 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    mpeg1 = version_bits == 3
+    bitrate = BITRATES[(mpeg1, layer)][bitrate_index] * 1000
+    sample_rate = SAMPLE_RATES[version_bits][sample_rate_index]
+    padding = (header >> 9) & 0x1
+    mono = (header >> 6) & 0x3 == 3
+
+    if layer == 1:
+        length = (12 * bitrate // sample_rate + padding) * 4
+        samples = 384
+    elif layer == 3 and not mpeg1:
+        length = 72 * bitrate // sample_rate + padding
+        samples = 576
+    else:
+        length = 144 * bitrate // sample_rate + padding
+        samples = 1152
+    return FrameHeader(mpeg1, layer, bitrate, sample_rate, mono, length, samples)
+
+def side_info_size(frame: FrameHeader) -> int:
+    """Tamaño de la información lateral de una trama de capa III, tras la cabecera."""
+    if frame.mpeg1:
+        return 17 if frame.mono else 32
+    return 9 if frame.mono else 17
+
+def _audio_bounds(data) -> tuple:
+    """Devuelve el rango de bytes que queda tras quitar etiquetas ID3v2 iniciales y ID3v1/APEv2 finales."""
+    start = 0
+    end = len(data)
+    while end - start >= 10 and data[start:start + 3] == b"ID3":
+        size = 0
+        for byte in data[start + 6:start + 10]:
+            size = (size << 7) | (byte & 0x7F)  # Entero "synchsafe"
+        footer = 10 if data[start + 5] & 0x10 else 0
+        start += 10 + size + footer
+    if end - start >= 128 and data[end - 128:end - 125] == b"TAG":
+        end -= 128
+    if end - start >= 32 and data[end - 32:end - 24] == b"APETAGEX":
+        tag_size = int.from_bytes(data[end - 20:end - 16], "little")
+        flags = int.from_bytes(data[end - 12:end - 8], "little")
+        end -= tag_size + (32 if flags & 0x80000000 else 0)
+    return start, max(start, end)
+
+def _is_vbr_header_frame(data, offset: int, frame: FrameHeader) -> bool:
+    """Indica si la trama es una cabecera Xing/Info/VBRI, que solo es válida al principio de un archivo."""
+    if frame.layer != 3:
+        return False
+    tag_offset = offset + 4 + side_info_size(frame)
+    return (data[tag_offset:tag_offset + 4] in (b"Xing", b"Info")
+            or data[offset + 36:offset + 40] == b"VBRI")
+
+def scan_frames(data):
+    """Localiza las tramas de audio de un archivo MP3 completo en memoria (o en un mmap).
+
+    Devuelve (rangos, tramas, primera_cabecera, bitrates), donde `rangos` son tramos
+    contiguos de bytes que contienen solo tramas de audio, sin etiquetas ni cabecera VBR.
+    """
+    start, end = _audio_bounds(data)
+    ranges = []
+    frames = 0
+    first_header = None
+    bitrates = set()
+    range_start = None
+    pos = start
+    while pos + 4 <= end:
+        header = struct.unpack_from(">I", data, pos)[0]
+        frame = parse_frame_header(header)
+        if frame is None or pos + frame.length > end:
+            # Basura entre tramas: se cierra el tramo y se busca la siguiente sincronización.
+            if range_start is not None:
+                ranges.append((range_start, pos))
+                range_start = None
+            next_sync = data.find(b"\xff", pos + 1, end)
+            if next_sync < 0:
+                break
+            pos = next_sync
+            continue
+        if first_header is None and _is_vbr_header_frame(data, pos, frame):
+            pos += frame.length
+            continue
+        if range_start is None:
+            range_start = pos
+        if first_header is None:
+            first_header = header
+        bitrates.add(frame.bitrate)
+        frames += 1
+        pos += frame.length
+    if range_start is not None:
+        ranges.append((range_start, pos))
+    return ranges, frames, first_header, bitrates
+
+def build_info_frame(header: int, frames: int, total_bytes: int, vbr: bool) -> bytes:
+    """Construye una trama silenciosa con cabecera Xing (VBR) o Info (CBR) para el archivo final."""
+    header = (header | 0x00010000) & ~0x00000200  # Sin CRC y sin relleno
+    frame = parse_frame_header(header)
+    if frame is None or frame.layer != 3:
+        return b""
+    payload = bytearray(frame.length)
+    tag_offset = 4 + side_info_size(frame)
+    if tag_offset + 16 > frame.length:
+        return b""
+    payload[0:4] = header.to_bytes(4, "big")
+    payload[tag_offset:tag_offset + 4] = b"Xing" if vbr else b"Info"
+    payload[tag_offset + 4:tag_offset + 8] = (0x1 | 0x2).to_bytes(4, "big")  # Campos: tramas y bytes
+    payload[tag_offset + 8:tag_offset + 12] = frames.to_bytes(4, "big")
+    payload[tag_offset + 12:tag_offset + 16] = total_bytes.to_bytes(4, "big")
+    return bytes(payload)
+
+def write_info_frame(path: str, header_size: int, frames: int = None, bitrates=None) -> bool:
+    """Escribe la cabecera Info/Xing en los `header_size` bytes reservados al principio de `path`.
+
+    El resto del archivo son tramas de audio ya copiadas, como las que deja `_concatenate` tras
+    su hueco. Sin `frames` se cuentan recorriendo el archivo. Devuelve False si no hay audio o
+    el hueco no coincide con la trama que correspondería.
+    """
+    with open(path, "r+b") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size <= header_size + 4:
+            return False
+        f.seek(header_size)
+        first_header = struct.unpack(">I", f.read(4))[0]
+        if frames is None:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                _, frames, _, bitrates = scan_frames(memoryview(data)[header_size:])
+        info = build_info_frame(first_header, frames, size, len(bitrates) > 1)
+        if len(info) != header_size:
+            return False
+        f.seek(0)
+        f.write(info)
+    return True
+
+def _map_file(path: str):
+    """Abre un archivo en memoria compartida; devuelve None si está vacío."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def _append_frames(data, output) -> tuple:
+    ranges, frames, first_header, bitrates = scan_frames(data)
+    written = 0
+    view = memoryview(data)
+    try:
+        for range_start, range_end in ranges:
+            output.write(view[range_start:range_end])
+            written += range_end - range_start
+    finally:
+        view.release()
+    return written, frames, first_header, bitrates
+
+def append_mp3_frames(source, output) -> tuple:
+    """Escribe en `output` solo las tramas de audio de `source` (una ruta o los bytes de un MP3).
+
+    Devuelve (bytes, tramas, primera_cabecera, bitrates).
+    """
+    if not isinstance(source, str):
+        return _append_frames(source, output) if source else (0, 0, None, set())
+    data = _map_file(source)
+    if data is None:
+        return 0, 0, None, set()
+    with data:
+        return _append_frames(data, output)
+
+def _concatenate(sources, output_path: str) -> dict:
+    """Une los MP3 de `sources` (búferes) en un único flujo con una sola cabecera Info/Xing."""
+    count = 0
+    frames = 0
+    audio_bytes = 0
+    first_header = None
+    bitrates = set()
+    info_size = 0
+    with open(output_path, "wb", buffering=WRITE_BUFFER_SIZE) as output:
+        for data in sources:
+            count += 1
+            if first_header is None:
+                # Hasta conocer la primera cabecera no se puede reservar el hueco de la trama Info.
+                _, _, first_header, _ = scan_frames(data)
+                if first_header is not None:
+                    info_size = len(build_info_frame(first_header, 0, 0, False))
+                    output.write(b"\0" * info_size)
+            written, n, _, rates = _append_frames(data, output)
+            audio_bytes += written
+            frames += n
+            bitrates |= rates
+
+        if first_header is None or frames == 0:
+            raise Mp3FormatError("No se encontraron tramas MP3 válidas en los fragmentos.")
+        if info_size:
+            output.seek(0)
+            output.write(build_info_frame(first_header, frames, info_size + audio_bytes, len(bitrates) > 1))
+
+    return {"files": count, "frames": frames, "bytes": info_size + audio_bytes}
+
+def _mapped_files(paths):
+    for path in paths:
+        data = _map_file(path)
+        if data is None:
+            continue
+        with data:
+            yield data
+
+def concatenate_mp3_files(paths, output_path: str) -> dict:
+    """Une varios MP3 en un único flujo con una sola cabecera Info/Xing, sin ffmpeg.
+
+    Se descartan las etiquetas ID3/APE y las cabeceras VBR de cada archivo, se copian las
+    tramas de audio y al final se reescribe la cabecera con el número real de tramas y bytes.
+    """
+    return _concatenate(_mapped_files(paths), output_path)
+
+def concatenate_mp3_ranges(path: str, ranges, output_path: str) -> dict:
+    """Como concatenate_mp3_files, con los MP3 guardados en tramos (desplazamiento, longitud) de `path`.
+
+    El archivo se lee a través de mmap, sin copiar cada tramo a memoria.
+    """
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        view = memoryview(data)
+        try:
+            return _concatenate((view[offset:offset + length] for offset, length in ranges), output_path)
+        finally:
+            view.release()
+
+def silent_frame(header: int = 0xFFF364C4) -> bytes:
+    """Devuelve una trama de silencio (información lateral y datos a cero) con la cabecera indicada.
+
+    La cabecera por defecto corresponde al formato de edge-tts: MPEG-2 capa III, 24 kHz, 48 kbps, mono.
+    """
+    frame = parse_frame_header(header)
+    payload = bytearray(frame.length)
+    payload[0:4] = header.to_bytes(4, "big")
+    return bytes(payload)
@@ -0,0 +1,192 @@
+import mmap
+import os
+import re
+import struct
+import time
+
+# --- Constantes ---
+INDEX_RECORD = struct.Struct("<32sQI")  # Clave (SHA-256), desplazamiento y longitud del audio en el paquete
+COMPACT_MIN_BYTES = 32 * 1024 * 1024  # Audio sin usar que debe acumularse antes de compactar el paquete
+SYNC_INTERVAL = 1.0  # Segundos máximos que un audio añadido espera su fsync y su registro en el índice
+PACK_FILE = "chunks-{:04d}.pack"
+INDEX_FILE = "chunks-{:04d}.idx"
+PACK_FILE_RE = re.compile(r"^chunks-(\d+)\.(pack|idx)(\.part)?$")
+
+class ChunkStore:
+    """Audio de los fragmentos de un libro guardado en un único archivo de solo anexado.
+
+    Cada audio se añade al final de `chunks-NNNN.pack` y se registra en `chunks-NNNN.idx` con
+    un registro de tamaño fijo (clave, desplazamiento, longitud). Los registros se escriben por
+    tandas (como mucho cada SYNC_INTERVAL segundos, y al cerrar) y solo después de un fsync del
+    paquete, así que ni siquiera tras un corte de corriente apunta el índice a audio que no llegó
+    al disco. Al abrir se descartan un registro final a medias, los que apuntan más allá del
+    final del paquete y el audio que quedó sin registrar, que se vuelve a sintetizar. Las claves
+    identifican el contenido (texto, voz y velocidad), de modo que el audio que cambia de posición
+    no se copia.
+
+    `compact` reescribe el paquete sin el audio que ya no se necesita en una generación nueva
+    (NNNN + 1), que solo pasa a ser la vigente cuando su índice está completo y en disco.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._entries = {}  # Clave -> (desplazamiento, longitud)
+        self._size = 0  # Bytes válidos del paquete
+        self._pending = []  # Registros de índice que esperan al fsync del paquete
+        self._synced_at = time.monotonic()
+        self.generation = self._find_generation()
+        self._load()
+        self._pack = open(self.path, "r+b")
+        self._pack.truncate(self._size)  # Audio escrito sin llegar a registrarse
+        self._index = open(self._index_path(self.generation), "ab")
+
+    @property
+    def path(self) -> str:
+        """Ruta del paquete vigente."""
+        return os.path.join(self.directory, PACK_FILE.format(self.generation))
+
+    def _index_path(self, generation: int) -> str:
+        return os.path.join(self.directory, INDEX_FILE.format(generation))
+
+    def _find_generation(self) -> int:
+        """La generación más reciente con índice completo; borra las demás y las compactaciones a medias."""
+        files = []
+        for name in os.listdir(self.directory):
+            match = PACK_FILE_RE.match(name)
+            if match:
+                files.append((name, int(match.group(1)), match.group(2) == "idx" and not match.group(3)))
+        complete = [generation for _, generation, is_index in files if is_index]
+        current = max(complete, default=1)
+        for name, generation, _ in files:
+            if generation != current or name.endswith(".part"):
+                os.remove(os.path.join(self.directory, name))
+        for path in (os.path.join(self.directory, PACK_FILE.format(current)), self._index_path(current)):
+            if not os.path.exists(path):
+                open(path, "wb").close()
+        return current
+
+    def _load(self):
+        pack_size = os.path.getsize(self.path)
+        with open(self._index_path(self.generation), "rb") as f:
+            data = f.read()
+        valid = len(data) - len(data) % INDEX_RECORD.size
+        for number, (key, offset, length) in enumerate(INDEX_RECORD.iter_unpack(data[:valid])):
+            if offset + length > pack_size:
+                # El registro llegó al disco antes que su audio (corte de corriente): se descarta con los siguientes.
+                valid = number * INDEX_RECORD.size
+                break
+            self._entries[key] = (offset, length)
+            self._size = max(self._size, offset + length)
+        if valid < len(data):
+            with open(self._index_path(self.generation), "r+b") as f:
+                f.truncate(valid)
+
+    # --- Consulta ---
+    @property
+    def size(self) -> int:
+        """Bytes del paquete, incluido el audio que ya no se usa."""
+        return self._size
+
+    def __contains__(self, key: bytes) -> bool:
+        return key in self._entries
+
+    def keys(self):
+        return self._entries.keys()
+
+    def length(self, key: bytes):
+        """Tamaño en bytes del audio de `key`, o None si no está."""
+        entry = self._entries.get(key)
+        return entry[1] if entry else None
+
+    def locate(self, key: bytes):
+        """(desplazamiento, longitud) del audio de `key` dentro del paquete, o None."""
+        return self._entries.get(key)
+
+    def read(self, key: bytes) -> bytes:
+        offset, length = self._entries[key]
+        self._pack.seek(offset)
+        return self._pack.read(length)
+
+    # --- Escritura ---
+    def put(self, key: bytes, data: bytes):
+        """Añade el audio de `key` al paquete (sustituye al anterior, si lo había)."""
+        self._pack.seek(self._size)
+        self._pack.write(data)
+        self._pack.flush()
+        self._pending.append(INDEX_RECORD.pack(key, self._size, len(data)))
+        self._entries[key] = (self._size, len(data))
+        self._size += len(data)
+        if time.monotonic() - self._synced_at >= SYNC_INTERVAL:
+            self.sync()
+
+    def sync(self):
+        """Lleva al disco el audio añadido y después registra en el índice el que estaba pendiente."""
+        self._synced_at = time.monotonic()
+        if not self._pending:
+            return
+        os.fsync(self._pack.fileno())
+        self._index.write(b"".join(self._pending))
+        self._index.flush()
+        self._pending.clear()
+
+    def put_file(self, key: bytes, path: str):
+        """Añade al paquete el audio del archivo `path` y lo borra."""
+        with open(path, "rb") as f:
+            self.put(key, f.read())
+        os.remove(path)
+
+    def compact(self, keep) -> bool:
+        """Si el audio que no está en `keep` ocupa bastante, reescribe el paquete solo con el resto."""
+        live = {key: self._entries[key] for key in keep if key in self._entries}
+        live_bytes = sum(length for _, length in live.values())
+        unused = self._size - live_bytes
+        if unused < COMPACT_MIN_BYTES or unused < live_bytes:
+            return False
+
+        generation = self.generation + 1
+        pack_path = os.path.join(self.directory, PACK_FILE.format(generation))
+        index_part = self._index_path(generation) + ".part"
+        entries = {}
+        size = 0
+        with open(pack_path, "wb") as pack, open(index_part, "wb") as index, \
+                mmap.mmap(self._pack.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for key, (offset, length) in sorted(live.items(), key=lambda item: item[1][0]):
+                pack.write(data[offset:offset + length])
+                index.write(INDEX_RECORD.pack(key, size, length))
+                entries[key] = (size, length)
+                size += length
+            pack.flush()
+            os.fsync(pack.fileno())
+            index.flush()
+            os.fsync(index.fileno())
+        # El índice completo convierte la generación nueva en la vigente.
+        os.replace(index_part, self._index_path(generation))
+        _fsync_directory(self.directory)
+        self._pending.clear()  # Sus audios ya están registrados en la generación nueva
+
+        old_pack, old_index = self.path, self._index_path(self.generation)
+        self._pack.close()
+        self._index.close()
+        os.remove(old_index)
+        os.remove(old_pack)
+        self.generation = generation
+        self._entries = entries
+        self._size = size
+        self._pack = open(self.path, "r+b")
+        self._index = open(self._index_path(generation), "ab")
+        return True
+
+    def close(self):
+        self.sync()
+        self._pack.close()
+        self._index.close()
+
+def _fsync_directory(path: str):
+    """Hace duradero un os.replace dentro de `path` (en Windows no se abren directorios ni hace falta)."""
+    if os.name != "posix":
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
@@ -0,0 +1,221 @@
+import json
+import os
+import statistics
+from collections import deque
+from datetime import timedelta
+from audiolibro_backends import EDGE_TTS_FRAME_HEADER, rate_factor
+from audiolibro_cache import DEFAULT_CACHE_DIR
+from audiolibro_creator import console, plan_chunks, CHUNK_MAX_SIZE, DEFAULT_CONCURRENCY
+from audiolibro_dedup import DedupPlanner
+from audiolibro_mp3 import parse_frame_header
+from audiolibro_sizing import MIN_AUTO_CHUNK_SIZE, MIN_SAMPLES, ThroughputModel
+
+# --- Constantes ---
+DEFAULT_HISTORY_FILE = os.path.join(DEFAULT_CACHE_DIR, "historial.jsonl")  # Métricas de la GUI; --plan lo lee si no se indica --metrics
+HISTORY_RECORDS = 20000  # Registros más recientes del historial que se usan para calibrar
+HISTORY_RUNS = 20  # Ejecuciones más recientes con las que se estima el ritmo de síntesis
+MIN_VOICE_CHUNKS = 20  # Fragmentos de una voz necesarios para calibrar solo con ella
+MIN_SYNTH_SHARE = 0.5  # Parte mínima de caracteres sintetizados para que una ejecución mida el ritmo del servicio
+# Sin historial: unos 15 caracteres de texto por segundo de audio a velocidad normal, y una
+# petición a edge-tts de ~1,5 s más ~4 ms por carácter.
+DEFAULT_CHARS_PER_AUDIO_SECOND = 15.0
+DEFAULT_REQUEST_SECONDS = 1.5
+DEFAULT_SECONDS_PER_CHAR = 0.004
+DEFAULT_CONCAT_BYTES_PER_SECOND = 100 * 1024 * 1024
+AUDIO_BYTES_PER_SECOND = parse_frame_header(EDGE_TTS_FRAME_HEADER).bitrate / 8  # Formato de salida de todos los motores
+
+class BookPlan:
+    """Fragmentos de un libro tal y como se sintetizarían, sin llamar al servicio.
+
+    `requests` son los textos que se enviarían: los fragmentos no vacíos, sin las repeticiones
+    que DedupPlanner copia en lugar de sintetizar.
+    """
+
+    def __init__(self, text: str, strategy: str, chunk_size: int = CHUNK_MAX_SIZE, dedup: bool = True):
+        self.strategy = strategy
+        self.chunk_size = chunk_size
+        planner = DedupPlanner() if dedup else None
+        self.chunks = plan_chunks(text, strategy, chunk_size, planner)
+        self.requests = []
+        self.repeated = 0
+        for i, chunk in enumerate(self.chunks):
+            if not chunk.strip():
+                continue
+            if planner is not None and planner.original(i, chunk) is not None:
+                self.repeated += 1
+            else:
+                self.requests.append(chunk)
+        self.sizes = sorted(len(chunk) for chunk in self.chunks if chunk.strip())
+        self.chars = sum(self.sizes)
+        self.empty = len(self.chunks) - len(self.sizes)
+
+    def distribution(self) -> dict:
+        """Mínimo, mediana, percentil 90, máximo y media de caracteres por fragmento no vacío."""
+        if not self.sizes:
+            return dict.fromkeys(("min", "median", "p90", "max", "mean"), 0)
+        return {
+            "min": self.sizes[0],
+            "median": int(statistics.median(self.sizes)),
+            "p90": self.sizes[min(len(self.sizes) - 1, int(len(self.sizes) * 0.9))],
+            "max": self.sizes[-1],
+            "mean": round(self.chars / len(self.sizes)),
+        }
+
+    def histogram(self, step: int = MIN_AUTO_CHUNK_SIZE) -> list[tuple]:
+        """[(desde, hasta, fragmentos)] en tramos de `step` caracteres."""
+        if not self.sizes:
+            return []
+        first = self.sizes[0] // step
+        counts = [0] * (self.sizes[-1] // step - first + 1)
+        for size in self.sizes:
+            counts[size // step - first] += 1
+        return [((first + i) * step, (first + i + 1) * step, count) for i, count in enumerate(counts)]
+
+class PlanEstimator:
+    """Predice la duración del audio, el tamaño del MP3 y el tiempo de un BookPlan.
+
+    Se calibra con el historial de métricas (`--metrics`, o el que guarda la GUI):
+    - Bytes de audio por carácter de la voz, normalizados a velocidad 0% para poder aplicar la
+      velocidad pedida. De ahí salen la duración (los motores generan MP3 a bitrate constante) y
+      el tamaño del archivo.
+    - El ritmo de síntesis (caracteres por segundo de la fase de síntesis) de ejecuciones
+      recientes con la misma concurrencia, preferiblemente de la misma voz. Ya incluye los
+      reintentos y el control de simultáneas. Sin ellas, se usa la latencia por petición
+      (ver ThroughputModel) repartida entre las `concurrency` peticiones simultáneas, que es
+      una cota optimista.
+    Sin historial se usan valores típicos de edge-tts, y así se indica en `basis`.
+    """
+
+    def __init__(self, history_path: str = DEFAULT_HISTORY_FILE):
+        self.history_path = history_path
+        self._chunks = []
+        self._runs = []
+        try:
+            with open(history_path, encoding="utf-8") as f:
+                lines = deque(f, maxlen=HISTORY_RECORDS)
+        except OSError:
+            return
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("type") == "chunk" and record.get("chars") and record.get("bytes"):
+                self._chunks.append(record)
+            elif record.get("type") == "run" and record.get("status") == "ok":
+                self._runs.append(record)
+
+    def _voice_records(self, records: list, voice: str, minimum: int) -> list:
+        """Los registros de `voice` si hay al menos `minimum`; si no, todos."""
+        own = [record for record in records if record.get("voice") == voice]
+        return own if len(own) >= minimum else records
+
+    def _bytes_per_char(self, voice: str) -> tuple:
+        """(bytes de audio por carácter a velocidad 0%, fragmentos usados)."""
+        records = self._voice_records([r for r in self._chunks if r.get("rate") is not None], voice, MIN_VOICE_CHUNKS)
+        if not records:
+            return AUDIO_BYTES_PER_SECOND / DEFAULT_CHARS_PER_AUDIO_SECOND, 0
+        # A más velocidad, menos audio por carácter: se deshace el efecto de la velocidad de cada registro.
+        normalized = sum(r["bytes"] * rate_factor(r["rate"]) for r in records)
+        return normalized / sum(r["chars"] for r in records), len(records)
+
+    def _synthesis_runs(self, voice: str, concurrency: int) -> list:
+        """Ejecuciones recientes con la concurrencia indicada en las que la síntesis fue la mayor parte del trabajo."""
+        runs = [
+            run for run in self._runs
+            if run.get("concurrency") == concurrency and run.get("synth_chars")
+            and run["synth_chars"] >= MIN_SYNTH_SHARE * run["chars"] and run["phases_s"].get("synthesize")
+        ]
+        return self._voice_records(runs, voice, 1)[-HISTORY_RUNS:]
+
+    def _latency_model(self, voice: str) -> ThroughputModel:
+        records = self._voice_records([r for r in self._chunks if r.get("source") == "synth" and r.get("latency_s") is not None],
+                                      voice, MIN_VOICE_CHUNKS)
+        model = ThroughputModel(CHUNK_MAX_SIZE)
+        for record in records:
+            for _ in range(record.get("attempts", 1) - 1):
+                model.observe_failure(record["chars"])
+            model.observe(record["chars"], record["latency_s"])
+        return model
+
+    def estimate(self, plan: BookPlan, voice: str, rate: str, concurrency: int = DEFAULT_CONCURRENCY, cache=None, backend_version: str = None) -> dict:
+        """Predicción para `plan`; con `cache`, las peticiones que ya tiene la caché de síntesis no cuentan."""
+        bytes_per_char, voice_chunks = self._bytes_per_char(voice)
+        output_bytes = plan.chars * bytes_per_char / rate_factor(rate)
+        requests = plan.requests
+        if cache is not None:
+            requests = [r for r in requests if cache.make_key(r, voice, rate, backend_version) not in cache]
+        request_chars = sum(len(request) for request in requests)
+
+        runs = self._synthesis_runs(voice, concurrency)
+        if runs:
+            chars_per_second = sum(run["synth_chars"] for run in runs) / sum(run["phases_s"]["synthesize"] for run in runs)
+            synthesis_seconds = request_chars / chars_per_second
+            basis = f"{len(runs)} ejecuciones con concurrencia {concurrency}"
+        else:
+            model = self._latency_model(voice)
+            if model.samples >= MIN_SAMPLES:
+                request_seconds = sum(len(request) / model.expected_throughput(len(request)) for request in requests)
+                basis = f"latencia de {model.samples} peticiones (sin ejecuciones con concurrencia {concurrency})"
+            else:
+                request_seconds = sum(DEFAULT_REQUEST_SECONDS + DEFAULT_SECONDS_PER_CHAR * len(request) for request in requests)
+                basis = "valores típicos de edge-tts (sin historial)"
+            synthesis_seconds = request_seconds / max(1, concurrency)
+        basis += f"; audio: {voice_chunks} fragmentos" if voice_chunks else "; audio: valores típicos"
+
+        concat_runs = [run for run in self._runs if run["phases_s"].get("concatenate") and run.get("bytes")]
+        concat_rate = (sum(run["bytes"] for run in concat_runs) / sum(run["phases_s"]["concatenate"] for run in concat_runs)
+                       if concat_runs else DEFAULT_CONCAT_BYTES_PER_SECOND)
+        concatenate_seconds = output_bytes / concat_rate
+        return {
+            "requests": len(requests),
+            "cached": len(plan.requests) - len(requests),
+            "audio_s": output_bytes / AUDIO_BYTES_PER_SECOND,
+            "output_bytes": int(output_bytes),
+            "synthesis_s": synthesis_seconds,
+            "concatenate_s": concatenate_seconds,
+            "wall_s": synthesis_seconds + concatenate_seconds,
+            "basis": basis,
+        }
+
+def _duration(seconds: float) -> str:
+    return str(timedelta(seconds=round(seconds)))
+
+def describe_estimate(estimate: dict) -> str:
+    """Resumen de una línea, para la GUI."""
+    return (f"~{_duration(estimate['audio_s'])} de audio, {estimate['output_bytes'] / (1024 * 1024):.0f} MB; "
+            f"unos {_duration(estimate['wall_s'])} de trabajo ({estimate['requests']} peticiones)")
+
+def print_plan(plan: BookPlan, estimate: dict, text_file: str, voice: str, rate: str, concurrency: int):
+    """Muestra el plan de `--plan`: fragmentos, su distribución de tamaños y la estimación."""
+    from rich.panel import Panel # Importación local
+    from rich.table import Table # Importación local
+
+    sizes = plan.distribution()
+    summary = (
+        f"Archivo de entrada: [magenta]{text_file}[/magenta]\n"
+        f"Voz: [yellow]{voice}[/yellow]   Velocidad: [yellow]{rate}[/yellow]   Concurrencia: [yellow]{concurrency}[/yellow]\n\n"
+        f"Fragmentos: [yellow]{len(plan.chunks)}[/yellow] ({plan.empty} sin texto pronunciable), "
+        f"[yellow]{plan.chars}[/yellow] caracteres\n"
+        f"Caracteres por fragmento: mínimo {sizes['min']}, mediana {sizes['median']}, p90 {sizes['p90']}, "
+        f"máximo {sizes['max']} (media {sizes['mean']})\n"
+        f"Peticiones al servicio: [yellow]{estimate['requests']}[/yellow] "
+        f"({plan.repeated} repeticiones copiadas, {estimate['cached']} ya en la caché)\n\n"
+        f"Duración del audio: [green]~{_duration(estimate['audio_s'])}[/green]\n"
+        f"Tamaño del MP3: [green]~{estimate['output_bytes'] / (1024 * 1024):.1f} MB[/green]\n"
+        f"Tiempo estimado: [green]~{_duration(estimate['wall_s'])}[/green] "
+        f"(síntesis {_duration(estimate['synthesis_s'])}, concatenación {_duration(estimate['concatenate_s'])})\n\n"
+        f"[dim]Calibrado con: {estimate['basis']}[/dim]"
+    )
+    console.print(Panel(summary, title="Plan del audiolibro (sin sintetizar)", border_style="cyan"))
+
+    table = Table(title="Tamaño de los fragmentos")
+    table.add_column("Caracteres", style="cyan")
+    table.add_column("Fragmentos", style="yellow", justify="right")
+    table.add_column("")
+    histogram = plan.histogram()
+    largest = max((count for _, _, count in histogram), default=0)
+    for low, high, count in histogram:
+        bar = "█" * round(40 * count / largest) if largest else ""
+        table.add_row(f"{low}-{high - 1}", str(count), bar)
+    console.print(table)
@@ -0,0 +1,123 @@
+import asyncio
+from collections import deque
+from audiolibro_rate import AdaptiveLimiter
+
+class PoolJob:
+    """Cola de fragmentos de un libro dentro de un `SynthesisPool`.
+
+    El productor del libro añade elementos con `submit` (que espera si ya hay `max_pending`
+    en cola) y llama a `close` al terminar; `finished` se resuelve cuando todos los elementos
+    se han procesado, o con la primera excepción que lance `handler`. `cancel` descarta los
+    pendientes y aborta los que están en curso, sin detener a los trabajadores del conjunto.
+    """
+
+    def __init__(self, pool, handler, max_pending: int):
+        self.pool = pool
+        self.handler = handler
+        self.finished = asyncio.get_running_loop().create_future()
+        self._items = deque()
+        self._space = asyncio.Semaphore(max_pending)
+        self._in_flight = 0
+        self._running = set()  # Tareas de `handler` en curso
+        self._closed = False
+
+    async def submit(self, item):
+        """Encola un elemento para que lo procese el primer trabajador libre."""
+        await self._space.acquire()
+        if self.finished.done():
+            self._space.release()
+            return
+        self._items.append(item)
+        self.pool._schedule(self)
+
+    def close(self):
+        """Indica que no se van a encolar más elementos."""
+        self._closed = True
+        self._check_finished()
+
+    def cancel(self):
+        """Descarta los elementos pendientes y cancela los que se están procesando."""
+        self._items.clear()
+        for task in self._running:
+            task.cancel()
+        if not self.finished.done():
+            self.finished.cancel()
+
+    def _take(self):
+        self._space.release()
+        self._in_flight += 1
+        return self._items.popleft()
+
+    def _done(self, error: BaseException = None):
+        self._in_flight -= 1
+        if error is not None and not self.finished.done():
+            self._items.clear()
+            self.finished.set_exception(error)
+        self._check_finished()
+
+    def _check_finished(self):
+        if self._closed and not self._items and self._in_flight == 0 and not self.finished.done():
+            self.finished.set_result(None)
+
+class SynthesisPool:
+    """Conjunto acotado de trabajadores de síntesis que pueden compartir varios libros.
+
+    Los trabajadores atienden por turnos a los libros que tienen fragmentos pendientes, de modo
+    que ninguno acapara el conjunto y, cuando uno termina, los demás siguen llenándolo. `limiter`
+    ajusta cuántos de ellos llaman al servicio a la vez; es común a todos los libros porque el
+    límite lo impone el servicio, no cada libro.
+    """
+
+    def __init__(self, concurrency: int, latency_backoff: bool = False):
+        self.concurrency = max(1, concurrency)
+        self.limiter = AdaptiveLimiter(self.concurrency, latency_backoff=latency_backoff)
+        self._ready = deque()  # Libros con fragmentos pendientes, en orden de turno
+        self._available = asyncio.Semaphore(0)  # Un permiso por fragmento encolado
+        self._workers = [asyncio.ensure_future(self._worker()) for _ in range(self.concurrency)]
+
+    def open_job(self, handler, max_pending: int = None) -> PoolJob:
+        """Registra un libro; `handler(item)` es la corrutina que procesa cada elemento."""
+        return PoolJob(self, handler, max_pending or self.concurrency * 2)
+
+    def _schedule(self, job: PoolJob):
+        if job not in self._ready:
+            self._ready.append(job)
+        self._available.release()
+
+    async def _worker(self):
+        while True:
+            await self._available.acquire()
+            # Los permisos de libros cancelados no tienen elemento: se descartan.
+            while self._ready and not self._ready[0]._items:
+                self._ready.popleft()
+            if not self._ready:
+                continue
+            job = self._ready.popleft()
+            item = job._take()
+            if job._items:
+                self._ready.append(job)  # Turno rotatorio entre libros
+            # El elemento se procesa en su propia tarea para que `job.cancel` lo aborte sin
+            # cancelar al trabajador, que sigue atendiendo a los demás libros.
+            task = asyncio.ensure_future(job.handler(item))
+            job._running.add(task)
+            try:
+                await asyncio.wait({task})
+            except asyncio.CancelledError:
+                # Se cierra el conjunto: se cancela también el elemento en curso.
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                job._running.discard(task)
+                job._in_flight -= 1
+                job.cancel()
+                raise
+            job._running.discard(task)
+            if task.cancelled():
+                job._done()
+            else:
+                job._done(task.exception())
+
+    async def close(self):
+        """Detiene los trabajadores, cancelando la síntesis en curso."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
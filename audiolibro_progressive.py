@@ -0,0 +1,112 @@
+import os
+import time
+from audiolibro_mp3 import parse_frame_header, scan_frames
+
+# --- Constantes ---
+PUBLISH_INTERVAL = 5.0  # Segundos mínimos entre dos publicaciones de las listas de reproducción
+SEGMENT_FILE = "segment_{:04d}.mp3"
+HLS_PLAYLIST = "playlist.m3u8"
+M3U_PLAYLIST = "playlist.m3u"
+PREFIX_FILE = "prefix.mp3"
+
+def progressive_dir(output_file: str) -> str:
+    """Directorio de publicación progresiva de un libro: junto a la salida, con su nombre."""
+    base = os.path.splitext(output_file)[0]
+    return f"{base}_progresivo"
+
+class ProgressivePublisher:
+    """Publica el audio del libro a medida que se completa su principio.
+
+    Cada vez que el siguiente fragmento pendiente termina (junto con todos los anteriores),
+    sus tramas se copian a un segmento propio y se añaden a un prefijo reproducible del MP3
+    final. Las listas de reproducción (`playlist.m3u8` estilo HLS de tipo EVENT y `playlist.m3u`)
+    y el prefijo se publican como mucho cada PUBLISH_INTERVAL segundos, escribiendo las listas
+    de forma atómica; al cerrar con `complete=True` la lista HLS se marca como terminada.
+
+    `locate(index)` indica dónde está el audio de un fragmento: (ruta, desplazamiento, tamaño),
+    con tamaño None si es un archivo MP3 completo.
+    """
+
+    def __init__(self, directory: str, locate, title: str = ""):
+        self.directory = directory
+        self.locate = locate
+        self.title = title
+        self.segments = []  # (archivo, duración en segundos)
+        self.next_index = 0  # Primer fragmento aún no publicado
+        self.duration = 0.0
+        self._ready = set()
+        self._last_publish = 0.0
+        os.makedirs(directory, exist_ok=True)
+        # Una ejecución reanudada vuelve a publicar desde el principio.
+        for name in os.listdir(directory):
+            if name.startswith("segment_") or name in (HLS_PLAYLIST, M3U_PLAYLIST):
+                os.remove(os.path.join(directory, name))
+        self._prefix = open(os.path.join(directory, PREFIX_FILE), "wb")
+
+    def mark_ready(self, index: int):
+        """Indica que el fragmento `index` ya tiene su audio; debe llamarse antes de que se mueva o borre."""
+        if index < self.next_index:
+            return
+        self._ready.add(index)
+        advanced = False
+        while self.next_index in self._ready:
+            self._ready.discard(self.next_index)
+            self._add_segment(self.next_index)
+            self.next_index += 1
+            advanced = True
+        if advanced and time.monotonic() - self._last_publish >= PUBLISH_INTERVAL:
+            self.publish()
+
+    def _read_audio(self, index: int) -> bytes:
+        path, offset, size = self.locate(index)
+        try:
+            with open(path, "rb") as f:
+                f.seek(offset)
+                return f.read() if size is None else f.read(size)
+        except FileNotFoundError:
+            return b""  # Fragmento sin texto pronunciable: no tiene audio
+
+    def _add_segment(self, index: int):
+        data = self._read_audio(index)
+        ranges, frames, first_header, _ = scan_frames(data) if data else ([], 0, None, set())
+        if not frames:
+            return
+        frame = parse_frame_header(first_header)
+        duration = frames * frame.samples / frame.sample_rate
+        name = SEGMENT_FILE.format(index)
+        view = memoryview(data)
+        with open(os.path.join(self.directory, name), "wb") as segment:
+            # Solo las tramas de audio: sin etiquetas ni cabeceras VBR de cada fragmento.
+            for start, end in ranges:
+                segment.write(view[start:end])
+                self._prefix.write(view[start:end])
+        view.release()
+        self.segments.append((name, duration))
+        self.duration += duration
+
+    def publish(self, complete: bool = False):
+        """Escribe las listas de reproducción y vacía el prefijo al disco."""
+        self._prefix.flush()
+        target = max((round(duration + 0.5) for _, duration in self.segments), default=1)
+        hls = ["#EXTM3U", "#EXT-X-VERSION:3", f"#EXT-X-TARGETDURATION:{target}",
+               "#EXT-X-MEDIA-SEQUENCE:0", "#EXT-X-PLAYLIST-TYPE:EVENT"]
+        m3u = ["#EXTM3U"]
+        for number, (name, duration) in enumerate(self.segments, start=1):
+            hls.append(f"#EXTINF:{duration:.3f},")
+            hls.append(name)
+            m3u.append(f"#EXTINF:{round(duration)},{self.title} ({number})")
+            m3u.append(name)
+        if complete:
+            hls.append("#EXT-X-ENDLIST")
+        for filename, lines in ((HLS_PLAYLIST, hls), (M3U_PLAYLIST, m3u)):
+            path = os.path.join(self.directory, filename)
+            with open(path + ".part", "w", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+            # Un reproductor puede releer la lista en cualquier momento: nunca debe verla a medias.
+            os.replace(path + ".part", path)
+        self._last_publish = time.monotonic()
+
+    def close(self, complete: bool = False):
+        """Publica lo pendiente y cierra el prefijo; `complete` indica que el libro está entero."""
+        self.publish(complete)
+        self._prefix.close()
@@ -0,0 +1,188 @@
+import asyncio
+import heapq
+import itertools
+import random
+import statistics
+import time
+from collections import deque
+
+# --- Constantes ---
+RETRY_BASE_DELAY = 1.0  # Espera máxima (s) antes del primer reintento; se duplica en cada intento
+RETRY_MAX_DELAY = 60.0  # Tope de la espera entre reintentos
+MIN_LATENCY_CHARS = 200  # Los fragmentos muy cortos se miden como si tuvieran este tamaño
+LATENCY_SMOOTHING = 0.2  # Peso de cada nueva medida en la media móvil de la latencia
+LATENCY_TOLERANCE = 2.0  # Latencia relativa a la de referencia a partir de la cual se considera saturación
+LATENCY_WINDOW = 200  # Medidas recientes entre las que se toma la latencia de referencia
+LATENCY_BASELINE_PERCENTILE = 0.1  # Percentil de esas medidas que sirve de referencia
+LATENCY_RECENT = 8  # Medidas más recientes cuya mediana se compara con la referencia
+LATENCY_PERSISTENCE = 8  # Medidas seguidas por encima de la tolerancia antes de reducir el límite
+LATENCY_DECREASE = 0.9  # Factor de reducción del límite por latencia alta
+FAILURE_DECREASE = 0.5  # Factor de reducción del límite por un fallo
+
+def retry_delay(attempt: int, base: float = RETRY_BASE_DELAY, cap: float = RETRY_MAX_DELAY) -> float:
+    """Espera antes del reintento número `attempt` (desde 0): backoff exponencial con jitter completo.
+
+    Los fallos transitorios se reintentan casi de inmediato, la saturación persistente espera cada
+    vez más, y el azar evita que los trabajadores que fallaron a la vez reintenten a la vez.
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+class AdaptiveLimiter:
+    """Límite AIMD de peticiones de síntesis simultáneas.
+
+    Se empieza con una sola petición y, hasta la primera señal de saturación, cada petición
+    correcta suma 1 al límite (se duplica en cada ronda). Después, cada petición correcta suma
+    1/límite (aproximadamente +1 por ronda) y un fallo (error o tiempo agotado) divide el límite
+    por dos. Solo reducen el límite las peticiones iniciadas después de la última reducción,
+    para no castigar varias veces la misma saturación. Así el número de peticiones en vuelo se
+    estabiliza cerca de lo que el servicio admite, entre `min_limit` y `max_limit` (el número
+    de trabajadores).
+
+    Con `latency_backoff`, una latencia sostenida también reduce el límite un 10%, para
+    servicios que encolan en lugar de rechazar. La latencia se mide por carácter, para que la
+    longitud variable de los fragmentos no se confunda con saturación. La referencia es el
+    percentil LATENCY_BASELINE_PERCENTILE de las últimas LATENCY_WINDOW medidas sin saturación,
+    y se reduce cuando la mediana de las LATENCY_RECENT más recientes supera LATENCY_TOLERANCE
+    veces la referencia durante LATENCY_PERSISTENCE medidas seguidas. Aun así, una latencia muy
+    variable (la de edge-tts lo es) puede confundirse con saturación; por eso solo se activa a
+    petición.
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1, latency_backoff: bool = False):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.limit = float(self.min_limit)
+        self._slow_start = True
+        self.latency_backoff = latency_backoff
+        self.in_flight = 0
+        self.response_time = None  # Media móvil de la duración de cada petición, en segundos
+        self.successes = 0
+        self.failures = 0
+        self.decreases = 0
+        self._costs = deque(maxlen=LATENCY_WINDOW)  # Segundos por carácter de las últimas peticiones sin saturación
+        self._recent = deque(maxlen=LATENCY_RECENT)  # Segundos por carácter de las últimas peticiones correctas
+        self._slow_samples = 0  # Medidas seguidas con la latencia reciente por encima de la tolerancia
+        self._last_decrease = float("-inf")
+        self._waiters = []  # Montículo de (prioridad, orden de llegada, futuro)
+        self._arrivals = itertools.count()
+
+    def _has_room(self) -> bool:
+        return self.in_flight < int(self.limit)
+
+    async def acquire(self, priority: float = None) -> float:
+        """Espera a que haya hueco para una petición; devuelve su instante de inicio.
+
+        Las peticiones en espera obtienen turno por orden de `priority` (menor primero) y, a
+        igual prioridad o sin ella, por orden de llegada. Un hueco que se libera con peticiones
+        en espera se entrega directamente a la primera (ver `_wake`), así que una petición que
+        llega en ese momento no puede adelantarla: solo se pasa sin esperar si no hay nadie.
+        """
+        while self._waiters and self._waiters[0][2].done():
+            heapq.heappop(self._waiters)  # Esperas canceladas
+        if self._has_room() and not self._waiters:
+            self.in_flight += 1
+            return time.monotonic()
+        key = float("inf") if priority is None else priority
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (key, next(self._arrivals), waiter))
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            # Si ya se le había dado el turno, lo devuelve y pasa al siguiente; si no, su futuro
+            # cancelado se descarta al salir del montículo.
+            if waiter.done() and not waiter.cancelled():
+                self.in_flight -= 1
+                self._wake()
+            raise
+        return time.monotonic()
+
+    def acquire_now(self) -> float:
+        """Ocupa un turno sin esperar, aunque supere el límite; devuelve su instante de inicio.
+
+        Es para peticiones ya acotadas por otro medio (los duplicados de HedgePolicy): mientras
+        duran, las demás esperan, así que el total en vuelo vuelve enseguida al límite.
+        """
+        self.in_flight += 1
+        return time.monotonic()
+
+    def release(self, started: float, success, chars: int):
+        """Registra el resultado de una petición iniciada con `acquire` y ajusta el límite.
+
+        `success` es None si la petición se abandonó (cancelación) y no dice nada del servicio.
+        """
+        self.in_flight -= 1
+        now = time.monotonic()
+        if success is None:
+            pass
+        elif success:
+            self.successes += 1
+            elapsed = now - started
+            cost = elapsed / max(chars, MIN_LATENCY_CHARS)
+            self.response_time = self._smooth(self.response_time, elapsed)
+            if self.latency_backoff and self._latency_high(cost):
+                self._decrease(started, now, LATENCY_DECREASE)
+            else:
+                step = 1 if self._slow_start else 1 / self.limit
+                self.limit = min(self.max_limit, self.limit + step)
+        else:
+            self.failures += 1
+            self._decrease(started, now, FAILURE_DECREASE)
+        self._wake()
+
+    def _latency_high(self, cost: float) -> bool:
+        """Registra una medida; indica si la latencia lleva LATENCY_PERSISTENCE medidas por encima de la tolerancia."""
+        self._recent.append(cost)
+        if len(self._costs) < LATENCY_RECENT:
+            self._costs.append(cost)
+            return False
+        baseline = sorted(self._costs)[int(len(self._costs) * LATENCY_BASELINE_PERCENTILE)]
+        if statistics.median(self._recent) > baseline * LATENCY_TOLERANCE:
+            self._slow_samples += 1
+            if self._slow_samples >= LATENCY_WINDOW:
+                # Lenta durante toda una ventana: ha cambiado el servicio, no es una cola pasajera.
+                self._costs.clear()
+                self._costs.extend(self._recent)
+                self._slow_samples = 0
+        else:
+            # Solo las medidas sin saturación actualizan la referencia, para que una cola larga no la arrastre.
+            self._costs.append(cost)
+            self._slow_samples = 0
+        return self._slow_samples >= LATENCY_PERSISTENCE
+
+    @staticmethod
+    def _smooth(average, value: float) -> float:
+        return value if average is None else average + LATENCY_SMOOTHING * (value - average)
+
+    def _decrease(self, started: float, now: float, factor: float):
+        if started < self._last_decrease:
+            return
+        self.limit = max(self.min_limit, self.limit * factor)
+        self._slow_start = False
+        self._last_decrease = now
+        self.decreases += 1
+
+    def _wake(self):
+        """Entrega los huecos libres a las primeras peticiones en espera, ocupándolos ya en su nombre."""
+        while self._has_room() and self._waiters:
+            waiter = heapq.heappop(self._waiters)[2]
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def describe(self) -> str:
+        """Estado actual en una línea, para la barra de progreso y la GUI."""
+        text = f"{self.in_flight}/{int(self.limit)} simultáneas (máx. {self.max_limit})"
+        if self.response_time is not None:
+            text += f", {self.response_time:.1f} s/petición"
+        return text
+
+    def stats(self) -> dict:
+        """Devuelve los contadores del control de ritmo."""
+        return {
+            "limit": int(self.limit),
+            "max_limit": self.max_limit,
+            "successes": self.successes,
+            "failures": self.failures,
+            "decreases": self.decreases,
+            "response_time": self.response_time,
+        }
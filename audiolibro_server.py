@@ -0,0 +1,407 @@
+import asyncio
+import os
+import re
+import signal
+import time
+import uuid
+from aiohttp import web
+from audiolibro_creator import (
+    console, create_arg_parser, process_audiobook_creation, resolve_output_file,
+    CHUNK_MAX_SIZE, DEFAULT_BATCH_JOBS, DEFAULT_CONCAT_ENGINE, DEFAULT_CONCURRENCY, DEFAULT_RETRIES, DEFAULT_VOICE,
+)
+from audiolibro_backends import create_backend, parse_backend_options
+from audiolibro_cache import SynthesisCache
+from audiolibro_hedge import HedgePolicy
+from audiolibro_metrics import MetricsRecorder
+from audiolibro_pool import SynthesisPool
+from audiolibro_sizing import ThroughputModel
+from audiolibro_voices import VoiceCatalogue
+
+# --- Constantes ---
+DEFAULT_HOST = "127.0.0.1"  # Solo conexiones locales: la API no tiene autenticación
+DEFAULT_PORT = 8765
+DEFAULT_WORK_DIR = "server_jobs"  # Textos recibidos por la API, en la carpeta del proyecto
+MAX_REQUEST_MB = 64  # Tamaño máximo del cuerpo de una petición (el texto de un libro)
+FINISHED_JOBS_KEPT = 1000  # Trabajos terminados que se siguen pudiendo consultar
+JOB_NAME_RE = re.compile(r"^[\w][\w .-]{0,99}$")
+
+class ServerJob:
+    """Un libro enviado al servidor y su estado: queued, running, completed, failed o cancelled."""
+
+    def __init__(self, job_id: str, name: str, text_file: str, output_file: str, options: dict):
+        self.id = job_id
+        self.name = name
+        self.text_file = text_file
+        self.output_file = output_file
+        self.options = options  # Voz, velocidad y demás argumentos de process_audiobook_creation
+        self.status = "queued"
+        self.message = ""
+        self.error = None
+        self.completed = 0
+        self.total = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.task = None
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("queued", "running")
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "status": self.status,
+            "voice": self.options["voice"],
+            "rate": self.options["rate"],
+            "completed": self.completed,
+            "total": self.total,
+            "message": self.message,
+            "error": self.error,
+            "output_file": self.output_file,
+            "submitted": self.submitted,
+            "started": self.started,
+            "finished": self.finished,
+        }
+
+class JobServer:
+    """Servidor de larga duración que convierte los libros recibidos por una API HTTP local.
+
+    Todos los trabajos pasan por una única cola y un único `SynthesisPool`, igual que en el modo
+    por lotes: se procesan hasta `max_active_jobs` libros a la vez y los trabajadores reparten
+    sus turnos entre ellos. El motor de síntesis (con sus conexiones), la caché, el control de
+    simultáneas y la lista de voces se preparan una vez y se aprovechan en todos los trabajos.
+
+    `defaults` son los valores de cada trabajo que la petición no indique (voz, velocidad,
+    estrategia, reintentos...); `settings`, los argumentos comunes a todos ellos (caché,
+    métricas, límite por petición, duplicados...). Las voces de los trabajos se comprueban contra
+    el catálogo guardado (`catalogue`), que se renueva en segundo plano cuando caduca.
+    """
+
+    def __init__(self, backend, concurrency: int = DEFAULT_CONCURRENCY, max_active_jobs: int = DEFAULT_BATCH_JOBS,
+                 work_dir: str = DEFAULT_WORK_DIR, defaults: dict = None, settings: dict = None,
+                 catalogue: VoiceCatalogue = None):
+        self.backend = backend
+        self.concurrency = concurrency
+        self.max_active_jobs = max(1, max_active_jobs)
+        self.work_dir = work_dir
+        self.defaults = {
+            "voice": DEFAULT_VOICE, "rate": "-5%", "retries": DEFAULT_RETRIES, "chunking_strategy": "smart",
+            "streaming": False, "incremental": False, "progressive": False, "concat_engine": DEFAULT_CONCAT_ENGINE,
+        }
+        self.defaults.update(defaults or {})
+        self.settings = settings or {}
+        self.jobs = {}
+        self.pool = None
+        self._queue = None
+        self._runners = []
+        self.catalogue = catalogue or VoiceCatalogue(backend)
+
+    async def start(self):
+        """Abre el motor y el conjunto de trabajadores compartidos y empieza a atender la cola."""
+        os.makedirs(self.work_dir, exist_ok=True)
+        await self.backend.open(self.concurrency)
+        self.pool = SynthesisPool(self.concurrency, self.settings.get("latency_backoff", False))
+        self._queue = asyncio.Queue()
+        self._runners = [asyncio.ensure_future(self._runner()) for _ in range(self.max_active_jobs)]
+        try:
+            # Con el catálogo cargado, cada trabajo se valida al recibirlo.
+            await self.catalogue.get()
+        except Exception as e:
+            console.print(f"[yellow]ADVERTENCIA:[/yellow] No se pudo obtener el catálogo de voces ({e}); no se comprobarán las voces.")
+
+    async def close(self):
+        """Detiene la cola; los libros en curso se interrumpen y quedan listos para reanudarse."""
+        for runner in self._runners:
+            runner.cancel()
+        await asyncio.gather(*self._runners, return_exceptions=True)
+        if self.pool is not None:
+            await self.pool.close()
+        await self.backend.close()
+
+    # --- Trabajos ---
+    def submit(self, request: dict) -> ServerJob:
+        """Crea y encola un trabajo. Lanza ValueError si la petición no es válida."""
+        text = request.get("text")
+        text_file = request.get("text_file")
+        if (text is None) == (text_file is None):
+            raise ValueError("indica 'text' (el texto del libro) o 'text_file' (una ruta en este equipo), pero no ambos")
+        if text_file is not None and not os.path.isfile(text_file):
+            raise ValueError(f"el archivo de texto '{text_file}' no existe")
+        if text is not None and (not isinstance(text, str) or not text.strip()):
+            raise ValueError("'text' debe ser un texto no vacío")
+
+        options = dict(self.defaults)
+        for key in self.defaults:
+            if key in request:
+                options[key] = request[key]
+        for key in ("voice", "rate"):
+            if not isinstance(options[key], str) or not options[key]:
+                raise ValueError(f"'{key}' debe ser un texto no vacío")
+        for key in ("streaming", "incremental", "progressive"):
+            if not isinstance(options[key], bool):
+                raise ValueError(f"'{key}' debe ser true o false")
+        if self.catalogue.voices and self.catalogue.find(options["voice"]) is None:
+            raise ValueError(self.catalogue.unknown_voice_message(options["voice"]))
+        if options["chunking_strategy"] not in ("smart", "legacy"):
+            raise ValueError("'chunking_strategy' debe ser 'smart' o 'legacy'")
+        if options["concat_engine"] not in ("native", "ffmpeg"):
+            raise ValueError("'concat_engine' debe ser 'native' o 'ffmpeg'")
+        if not isinstance(options["retries"], int) or options["retries"] < 1:
+            raise ValueError("'retries' debe ser un número entero mayor o igual que 1")
+
+        job_id = uuid.uuid4().hex[:12]
+        name = request.get("name")
+        if name is None:
+            name = re.sub(r"[^\w .-]+", "_", os.path.splitext(os.path.basename(text_file))[0])[:100] if text_file else f"libro_{job_id}"
+        if not isinstance(name, str) or not JOB_NAME_RE.match(name):
+            raise ValueError("'name' solo puede contener letras, números, espacios, '.', '-' y '_'")
+
+        output_file = resolve_output_file(text_file or f"{name}.txt", f"{name}.mp3", announce=False)
+        # Dos trabajos con la misma salida compartirían el directorio temporal del libro.
+        if any(job.active and job.output_file == output_file for job in self.jobs.values()):
+            raise FileExistsError(f"ya hay un trabajo en curso que genera '{output_file}'")
+        if text is not None:
+            # El texto se guarda con el nombre del libro: un nuevo envío tras un fallo reanuda su trabajo.
+            text_file = os.path.join(self.work_dir, f"{name}.txt")
+            partial_path = text_file + ".part"
+            with open(partial_path, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(partial_path, text_file)
+
+        job = ServerJob(job_id, name, os.path.abspath(text_file), output_file, options)
+        self.jobs[job_id] = job
+        self._forget_finished()
+        self._queue.put_nowait(job)
+        return job
+
+    def cancel(self, job: ServerJob):
+        """Cancela un trabajo en cola o en curso; el trabajo ya hecho se conserva para reanudarlo."""
+        if job.status == "queued":
+            job.status = "cancelled"
+            job.finished = time.time()
+        elif job.status == "running" and job.task is not None:
+            job.task.cancel()
+
+    def _forget_finished(self):
+        finished = [job for job in self.jobs.values() if not job.active]
+        for job in finished[:max(0, len(finished) - FINISHED_JOBS_KEPT)]:
+            del self.jobs[job.id]
+
+    async def _runner(self):
+        while True:
+            job = await self._queue.get()
+            if job.status != "queued":
+                continue  # Cancelado mientras esperaba
+            job.task = asyncio.ensure_future(self._run(job))
+            try:
+                await asyncio.shield(job.task)
+            except asyncio.CancelledError:
+                # Si se cancela el propio servidor, se interrumpe también el libro.
+                if not job.task.done():
+                    job.task.cancel()
+                    await asyncio.gather(job.task, return_exceptions=True)
+                    raise
+
+    async def _run(self, job: ServerJob):
+        job.status = "running"
+        job.started = time.time()
+
+        def on_progress(completed, total):
+            job.completed = completed
+            job.total = total
+
+        def on_status(message):
+            job.message = message
+
+        try:
+            # Con callbacks process_audiobook_creation trabaja en silencio, como desde la GUI.
+            await process_audiobook_creation(
+                job.text_file, job.output_file, job.options["voice"], job.options["retries"], job.options["rate"],
+                job.options["chunking_strategy"], status_callback=on_status, progress_callback=on_progress,
+                concurrency=self.concurrency, streaming=job.options["streaming"], incremental=job.options["incremental"],
+                concat_engine=job.options["concat_engine"], progressive=job.options["progressive"],
+                pool=self.pool, backend=self.backend, **self.settings,
+            )
+            job.status = "completed"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+            job.message = "Cancelado (los fragmentos se conservan para reanudar)"
+        except SystemExit:
+            # process_audiobook_creation aborta con sys.exit(); aquí solo afecta a este trabajo.
+            job.status = "failed"
+            job.error = "no se pudo completar (los fragmentos se conservan para reanudar)"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e) or type(e).__name__
+        finally:
+            job.finished = time.time()
+            console.print(f"[cyan]Trabajo {job.id}[/cyan] ({job.name}): [bold]{job.status}[/bold]")
+
+    # --- API HTTP ---
+    def create_app(self) -> web.Application:
+        """Aplicación aiohttp con la API de trabajos.
+
+        POST /jobs            encola un libro: {"text" | "text_file", "name", "voice", "rate", ...}
+        GET  /jobs            lista los trabajos
+        GET  /jobs/{id}       estado y progreso de un trabajo
+        GET  /jobs/{id}/audio MP3 de un trabajo completado
+        DELETE /jobs/{id}     cancela un trabajo
+        GET  /voices          voces del motor
+        GET  /status          estado del servidor
+        """
+        app = web.Application(client_max_size=MAX_REQUEST_MB * 1024 * 1024)
+        app.add_routes([
+            web.post("/jobs", self._handle_submit),
+            web.get("/jobs", self._handle_list),
+            web.get("/jobs/{job_id}", self._handle_get),
+            web.get("/jobs/{job_id}/audio", self._handle_audio),
+            web.delete("/jobs/{job_id}", self._handle_cancel),
+            web.get("/voices", self._handle_voices),
+            web.get("/status", self._handle_status),
+        ])
+        return app
+
+    def _find(self, request: web.Request) -> ServerJob:
+        job = self.jobs.get(request.match_info["job_id"])
+        if job is None:
+            raise web.HTTPNotFound(text='{"error": "trabajo no encontrado"}', content_type="application/json")
+        return job
+
+    async def _handle_submit(self, request: web.Request) -> web.Response:
+        try:
+            body = await request.json()
+        except ValueError:
+            return web.json_response({"error": "el cuerpo debe ser un objeto JSON"}, status=400)
+        if not isinstance(body, dict):
+            return web.json_response({"error": "el cuerpo debe ser un objeto JSON"}, status=400)
+        try:
+            job = self.submit(body)
+        except FileExistsError as e:
+            return web.json_response({"error": str(e)}, status=409)
+        except ValueError as e:
+            return web.json_response({"error": str(e)}, status=400)
+        return web.json_response(job.to_dict(), status=202, headers={"Location": f"/jobs/{job.id}"})
+
+    async def _handle_list(self, request: web.Request) -> web.Response:
+        return web.json_response([job.to_dict() for job in self.jobs.values()])
+
+    async def _handle_get(self, request: web.Request) -> web.Response:
+        return web.json_response(self._find(request).to_dict())
+
+    async def _handle_audio(self, request: web.Request) -> web.StreamResponse:
+        job = self._find(request)
+        if job.status != "completed":
+            return web.json_response({"error": f"el trabajo no está completado ({job.status})"}, status=409)
+        if not os.path.isfile(job.output_file):
+            return web.json_response({"error": "el archivo de salida ya no existe"}, status=410)
+        return web.FileResponse(job.output_file, headers={
+            "Content-Type": "audio/mpeg",
+            "Content-Disposition": f'attachment; filename="{os.path.basename(job.output_file)}"',
+        })
+
+    async def _handle_cancel(self, request: web.Request) -> web.Response:
+        job = self._find(request)
+        if not job.active:
+            return web.json_response({"error": f"el trabajo ya ha terminado ({job.status})"}, status=409)
+        self.cancel(job)
+        return web.json_response(job.to_dict(), status=202)
+
+    async def _handle_voices(self, request: web.Request) -> web.Response:
+        try:
+            voices = await self.catalogue.get()
+        except Exception as e:
+            return web.json_response({"error": f"no se pudo obtener la lista de voces: {e}"}, status=502)
+        return web.json_response([
+            {"ShortName": v["ShortName"], "Gender": v["Gender"], "Locale": v["Locale"]} for v in voices
+        ])
+
+    async def _handle_status(self, request: web.Request) -> web.Response:
+        counts = {}
+        for job in self.jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        status = {
+            "backend": self.backend.name,
+            "concurrency": self.concurrency,
+            "max_active_jobs": self.max_active_jobs,
+            "jobs": counts,
+            "limiter": self.pool.limiter.stats(),
+        }
+        hedging = self.settings.get("hedging")
+        if hedging is not None:
+            status["hedging"] = hedging.stats()
+        if self.settings.get("cache") is not None:
+            status["cache"] = self.settings["cache"].stats()
+        return web.json_response(status)
+
+def create_server_arg_parser():
+    """Argumentos de `main.py --serve`: los de la CLI (valores por defecto de cada trabajo) más los del servidor."""
+    parser = create_arg_parser()
+    parser.description = "Servidor de trabajos del Generador de Audiolibros (API HTTP local)."
+    parser.add_argument("--serve", action="store_true", help="Ejecuta el servidor de trabajos (implícito en este modo).")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"Dirección en la que escucha el servidor (default: {DEFAULT_HOST}).")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Puerto del servidor (default: {DEFAULT_PORT}).")
+    parser.add_argument("--work-dir", default=DEFAULT_WORK_DIR, help=f"Directorio donde se guardan los textos recibidos (default: {DEFAULT_WORK_DIR}).")
+    return parser
+
+async def serve(argv=None):
+    """Arranca el servidor y atiende peticiones hasta que se interrumpe."""
+    parser = create_server_arg_parser()
+    args = parser.parse_args(argv)
+    if args.text_file or args.batch or args.list_voices:
+        parser.error("--text-file, --batch y --list-voices no se usan con --serve; los libros se envían a la API")
+    if args.concurrency < 1:
+        parser.error("--concurrency debe ser un número entero mayor o igual que 1")
+    if args.hedge is not None and not 0 < args.hedge < 100:
+        parser.error("--hedge debe ser un percentil entre 0 y 100")
+    if args.metrics_prometheus and not args.metrics:
+        parser.error("--metrics-prometheus requiere --metrics")
+    try:
+        backend = create_backend(args.backend, parse_backend_options(args.backend_option))
+    except ValueError as e:
+        parser.error(str(e))
+
+    chunk_size = args.chunk_size
+    if chunk_size == "auto":
+        # El modelo se comparte entre trabajos: cada libro parte de lo medido en los anteriores.
+        chunk_size = ThroughputModel(CHUNK_MAX_SIZE)
+        if args.metrics:
+            chunk_size.load_history(args.metrics)
+    metrics = MetricsRecorder(args.metrics, args.metrics_prometheus) if args.metrics else None
+    settings = {
+        "cache": None if args.no_cache else SynthesisCache(args.cache_dir, args.cache_size),
+        "metrics": metrics,
+        "chunk_size": chunk_size,
+        "chunk_timeout": args.chunk_timeout,
+        "hedging": HedgePolicy(args.hedge, args.hedge_budget) if args.hedge is not None else None,
+        "dedup": not args.no_dedup,
+        "latency_backoff": args.latency_backoff,
+    }
+    defaults = {
+        "voice": args.voice, "rate": args.rate, "retries": args.retries, "chunking_strategy": args.chunking_strategy,
+        "streaming": args.streaming, "incremental": args.incremental, "progressive": args.progressive,
+        "concat_engine": args.concat_engine,
+    }
+
+    server = JobServer(backend, args.concurrency, args.batch_jobs, args.work_dir, defaults, settings,
+                       VoiceCatalogue(backend, args.cache_dir))
+    await server.start()
+    runner = web.AppRunner(server.create_app(), access_log=None)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, args.host, args.port).start()
+        console.print(f"[bold green]Servidor de audiolibros escuchando en http://{args.host}:{args.port}[/bold green] "
+                      f"(motor {backend.name}, {args.concurrency} síntesis simultáneas, {server.max_active_jobs} libros a la vez)")
+        stop = asyncio.Event()
+        try:
+            # Detenido como servicio (SIGTERM), el servidor cierra igual que con Ctrl+C.
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+        except (NotImplementedError, AttributeError):
+            pass  # Windows: solo Ctrl+C
+        await stop.wait()
+    finally:
+        await runner.cleanup()
+        await server.close()
+        if metrics is not None:
+            metrics.close()
@@ -0,0 +1,573 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import shutil
+import socket
+import sys
+import time
+from datetime import timedelta
+from audiolibro_creator import (
+    console, ChunkSynthesisError, IncrementalAssembler, cleanup, concatenate_chunks, job_temp_dir, plan_chunks,
+    synthesize_chunk,
+    CHUNK_MAX_SIZE, DEFAULT_CONCAT_ENGINE, DEFAULT_CONCURRENCY, DEFAULT_RETRIES,
+)
+from audiolibro_dedup import DedupPlanner
+from audiolibro_hedge import DEFAULT_CHUNK_TIMEOUT
+from audiolibro_manifest import ResumeManifest
+from audiolibro_metrics import JobMetrics
+from audiolibro_pool import SynthesisPool
+from audiolibro_rate import retry_delay
+
+# --- Constantes ---
+SHARD_VERSION = 1
+JOB_FILENAME = "job.json"
+SHARD_SUBDIRS = ("leases", "done", "ranges", "logs")
+DEFAULT_RANGE_SIZE = 16  # Fragmentos por rango: lo que se pierde como mucho si un trabajador cae
+DEFAULT_LEASE_SECONDS = 60.0  # Vigencia de un rango sin renovar; se renueva cada tercio
+POLL_INTERVAL = 1.0  # Segundos entre comprobaciones de rangos libres o terminados
+WORKER_EXIT_TIMEOUT = 10.0  # Espera a que los trabajadores locales terminen antes de detenerlos
+CREATOR_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "audiolibro_creator.py")
+WORKER_ID_RE = re.compile(r"[^\w.-]+")
+
+def default_worker_id(slot: int = None) -> str:
+    """Identificador de un trabajador: el equipo y el proceso, o el puesto si lo lanza el coordinador.
+
+    Con un identificador estable, un trabajador reiniciado recupera sus rangos sin esperar a que caduquen.
+    """
+    suffix = os.getpid() if slot is None else f"w{slot}"
+    return WORKER_ID_RE.sub("_", f"{socket.gethostname()}-{suffix}")
+
+def _write_json(path: str, data: dict):
+    """Escribe `path` de forma atómica."""
+    partial_path = f"{path}.{os.getpid()}.part"
+    with open(partial_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(partial_path, path)
+
+class ShardJob:
+    """Tabla de trabajo de un libro repartido entre varios procesos, en uno o varios equipos.
+
+    Vive en un directorio compartido: `job.json` guarda los fragmentos del libro (los fija el
+    coordinador, así todos los trabajadores los ven idénticos), la voz, la velocidad y el tamaño
+    de los rangos. Cada rango de fragmentos consecutivos se reparte con un archivo de concesión
+    en `leases/` creado en exclusiva (O_EXCL) con el trabajador y la hora en que caduca; quien lo
+    tiene lo renueva mientras trabaja y, si deja de hacerlo (el proceso o el equipo ha caído),
+    otro trabajador lo reclama al caducar. Al terminar un rango, su trabajador publica en
+    `done/` el directorio de `ranges/` donde ha dejado el audio.
+
+    Las carreras entre trabajadores solo pueden duplicar trabajo, nunca mezclarlo: cada uno
+    escribe en su propio directorio y el resultado se publica con un renombrado atómico. Las
+    caducidades usan la hora del sistema, así que los equipos deben tener el reloj sincronizado.
+    """
+
+    def __init__(self, directory: str, lease_seconds: float = DEFAULT_LEASE_SECONDS):
+        self.directory = directory
+        self.lease_seconds = lease_seconds
+        self.path = os.path.join(directory, JOB_FILENAME)
+        self.leases_dir, self.done_dir, self.ranges_dir, self.logs_dir = (os.path.join(directory, d) for d in SHARD_SUBDIRS)
+        self.id = None
+        self.voice = None
+        self.rate = None
+        self.range_size = DEFAULT_RANGE_SIZE
+        self.chunks = []
+        self.copies = {}  # Índice -> índice del fragmento idéntico cuyo audio reutiliza (ver DedupPlanner)
+
+    # --- Publicación (coordinador) ---
+    def publish(self, chunks: list[str], voice: str, rate: str, range_size: int, copies: dict = None) -> bool:
+        """Publica el libro para los trabajadores; devuelve True si continúa uno idéntico ya publicado.
+
+        Si el directorio contenía otro libro (o el texto ha cambiado) su estado se descarta.
+        """
+        copies = copies or {}
+        payload = json.dumps([chunks, voice, rate, range_size, sorted(copies.items())], ensure_ascii=False)
+        job_id = hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+        if self.load() and self.id == job_id:
+            return True
+        self.remove()
+        os.makedirs(self.directory, exist_ok=True)
+        for directory in (self.leases_dir, self.done_dir, self.ranges_dir, self.logs_dir):
+            os.makedirs(directory, exist_ok=True)
+        data = {
+            "version": SHARD_VERSION, "id": job_id, "voice": voice, "rate": rate, "range_size": range_size,
+            "chunks": chunks, "copies": {str(i): source for i, source in copies.items()},
+        }
+        _write_json(self.path, data)
+        self._set(data)
+        return False
+
+    def load(self) -> bool:
+        """Lee el libro publicado; False si aún no hay ninguno."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get("version") != SHARD_VERSION:
+            return False
+        self._set(data)
+        return True
+
+    def _set(self, data: dict):
+        self.id = data["id"]
+        self.voice = data["voice"]
+        self.rate = data["rate"]
+        self.range_size = data["range_size"]
+        self.chunks = data["chunks"]
+        self.copies = {int(i): source for i, source in data["copies"].items()}
+
+    @property
+    def published(self) -> bool:
+        """Si el libro sigue publicado (el coordinador borra el directorio al terminar)."""
+        return os.path.exists(self.path)
+
+    def remove(self):
+        """Borra el estado del libro, dejando el directorio si contiene otras cosas."""
+        for directory in (self.leases_dir, self.done_dir, self.ranges_dir, self.logs_dir):
+            shutil.rmtree(directory, ignore_errors=True)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        try:
+            os.rmdir(self.directory)
+        except OSError:
+            pass
+
+    # --- Rangos ---
+    @property
+    def range_count(self) -> int:
+        return -(-len(self.chunks) // self.range_size)
+
+    def range_chunks(self, r: int) -> list:
+        """[(índice, texto)] del rango `r` que hay que sintetizar (las copias no)."""
+        start = r * self.range_size
+        return [(i, chunk) for i, chunk in enumerate(self.chunks[start:start + self.range_size], start)
+                if i not in self.copies]
+
+    def _lease_path(self, r: int) -> str:
+        return os.path.join(self.leases_dir, f"{r:04d}.lease")
+
+    def _done_path(self, r: int) -> str:
+        return os.path.join(self.done_dir, f"{r:04d}.json")
+
+    def is_done(self, r: int) -> bool:
+        return os.path.exists(self._done_path(r))
+
+    def pending(self) -> list[int]:
+        """Rangos aún sin terminar."""
+        return [r for r in range(self.range_count) if not self.is_done(r)]
+
+    def result_dir(self, r: int):
+        """Directorio con el audio del rango terminado `r`, o None si el coordinador ya lo tenía."""
+        with open(self._done_path(r), "r", encoding="utf-8") as f:
+            result = json.load(f)["dir"]
+        return os.path.join(self.ranges_dir, result) if result else None
+
+    def reopen(self, r: int):
+        """Vuelve a poner en reparto un rango cuyo resultado no se ha podido leer."""
+        try:
+            os.remove(self._done_path(r))
+        except FileNotFoundError:
+            pass
+
+    # --- Concesiones ---
+    def _write_lease(self, path: str, worker: str, exclusive: bool):
+        data = json.dumps({"worker": worker, "expires": time.time() + self.lease_seconds}).encode("utf-8")
+        if not exclusive:
+            partial_path = f"{path}.{worker}.part"
+            with open(partial_path, "wb") as f:
+                f.write(data)
+            os.replace(partial_path, path)
+            return
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)  # FileExistsError si ya tiene dueño
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+
+    def _read_lease(self, path: str) -> tuple:
+        """(trabajador, caducidad) de una concesión; (None, 0) si no existe."""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                lease = json.load(f)
+            return lease["worker"], lease["expires"]
+        except FileNotFoundError:
+            return None, 0
+        except (OSError, ValueError, KeyError):
+            # Recién creada y aún vacía: se respeta salvo que lleve así más que una concesión.
+            try:
+                stale = time.time() - os.path.getmtime(path) > self.lease_seconds
+            except OSError:
+                return None, 0
+            return None, 0 if stale else float("inf")
+
+    def acquire(self, worker: str):
+        """Concede a `worker` el primer rango sin terminar que esté libre o caducado; None si no hay."""
+        for r in range(self.range_count):
+            if self.is_done(r):
+                continue
+            path = self._lease_path(r)
+            try:
+                self._write_lease(path, worker, exclusive=True)
+            except FileExistsError:
+                holder, expires = self._read_lease(path)
+                if holder == worker:
+                    # El mismo trabajador, reiniciado: retoma su rango sin esperar a que caduque.
+                    self._write_lease(path, worker, exclusive=False)
+                elif expires > time.time():
+                    continue
+                else:
+                    # Caducada: de los que la reclaman a la vez, solo uno consigue apartarla.
+                    stale_path = f"{path}.{worker}.stale"
+                    try:
+                        os.replace(path, stale_path)
+                    except FileNotFoundError:
+                        continue
+                    os.remove(stale_path)
+                    try:
+                        self._write_lease(path, worker, exclusive=True)
+                    except FileExistsError:
+                        continue
+            if self.is_done(r):
+                # Se terminó entre la comprobación y la concesión.
+                self.release(r, worker)
+                continue
+            return r
+        return None
+
+    def renew(self, r: int, worker: str) -> bool:
+        """Prolonga la concesión del rango `r`; False si ya no es de `worker`."""
+        path = self._lease_path(r)
+        if self._read_lease(path)[0] != worker:
+            return False
+        self._write_lease(path, worker, exclusive=False)
+        return True
+
+    def release(self, r: int, worker: str):
+        path = self._lease_path(r)
+        if self._read_lease(path)[0] == worker:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def complete(self, r: int, worker: str, result_dir: str = None):
+        """Publica el resultado del rango `r` (el nombre de su directorio en `ranges/`) y lo libera."""
+        _write_json(self._done_path(r), {"worker": worker, "dir": result_dir})
+        self.release(r, worker)
+
+    def active_workers(self) -> set:
+        """Trabajadores con alguna concesión vigente."""
+        now = time.time()
+        workers = set()
+        for name in os.listdir(self.leases_dir):
+            if name.endswith(".lease"):
+                holder, expires = self._read_lease(os.path.join(self.leases_dir, name))
+                if holder is not None and expires > now:
+                    workers.add(holder)
+        return workers
+
+# --- Trabajador ---
+async def run_shard_worker(directory: str, backend, retries: int = DEFAULT_RETRIES, concurrency: int = DEFAULT_CONCURRENCY, cache=None, chunk_timeout: float = DEFAULT_CHUNK_TIMEOUT, hedging=None, worker_id: str = None, lease_seconds: float = DEFAULT_LEASE_SECONDS, latency_backoff: bool = False) -> int:
+    """Sintetiza rangos del libro publicado en `directory` hasta que no quede ninguno; devuelve cuántos.
+
+    Espera a que el coordinador publique el libro y reclama los rangos de los trabajadores que
+    han dejado de renovar su concesión. Cada rango se guarda en un directorio propio con su
+    ResumeManifest, así que un trabajador reiniciado con el mismo `worker_id` retoma el audio
+    que ya tenía. Si un fragmento falla tras agotar los reintentos, libera el rango para que lo
+    intente otro y lanza ChunkSynthesisError.
+    """
+    worker = WORKER_ID_RE.sub("_", worker_id) if worker_id else default_worker_id()
+    shard = ShardJob(directory, lease_seconds)
+    if not shard.load():
+        console.print(f"[cyan]Esperando a que el coordinador publique el libro en '{directory}'...[/cyan]")
+        while not shard.load():
+            await asyncio.sleep(POLL_INTERVAL)
+    console.print(f"[bold green]Trabajador {worker}[/bold green]: {len(shard.chunks)} fragmentos en {shard.range_count} rangos "
+                  f"(motor {backend.name}, {concurrency} síntesis simultáneas)")
+
+    # Un solo conjunto para todos los rangos: el control de simultáneas conserva lo aprendido.
+    pool = SynthesisPool(concurrency, latency_backoff)
+    ranges_done = 0
+    try:
+        while shard.published:
+            r = shard.acquire(worker)
+            if r is None:
+                if not shard.pending():
+                    break
+                await asyncio.sleep(POLL_INTERVAL)  # Los demás rangos están concedidos a otros trabajadores
+                continue
+            if await _synthesize_range(shard, r, worker, pool, backend, retries, cache, chunk_timeout, hedging):
+                ranges_done += 1
+    finally:
+        await pool.close()
+    console.print(f"[bold green]Trabajador {worker}[/bold green]: {ranges_done} rangos sintetizados.")
+    return ranges_done
+
+async def _synthesize_range(shard: ShardJob, r: int, worker: str, pool: SynthesisPool, backend, retries: int, cache, chunk_timeout: float, hedging) -> bool:
+    """Sintetiza el rango `r` y publica su resultado; False si otro trabajador se lo ha quitado."""
+    result_name = f"{r:04d}-{worker}"
+    range_dir = os.path.join(shard.ranges_dir, result_name)
+    os.makedirs(range_dir, exist_ok=True)
+    manifest = ResumeManifest(range_dir)
+
+    async def synthesize_item(item):
+        i, chunk = item
+        chunk_filename = os.path.join(range_dir, f"chunk_{i:04d}.mp3")
+        for attempt in range(retries):
+            if await synthesize_chunk(chunk, shard.voice, chunk_filename, shard.rate, cache, pool.limiter, None, backend, chunk_timeout, hedging):
+                manifest.record(i, chunk, shard.voice, shard.rate)
+                return
+            if attempt < retries - 1:
+                await asyncio.sleep(retry_delay(attempt))
+        raise ChunkSynthesisError(i)
+
+    async def heartbeat():
+        while True:
+            await asyncio.sleep(shard.lease_seconds / 3)
+            if not shard.renew(r, worker):
+                return
+
+    job = pool.open_job(synthesize_item)
+    heartbeat_task = asyncio.ensure_future(heartbeat())
+    try:
+        for i, chunk in shard.range_chunks(r):
+            if not manifest.claim(i, chunk, shard.voice, shard.rate):
+                await job.submit((i, chunk))
+        job.close()
+        await asyncio.wait({job.finished, heartbeat_task}, return_when=asyncio.FIRST_COMPLETED)
+        if not job.finished.done():
+            console.print(f"[yellow]ADVERTENCIA:[/yellow] El rango {r + 1} ha pasado a otro trabajador; se abandona.")
+            return False
+        try:
+            job.finished.result()
+        except ChunkSynthesisError as e:
+            console.print(f"[bold red]ERROR:[/bold red] No se pudo generar el fragmento {e.index + 1} después de {retries} intentos. "
+                          f"Se libera el rango {r + 1}.")
+            shard.release(r, worker)
+            raise
+    finally:
+        heartbeat_task.cancel()
+        job.cancel()
+        manifest.save()
+        manifest.close()
+    shard.complete(r, worker, result_name)
+    return True
+
+# --- Coordinador ---
+def worker_argv(args) -> list[str]:
+    """Opciones de la CLI que el coordinador transmite a los trabajadores que lanza."""
+    argv = ["--backend", args.backend, "--concurrency", str(args.concurrency), "--retries", str(args.retries),
+            "--chunk-timeout", str(args.chunk_timeout), "--cache-dir", args.cache_dir, "--cache-size", str(args.cache_size),
+            "--shard-lease", str(args.shard_lease)]
+    for option in args.backend_option:
+        argv += ["--backend-option", option]
+    if args.hedge is not None:
+        argv += ["--hedge", str(args.hedge), "--hedge-budget", str(args.hedge_budget)]
+    if args.no_cache:
+        argv.append("--no-cache")
+    if args.latency_backoff:
+        argv.append("--latency-backoff")
+    return argv
+
+async def _start_workers(shard: ShardJob, count: int, argv: list[str]) -> list:
+    """Lanza `count` trabajadores locales; la salida de cada uno va a su archivo en `logs/`."""
+    processes = []
+    for slot in range(count):
+        worker = default_worker_id(slot)
+        with open(os.path.join(shard.logs_dir, f"{worker}.log"), "ab") as log:
+            processes.append(await asyncio.create_subprocess_exec(
+                sys.executable, CREATOR_SCRIPT, "--shard-worker", shard.directory, "--shard-worker-id", worker, *argv,
+                stdin=asyncio.subprocess.DEVNULL, stdout=log, stderr=asyncio.subprocess.STDOUT,
+            ))
+    return processes
+
+async def _stop_workers(processes: list, wait: bool):
+    """Detiene los trabajadores locales; con `wait`, da antes un tiempo para que terminen solos."""
+    if wait:
+        try:
+            await asyncio.wait_for(asyncio.gather(*(p.wait() for p in processes)), WORKER_EXIT_TIMEOUT)
+        except asyncio.TimeoutError:
+            pass
+    for process in processes:
+        if process.returncode is None:
+            process.terminate()
+            await process.wait()
+
+async def process_sharded_creation(text_file: str, output_file: str, voice: str, rate: str, chunking_strategy: str, shard_dir: str, workers: int = 0, worker_arguments: list = (), range_size: int = DEFAULT_RANGE_SIZE, lease_seconds: float = DEFAULT_LEASE_SECONDS, chunk_size: int = CHUNK_MAX_SIZE, incremental: bool = False, concat_engine: str = DEFAULT_CONCAT_ENGINE, dedup: bool = True, metrics=None):
+    """Coordina la creación de un audiolibro repartido entre varios procesos de síntesis.
+
+    Fragmenta el texto y lo publica en `shard_dir` (ver ShardJob); con `workers` lanza esos
+    trabajadores locales con `worker_arguments`, y con 0 espera a los que se inicien aparte
+    (`--shard-worker`, en este u otros equipos que compartan el directorio). Cada rango
+    terminado se incorpora a un ResumeManifest propio del coordinador, de modo que el ensamblado
+    (incremental o al final) y la reanudación funcionan como en `process_audiobook_creation`.
+    Los fragmentos repetidos se sintetizan una sola vez en todo el libro: el coordinador copia su
+    audio al incorporarlo. Se lanza SystemExit si el libro no puede completarse.
+    """
+    from rich.panel import Panel # Importación local
+    from rich.progress import Progress, BarColumn, TextColumn, TimeRemainingColumn # Importación local
+    start_time = time.monotonic()
+    job_metrics = (metrics.open_job(output_file, voice, rate) if metrics is not None
+                   else JobMetrics(None, output_file, voice, rate))
+    status = "failed"
+    try:
+        console.print(Panel(
+            f"[bold]Archivo de entrada:[/] [cyan]{text_file}[/cyan]\n"
+            f"[bold]Archivo de salida:[/] [cyan]{output_file}[/cyan]\n"
+            f"[bold]Voz seleccionada:[/] [cyan]{voice}[/cyan]\n"
+            f"[bold]Velocidad:[/] [cyan]{rate}[/cyan]\n"
+            f"[bold]Directorio compartido:[/] [cyan]{shard_dir}[/cyan]\n"
+            f"[bold]Trabajadores locales:[/] [cyan]{workers or 'ninguno (se esperan trabajadores externos)'}[/cyan]\n"
+            f"[bold]Fragmentos por rango:[/] [cyan]{range_size}[/cyan]",
+            title="Generador de Audiolibros - Modo repartido", border_style="green"
+        ))
+
+        try:
+            with job_metrics.phase("read"), open(text_file, 'r', encoding='utf-8') as f:
+                text = f.read()
+        except OSError as e:
+            console.print(f"[bold red]Error al leer el archivo de texto: {e}[/bold red]")
+            sys.exit(1)
+        with job_metrics.phase("chunk"):
+            planner = DedupPlanner() if dedup else None
+            chunks = plan_chunks(text, chunking_strategy, chunk_size, planner)
+            copies = {}
+            for i, chunk in enumerate(chunks):
+                source = planner.original(i, chunk) if planner else None
+                if source is not None:
+                    copies[i] = source
+        total_chunks = len(chunks)
+
+        shard = ShardJob(shard_dir, lease_seconds)
+        if shard.publish(chunks, voice, rate, range_size, copies):
+            console.print(f"[cyan]Se continúa el reparto existente: {shard.range_count - len(shard.pending())} de {shard.range_count} rangos ya terminados.[/cyan]")
+
+        # --- Audio ya incorporado en una ejecución anterior del coordinador ---
+        temp_dir = job_temp_dir(output_file)
+        os.makedirs(temp_dir, exist_ok=True)
+        assembly_path = output_file + ".part" if incremental else None
+        manifest = ResumeManifest(temp_dir, assembly_path)
+        assembler = IncrementalAssembler(manifest) if incremental else None
+        ready = set()
+
+        def mark_ready(i: int, source: str):
+            job_metrics.chunk(i, len(chunks[i]), manifest.size(i), source)
+            ready.add(i)
+            if assembler:
+                assembler.mark_ready(i)
+
+        def ingest(r: int) -> bool:
+            """Incorpora el audio del rango terminado `r`; False si su resultado no es válido."""
+            result_dir = shard.result_dir(r)
+            missing = [(i, chunk) for i, chunk in shard.range_chunks(r) if i not in ready]
+            if not missing:
+                return True
+            if result_dir is None or not os.path.isdir(result_dir):
+                return False
+            result = ResumeManifest(result_dir)
+            try:
+                for i, chunk in missing:
+                    if not result.claim(i, chunk, voice, rate):
+                        return False
+                    data = result.read(i)
+                    if data:
+                        # Como al sintetizar: archivo parcial y renombrado, que `record` pasa al paquete.
+                        chunk_filename = os.path.join(temp_dir, f"chunk_{i:04d}.mp3")
+                        with open(chunk_filename + ".part", "wb") as f:
+                            f.write(data)
+                        os.replace(chunk_filename + ".part", chunk_filename)
+                    manifest.record(i, chunk, voice, rate)
+                    mark_ready(i, "shard")
+            finally:
+                result.close()
+            return True
+
+        def copy_repeated():
+            """Completa las repeticiones cuyo fragmento original ya está incorporado."""
+            for i, source in copies.items():
+                if i not in ready and source in ready:
+                    planner.reuse(manifest.locate, source, os.path.join(temp_dir, f"chunk_{i:04d}.mp3"))
+                    manifest.record(i, chunks[i], voice, rate)
+                    mark_ready(i, "dedup")
+
+        processes = []
+        synthesized = False
+        synthesis_start = time.perf_counter()
+        try:
+            for i, chunk in enumerate(chunks):
+                if manifest.claim(i, chunk, voice, rate):
+                    mark_ready(i, "resume")
+            manifest.drop_orphans(total_chunks)
+
+            pending = []
+            for r in range(shard.range_count):
+                if all(i in ready for i, _ in shard.range_chunks(r)):
+                    if not shard.is_done(r):
+                        shard.complete(r, "coordinador")  # Nada que sintetizar: los trabajadores lo saltan
+                else:
+                    pending.append(r)
+            if pending and workers:
+                processes = await _start_workers(shard, workers, worker_arguments)
+
+            with Progress(
+                TextColumn("[progress.description]{task.description}"),
+                BarColumn(),
+                TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
+                TextColumn("([progress.completed]{task.completed}/{task.total})"),
+                TimeRemainingColumn(),
+                console=console,
+            ) as progress:
+                task = progress.add_task("Esperando a los trabajadores...", total=total_chunks, completed=len(ready))
+                while True:
+                    for r in list(pending):
+                        if not shard.is_done(r):
+                            continue
+                        if ingest(r):
+                            pending.remove(r)
+                        else:
+                            console.print(f"[yellow]ADVERTENCIA:[/yellow] El resultado del rango {r + 1} no es válido; se vuelve a repartir.")
+                            shard.reopen(r)
+                    if planner:
+                        copy_repeated()
+                    progress.update(task, completed=len(ready),
+                                    description=f"Rangos pendientes: {len(pending)} ({len(shard.active_workers())} trabajadores activos)")
+                    if not pending and len(ready) == total_chunks:
+                        synthesized = True
+                        break
+                    if processes and all(p.returncode is not None for p in processes):
+                        console.print(f"[bold red]ERROR FATAL:[/bold red] Los trabajadores locales han terminado con {len(pending)} rangos sin completar. "
+                                      f"Revisa sus registros en '{shard.logs_dir}' y vuelve a lanzar el comando para reanudar.")
+                        sys.exit(1)
+                    await asyncio.sleep(POLL_INTERVAL)
+        finally:
+            job_metrics.add_phase("synthesize", time.perf_counter() - synthesis_start)
+            # Si el coordinador se detiene, los trabajadores locales también; los externos siguen.
+            await _stop_workers(processes, wait=synthesized)
+            if assembler:
+                assembler.close()
+            manifest.save()
+            manifest.close()
+
+        with job_metrics.phase("concatenate"):
+            if incremental:
+                assembler.finish()
+                os.replace(assembly_path, output_file)
+            else:
+                await concatenate_chunks(output_file, manifest, total_chunks, concat_engine)
+        cleanup(temp_dir)
+        shard.remove()
+        status = "ok"
+
+        duration = timedelta(seconds=time.monotonic() - start_time)
+        success_message = (
+            f"¡Audiolibro [bold green]'{output_file}'[/bold green] creado con éxito!\n\n"
+            f"Tiempo total empleado: [yellow]{str(duration).split('.')[0]}[/yellow]\n"
+            f"Fragmentos sintetizados por los trabajadores: [yellow]{job_metrics.sources['shard']}[/yellow] de [yellow]{total_chunks}[/yellow]"
+        )
+        if planner and planner.chars_saved > 0:
+            success_message += f"\nFragmentos repetidos: [yellow]{len(copies)}[/yellow] copiados en lugar de sintetizarse"
+        console.print(Panel(success_message, title="Proceso Completado", border_style="green"))
+    except asyncio.CancelledError:
+        status = "cancelled"
+        raise
+    finally:
+        job_metrics.finish(status)
@@ -0,0 +1,169 @@
+import json
+import os
+from audiolibro_rate import RETRY_BASE_DELAY
+
+# --- Constantes ---
+MIN_AUTO_CHUNK_SIZE = 500  # Límites del tamaño automático; por debajo el coste fijo de cada petición domina
+MAX_AUTO_CHUNK_SIZE = 4000
+AUTO_CHUNK_STEP = 250  # Granularidad de los tamaños candidatos
+MIN_SAMPLES = 5  # Peticiones correctas necesarias antes de cambiar el tamaño inicial
+OBSERVATION_DECAY = 0.97  # Peso que conserva cada medida anterior al llegar una nueva
+EXPLORATION_FACTOR = 1.5  # Nunca se pasa de 1,5 veces el mayor fragmento ya medido
+MAX_FAILURE_PROBABILITY = 0.95  # Tope de la probabilidad de fallo estimada, para que el coste sea finito
+MIN_IMPROVEMENT = 1.05  # Solo se cambia de tamaño si se espera al menos un 5% más de rendimiento
+HISTORY_RECORDS = 1000  # Registros del historial de métricas que se leen al empezar
+SIZES_FILENAME = "chunk_sizes.json"
+
+class _DecayingFit:
+    """Recta `y = a + b·x` ajustada por mínimos cuadrados, con olvido exponencial de las medidas."""
+
+    def __init__(self):
+        self.w = self.x = self.y = self.xx = self.xy = 0.0
+
+    def add(self, x: float, y: float):
+        self.decay()
+        self.w += 1
+        self.x += x
+        self.y += y
+        self.xx += x * x
+        self.xy += x * y
+
+    def decay(self):
+        self.w *= OBSERVATION_DECAY
+        self.x *= OBSERVATION_DECAY
+        self.y *= OBSERVATION_DECAY
+        self.xx *= OBSERVATION_DECAY
+        self.xy *= OBSERVATION_DECAY
+
+    def line(self):
+        """Devuelve (a, b) con b >= 0; si todas las x son iguales, la recta pasa por el origen."""
+        if not self.w:
+            return 0.0, 0.0
+        mean_x = self.x / self.w
+        mean_y = self.y / self.w
+        variance = self.xx / self.w - mean_x ** 2
+        if variance <= 1.0:
+            return 0.0, mean_y / max(mean_x, 1.0)
+        slope = max(0.0, (self.xy / self.w - mean_x * mean_y) / variance)
+        intercept = mean_y - slope * mean_x
+        if intercept < 0:
+            return 0.0, mean_y / max(mean_x, 1.0)
+        return intercept, slope
+
+class ThroughputModel:
+    """Modelo del rendimiento del servicio según el tamaño de los fragmentos.
+
+    La duración de una petición correcta se ajusta como `setup + per_char × caracteres`, y la
+    probabilidad de fallo de una petición como otra recta en función de sus caracteres (los
+    límites de uso fallan igual con cualquier tamaño, los cortes a mitad de audio castigan a los
+    fragmentos largos). Con ambas se estima el tiempo esperado de un fragmento contando
+    reintentos y esperas, y se elige el tamaño que maximiza los caracteres sintetizados por
+    segundo: los fragmentos pequeños pagan muchas veces el coste fijo, los grandes pierden mucho
+    trabajo en cada fallo. Las medidas antiguas pesan cada vez menos.
+    """
+
+    def __init__(self, initial_size: int):
+        self.initial_size = initial_size
+        self.size = initial_size
+        self.samples = 0
+        self._latency = _DecayingFit()  # Segundos por petición correcta
+        self._failure = _DecayingFit()  # 1 si la petición falló, 0 si no
+        self._largest = 0
+
+    def observe(self, chars: int, latency: float):
+        """Registra una petición correcta de `chars` caracteres que tardó `latency` segundos."""
+        self._latency.add(chars, latency)
+        self._failure.add(chars, 0.0)
+        self._largest = max(self._largest, chars)
+        self.samples += 1
+
+    def observe_failure(self, chars: int):
+        """Registra una petición fallida de `chars` caracteres."""
+        self._failure.add(chars, 1.0)
+
+    def expected_throughput(self, size: int) -> float:
+        """Caracteres por segundo esperados con fragmentos de `size` caracteres."""
+        setup, per_char = self._latency.line()
+        base_failure, failure_per_char = self._failure.line()
+        failure = min(max(base_failure + failure_per_char * size, 0.0), MAX_FAILURE_PROBABILITY)
+        # Cada fallo cuesta, de media, media petición más la espera antes del primer reintento.
+        retry_cost = setup + per_char * size / 2 + RETRY_BASE_DELAY / 2
+        expected = setup + per_char * size + failure / (1 - failure) * retry_cost
+        return size / expected if expected > 0 else float("inf")
+
+    def best_size(self) -> int:
+        """Tamaño objetivo para el siguiente fragmento."""
+        if self.samples < MIN_SAMPLES:
+            return self.size
+        ceiling = max(self.initial_size, self._largest * EXPLORATION_FACTOR)
+        candidates = [
+            size for size in range(MIN_AUTO_CHUNK_SIZE, MAX_AUTO_CHUNK_SIZE + 1, AUTO_CHUNK_STEP)
+            if size <= ceiling
+        ]
+        best = max(candidates, key=self.expected_throughput)
+        if self.expected_throughput(best) > self.expected_throughput(self.size) * MIN_IMPROVEMENT:
+            self.size = best
+        return self.size
+
+    def load_history(self, path: str) -> int:
+        """Alimenta el modelo con los fragmentos sintetizados en un archivo de métricas (--metrics).
+
+        Devuelve cuántos registros se han usado; un archivo inexistente o ilegible no es un error.
+        """
+        records = []
+        try:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if record.get("type") == "chunk" and record.get("source") == "synth" and record.get("latency_s") is not None:
+                        records.append(record)
+        except OSError:
+            return 0
+        records = records[-HISTORY_RECORDS:]
+        for record in records:
+            for _ in range(record.get("attempts", 1) - 1):
+                self.observe_failure(record["chars"])
+            self.observe(record["chars"], record["latency_s"])
+        return len(records)
+
+    def describe(self) -> str:
+        if self.samples < MIN_SAMPLES:
+            return f"fragmentos de {self.size} car. (midiendo)"
+        return f"fragmentos de {self.size} car. (~{self.expected_throughput(self.size):.0f} car/s por petición)"
+
+class AutoChunkSize:
+    """Límite de tamaño que consulta el fragmentador antes de empezar cada fragmento.
+
+    Los tamaños elegidos se guardan en el directorio temporal del libro: al reanudar se repiten
+    en el mismo orden, de modo que los fragmentos salen idénticos y el manifiesto de reanudación
+    reconoce el audio ya generado. Pasados los fragmentos conocidos, decide el modelo.
+    """
+
+    def __init__(self, model: ThroughputModel, temp_dir: str):
+        self.model = model
+        self.path = os.path.join(temp_dir, SIZES_FILENAME)
+        self.sizes = []
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self._replay = [int(size) for size in json.load(f)]
+        except (OSError, ValueError, TypeError):
+            self._replay = []
+
+    def __call__(self) -> int:
+        index = len(self.sizes)
+        size = self._replay[index] if index < len(self._replay) else self.model.best_size()
+        self.sizes.append(size)
+        return size
+
+    def save(self):
+        """Guarda los tamaños usados (y los pendientes de la ejecución anterior) de forma atómica."""
+        sizes = self.sizes + self._replay[len(self.sizes):]
+        if not sizes or not os.path.isdir(os.path.dirname(self.path)):
+            return
+        partial_path = self.path + ".part"
+        with open(partial_path, "w", encoding="utf-8") as f:
+            json.dump(sizes, f)
+        os.replace(partial_path, self.path)
@@ -0,0 +1,135 @@
+import asyncio
+import difflib
+import json
+import os
+import threading
+import time
+from audiolibro_cache import DEFAULT_CACHE_DIR
+
+# --- Constantes ---
+VOICES_TTL = 7 * 24 * 3600  # Segundos tras los que se vuelve a pedir el catálogo (cambia muy poco)
+VOICES_DIRNAME = "voices"  # Subdirectorio de la caché de síntesis donde se guarda cada catálogo
+VOICE_FIELDS = ("ShortName", "Gender", "Locale", "FriendlyName")  # Datos que se conservan de cada voz
+
+class VoiceCatalogue:
+    """Catálogo de voces de un motor de síntesis guardado en disco con caducidad.
+
+    La primera vez se pide la lista al motor; después se lee del disco al instante y, cuando
+    tiene más de `ttl` segundos, se renueva en segundo plano mientras se sigue usando la copia
+    guardada. Las voces se indexan por nombre, por localidad (`es-ES`) y por idioma (`es`).
+    """
+
+    def __init__(self, backend, cache_dir: str = DEFAULT_CACHE_DIR, ttl: float = VOICES_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self.path = os.path.join(cache_dir, VOICES_DIRNAME, f"{backend.name}.json")
+        self.voices = []
+        self.fetched_at = None  # Fecha (time.time) en que se obtuvo el catálogo
+        self._by_name = {}
+        self._by_locale = {}
+        self._refreshing = None
+        self._load()
+
+    @property
+    def stale(self) -> bool:
+        return self.fetched_at is None or time.time() - self.fetched_at > self.ttl
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._index(data["voices"], data["fetched_at"])
+        except (OSError, ValueError, KeyError, TypeError):
+            pass  # Sin catálogo guardado (o ilegible): se pedirá al motor
+
+    def _index(self, voices: list[dict], fetched_at: float):
+        self.voices = sorted(
+            ({field: voice[field] for field in VOICE_FIELDS if field in voice} for voice in voices),
+            key=lambda voice: voice["ShortName"],
+        )
+        self.fetched_at = fetched_at
+        self._by_name = {voice["ShortName"].lower(): voice for voice in self.voices}
+        self._by_locale = {}
+        for voice in self.voices:
+            locale = voice.get("Locale", "").lower()
+            self._by_locale.setdefault(locale, []).append(voice)
+            language = locale.split("-")[0]
+            if language != locale:
+                self._by_locale.setdefault(language, []).append(voice)
+
+    async def refresh(self) -> list[dict]:
+        """Pide el catálogo al motor y lo guarda en disco de forma atómica."""
+        voices = await self.backend.list_voices()
+        self._index(voices, time.time())
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        partial_path = self.path + ".part"
+        with open(partial_path, "w", encoding="utf-8") as f:
+            json.dump({"fetched_at": self.fetched_at, "voices": self.voices}, f, ensure_ascii=False)
+        os.replace(partial_path, self.path)
+        return self.voices
+
+    async def _refresh_quietly(self):
+        try:
+            await self.refresh()
+        except Exception:
+            pass  # Se sigue usando el catálogo guardado; se reintentará la próxima vez
+        finally:
+            self._refreshing = None
+
+    async def get(self, wait: bool = False) -> list[dict]:
+        """Devuelve las voces al instante si hay catálogo guardado.
+
+        Si no lo hay, o si ha caducado y `wait` es True, se espera a pedirlo al motor (con
+        catálogo caducado, un error del motor no impide usar la copia guardada). Si ha caducado y
+        `wait` es False, se renueva en segundo plano.
+        """
+        if not self.voices:
+            return await self.refresh()
+        if self.stale:
+            if wait:
+                await self._refresh_quietly()
+            elif self._refreshing is None:
+                self._refreshing = asyncio.ensure_future(self._refresh_quietly())
+        return self.voices
+
+    def refresh_in_thread(self, on_done):
+        """Renueva el catálogo en un hilo propio (para la GUI); llama a `on_done(voces, error)` desde ese hilo."""
+        def run():
+            try:
+                voices = asyncio.run(self.refresh())
+            except Exception as e:
+                on_done(self.voices, e)
+            else:
+                on_done(voices, None)
+        threading.Thread(target=run, daemon=True).start()
+
+    # --- Búsqueda ---
+    def find(self, name: str):
+        """La voz con ese nombre corto (sin distinguir mayúsculas), o None."""
+        return self._by_name.get(name.lower())
+
+    def search(self, locale: str = None, gender: str = None, query: str = None) -> list[dict]:
+        """Voces de una localidad (`es-ES`) o idioma (`es`), de un género y cuyo nombre contiene `query`."""
+        voices = self._by_locale.get(locale.lower(), []) if locale else self.voices
+        if gender:
+            voices = [voice for voice in voices if voice.get("Gender", "").lower() == gender.lower()]
+        if query:
+            query = query.lower()
+            voices = [
+                voice for voice in voices
+                if query in voice["ShortName"].lower() or query in voice.get("FriendlyName", "").lower()
+            ]
+        return voices
+
+    def suggestions(self, name: str, count: int = 3) -> list[str]:
+        """Nombres de voces parecidos a `name`, para los mensajes de error."""
+        names = {voice["ShortName"].lower(): voice["ShortName"] for voice in self.voices}
+        return [names[match] for match in difflib.get_close_matches(name.lower(), names, n=count, cutoff=0.6)]
+
+    def unknown_voice_message(self, name: str) -> str:
+        """Mensaje para una voz que no está en el catálogo."""
+        message = f"la voz '{name}' no existe en el catálogo de {self.backend.name}"
+        suggestions = self.suggestions(name)
+        if suggestions:
+            message += f" (¿quizá {', '.join(suggestions)}?)"
+        return message
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark de fragmentación: `chunk_text_smart` y `chunk_text_legacy` sobre corpus sintéticos.
+
+Genera textos reproducibles (ver corpus.py) de varios tamaños, de 100 KB a 1 GB, y con
+distintas longitudes de párrafo, y mide cuánto tarda cada estrategia en fragmentarlos. El
+texto se escribe primero en disco y se lee entero antes de medir, como hace la creación sin
+`--streaming`, así que los tamaños grandes necesitan varias veces su tamaño en memoria.
+"""
+
+import argparse
+import gc
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audiolibro_creator import CHUNK_MAX_SIZE, chunk_text_legacy, chunk_text_smart
+from corpus import DISTRIBUTIONS, write_corpus
+
+STRATEGIES = {"smart": chunk_text_smart, "legacy": chunk_text_legacy}
+SIZE_SUFFIXES = {"K": 10 ** 3, "M": 10 ** 6, "G": 10 ** 9}
+
+def parse_size(value: str) -> int:
+    """'100K', '10M' o '1G' (potencias de 10) a caracteres."""
+    value = value.strip().upper()
+    if value and value[-1] in SIZE_SUFFIXES:
+        return int(float(value[:-1]) * SIZE_SUFFIXES[value[-1]])
+    return int(value)
+
+def measure(chunker, text: str, max_size: int, repeat: int) -> tuple:
+    """(mejor tiempo en segundos, fragmentos) de `repeat` ejecuciones."""
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        chunks = chunker(text, max_size)
+        elapsed = time.perf_counter() - start
+        count = len(chunks)
+        del chunks
+        best = elapsed if best is None else min(best, elapsed)
+    return best, count
+
+def main():
+    parser = argparse.ArgumentParser(description="Mide la fragmentación de texto con corpus sintéticos.")
+    parser.add_argument("--sizes", type=lambda v: [parse_size(x) for x in v.split(",")], default=[10 ** 5, 10 ** 6, 10 ** 7],
+                        help="Tamaños del corpus separados por comas, con sufijos K, M o G (default: 100K,1M,10M; el máximo previsto es 1G).")
+    parser.add_argument("--distributions", type=lambda v: v.split(","), default=list(DISTRIBUTIONS),
+                        help=f"Distribuciones de longitud de párrafo separadas por comas (default: {','.join(DISTRIBUTIONS)}).")
+    parser.add_argument("--strategies", type=lambda v: v.split(","), default=list(STRATEGIES),
+                        help="Estrategias separadas por comas (default: smart,legacy).")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_MAX_SIZE, help=f"Caracteres máximos por fragmento (default: {CHUNK_MAX_SIZE}).")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones por caso; se toma la mejor (default: 3).")
+    parser.add_argument("--seed", type=int, default=0, help="Semilla del corpus (default: 0).")
+    parser.add_argument("--json", dest="json_path", help="Guarda los resultados en este archivo JSON.")
+    args = parser.parse_args()
+
+    for name in args.distributions:
+        if name not in DISTRIBUTIONS:
+            parser.error(f"distribución desconocida: {name}")
+    for name in args.strategies:
+        if name not in STRATEGIES:
+            parser.error(f"estrategia desconocida: {name}")
+
+    results = []
+    work_dir = tempfile.mkdtemp(prefix="bench_chunking_")
+    try:
+        for size in args.sizes:
+            for distribution in args.distributions:
+                path = os.path.join(work_dir, "corpus.txt")
+                input_bytes = write_corpus(path, size, distribution, args.seed)
+                with open(path, encoding="utf-8") as f:
+                    text = f.read()
+                os.remove(path)
+                for strategy in args.strategies:
+                    seconds, chunks = measure(STRATEGIES[strategy], text, args.chunk_size, args.repeat)
+                    results.append({
+                        "strategy": strategy,
+                        "distribution": distribution,
+                        "chars": len(text),
+                        "input_bytes": input_bytes,
+                        "chunk_size": args.chunk_size,
+                        "chunks": chunks,
+                        "mean_chunk_chars": round(len(text) / chunks) if chunks else 0,
+                        "seconds": round(seconds, 4),
+                        "mb_per_second": round(input_bytes / seconds / 1e6, 1) if seconds else None,
+                    })
+                    r = results[-1]
+                    print(f"{strategy:>6} {distribution:>12} {input_bytes / 1e6:>9.1f} MB: {r['seconds']:.3f} s  "
+                          f"{r['mb_per_second']} MB/s  ({chunks} fragmentos, media {r['mean_chunk_chars']} caracteres)")
+                del text
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
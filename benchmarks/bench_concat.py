@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark de concatenación: motor nativo de tramas MP3 frente a ffmpeg.
+
+Genera fragmentos MP3 sintéticos (tramas de silencio con el formato de edge-tts, con
+etiqueta ID3 y cabecera Info como los archivos reales), los registra en el paquete de
+fragmentos de un ResumeManifest como lo hace la síntesis, y mide cuánto tarda
+`concatenate_chunks` en unirlos con cada motor.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audiolibro_creator import DEFAULT_VOICE, concatenate_chunks, find_ffmpeg
+from audiolibro_manifest import ResumeManifest
+from audiolibro_mp3 import build_info_frame, silent_frame
+
+EDGE_TTS_HEADER = 0xFFF364C4  # MPEG-2 capa III, 24 kHz, 48 kbps, mono
+ID3_TAG = b"ID3\x04\x00\x00\x00\x00\x00\x0a" + b"\x00" * 10
+
+def create_chunks(directory: str, count: int, frames_per_chunk: int) -> ResumeManifest:
+    """Registra `count` fragmentos sintéticos en el paquete de `directory`; devuelve su manifiesto."""
+    frame = silent_frame(EDGE_TTS_HEADER)
+    info = build_info_frame(EDGE_TTS_HEADER, frames_per_chunk, (frames_per_chunk + 1) * len(frame), False)
+    body = ID3_TAG + info + frame * frames_per_chunk
+    manifest = ResumeManifest(directory)
+    for i in range(count):
+        with open(os.path.join(directory, f"chunk_{i:04d}.mp3"), "wb") as f:
+            f.write(body)
+        # Cada fragmento con un texto distinto, para que el paquete guarde una copia de cada uno.
+        manifest.record(i, f"Fragmento {i}.", DEFAULT_VOICE, "+0%")
+    manifest.save()
+    return manifest
+
+def run_engine(engine: str, manifest: ResumeManifest, count: int, output: str) -> float:
+    start = time.perf_counter()
+    asyncio.run(concatenate_chunks(output, manifest, count, engine))
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara el motor nativo de concatenación con ffmpeg.")
+    parser.add_argument("--chunks", type=int, default=2000, help="Número de fragmentos (default: 2000).")
+    parser.add_argument("--frames", type=int, default=1250, help="Tramas por fragmento; 1250 ≈ 30 s de audio (default: 1250).")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones por motor; se toma la mejor (default: 3).")
+    parser.add_argument("--json", dest="json_path", help="Guarda los resultados en este archivo JSON.")
+    args = parser.parse_args()
+
+    engines = ["native"]
+    if find_ffmpeg():
+        engines.append("ffmpeg")
+
+    results = []
+    work_dir = tempfile.mkdtemp(prefix="bench_concat_")
+    try:
+        manifest = create_chunks(work_dir, args.chunks, args.frames)
+        input_bytes = manifest.store.size
+        output = os.path.join(work_dir, "output.mp3")
+        for name in engines:
+            best = min(run_engine(name, manifest, args.chunks, output) for _ in range(args.repeat))
+            results.append({
+                "engine": name,
+                "chunks": args.chunks,
+                "input_bytes": input_bytes,
+                "output_bytes": os.path.getsize(output),
+                "seconds": round(best, 4),
+                "mb_per_second": round(input_bytes / best / 1e6, 1),
+            })
+        manifest.close()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    for r in results:
+        print(f"{r['engine']:>7}: {r['seconds']:.3f} s  {r['mb_per_second']:.1f} MB/s  ({r['chunks']} fragmentos, {r['input_bytes'] / 1e6:.1f} MB)")
+    if "ffmpeg" not in engines:
+        print("ffmpeg no encontrado: solo se ha medido el motor nativo.")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
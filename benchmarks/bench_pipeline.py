@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Benchmark extremo a extremo de `process_audiobook_creation` con el motor offline.
+
+Convierte un corpus sintético (ver corpus.py) con el motor `offline`, que simula el servicio con
+latencia, variación, fallos y límite de peticiones simultáneas configurables, para uno o varios
+niveles de concurrencia. No necesita red ni servidor, así que mide el coste del propio proceso
+(planificación, conjunto de síntesis, reintentos, paquete de fragmentos y concatenación) frente
+a una latencia conocida. Para probar la ruta websocket real de edge-tts, ver load_test.py.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audiolibro_backends import OfflineBackend
+from audiolibro_creator import CHUNK_MAX_SIZE, DEFAULT_VOICE, process_audiobook_creation
+from audiolibro_metrics import MetricsRecorder
+from corpus import DISTRIBUTIONS, write_corpus
+
+BYTES_PER_SECOND = 6000  # Audio de edge-tts (y del motor offline): 48 kbps
+
+def percentile(values: list, fraction: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+async def run_level(text_file: str, concurrency: int, args) -> dict:
+    """Genera el audiolibro una vez con `concurrency` síntesis simultáneas y resume el resultado."""
+    work_dir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    metrics_path = os.path.join(work_dir, "metrics.jsonl")
+    metrics = MetricsRecorder(metrics_path)
+    output_file = os.path.join(work_dir, "output.mp3")
+    error = None
+    backend = OfflineBackend(latency=args.latency, latency_per_char=args.latency_per_char, jitter=args.jitter,
+                             failure_rate=args.failure_rate, capacity=args.capacity, seed=args.seed)
+    await backend.open(concurrency)
+    start = time.perf_counter()
+    try:
+        await process_audiobook_creation(
+            text_file, output_file, DEFAULT_VOICE, args.retries, "+0%", args.strategy,
+            status_callback=lambda message: None, concurrency=concurrency, streaming=args.streaming,
+            incremental=args.incremental, temp_dir=os.path.join(work_dir, "chunks"), metrics=metrics,
+            backend=backend, chunk_size=args.chunk_size, dedup=not args.no_dedup,
+        )
+    except SystemExit:
+        error = "algún fragmento agotó sus reintentos"
+    finally:
+        await backend.close()
+        metrics.close()
+    wall = time.perf_counter() - start
+
+    try:
+        with open(metrics_path, encoding="utf-8") as f:
+            records = [json.loads(line) for line in f]
+        audio_bytes = os.path.getsize(output_file) if error is None else 0
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    chunks = [r for r in records if r["type"] == "chunk"]
+    run = next((r for r in records if r["type"] == "run"), {})
+    latencies = [r["latency_s"] for r in chunks if r["latency_s"] is not None]
+    chars = sum(r["chars"] for r in chunks)
+    return {
+        "concurrency": concurrency,
+        "status": error or "ok",
+        "wall_s": round(wall, 3),
+        "chunks": len(chunks),
+        "chars": chars,
+        "chars_per_s": round(chars / wall, 1),
+        "audio_s": round(audio_bytes / BYTES_PER_SECOND, 1),
+        "realtime_factor": round(audio_bytes / BYTES_PER_SECOND / wall, 1),
+        "requests": backend.requests,
+        "failures": backend.failures,
+        "latency_p50_s": percentile(latencies, 0.5),
+        "latency_p95_s": percentile(latencies, 0.95),
+        "latency_mean_s": round(statistics.fmean(latencies), 4) if latencies else None,
+        "phases_s": run.get("phases_s"),
+    }
+
+async def run(args) -> list[dict]:
+    text_dir = tempfile.mkdtemp(prefix="bench_pipeline_text_")
+    try:
+        text_file = args.text
+        if text_file is None:
+            text_file = os.path.join(text_dir, "texto.txt")
+            write_corpus(text_file, args.chars, args.distribution, args.seed)
+        results = []
+        for level in args.concurrency:
+            for _ in range(args.repeat):
+                results.append(await run_level(text_file, level, args))
+        return results
+    finally:
+        shutil.rmtree(text_dir, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Mide la creación de un audiolibro completo con el motor offline.")
+    parser.add_argument("--text", help="Archivo de texto a convertir (default: corpus generado).")
+    parser.add_argument("--chars", type=int, default=200_000, help="Tamaño del corpus generado (default: 200000).")
+    parser.add_argument("--distribution", choices=list(DISTRIBUTIONS), default="novela",
+                        help="Longitud de párrafo del corpus generado (default: novela).")
+    parser.add_argument("--concurrency", type=lambda v: [int(x) for x in v.split(",")], default=[1, 4, 8, 16],
+                        help="Niveles de concurrencia separados por comas (default: 1,4,8,16).")
+    parser.add_argument("--latency", type=float, default=0.2, help="Segundos fijos por petición (default: 0.2).")
+    parser.add_argument("--latency-per-char", type=float, default=0.0001, help="Segundos por carácter de cada petición (default: 0.0001).")
+    parser.add_argument("--jitter", type=float, default=0.3, help="Variación relativa log-normal de la latencia (default: 0.3).")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Probabilidad de que una petición falle (default: 0).")
+    parser.add_argument("--capacity", type=int, default=0, help="Peticiones simultáneas que admite el servicio simulado; 0 sin límite (default: 0).")
+    parser.add_argument("--retries", type=int, default=5, help="Reintentos por fragmento (default: 5).")
+    parser.add_argument("--strategy", choices=["smart", "legacy"], default="smart", help="Estrategia de fragmentación (default: smart).")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_MAX_SIZE, help=f"Caracteres máximos por fragmento (default: {CHUNK_MAX_SIZE}).")
+    parser.add_argument("--streaming", action="store_true", help="Lee y fragmenta el texto sobre la marcha.")
+    parser.add_argument("--incremental", action="store_true", help="Ensambla la salida a medida que se sintetiza.")
+    parser.add_argument("--no-dedup", action="store_true", help="Sintetiza también los fragmentos repetidos.")
+    parser.add_argument("--repeat", type=int, default=1, help="Ejecuciones por nivel de concurrencia (default: 1).")
+    parser.add_argument("--seed", type=int, default=0, help="Semilla del corpus y del motor simulado (default: 0).")
+    parser.add_argument("--json", dest="json_path", help="Guarda los resultados en este archivo JSON.")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    for r in results:
+        p50 = f"{r['latency_p50_s']:.3f}" if r["latency_p50_s"] is not None else "-"
+        print(f"concurrencia {r['concurrency']:>3}: {r['status']}, {r['wall_s']:.2f} s, {r['chars_per_s']:.0f} car/s, "
+              f"x{r['realtime_factor']} tiempo real, p50 {p50} s, {r['requests']} peticiones, {r['failures']} fallidas")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
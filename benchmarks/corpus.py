@@ -0,0 +1,53 @@
+"""
+Corpus sintéticos y reproducibles para los benchmarks.
+
+Cada distribución fija cuántas frases tiene un párrafo, y con ello la longitud de los párrafos,
+que es lo que decide el camino de la fragmentación: agrupar muchos párrafos cortos, agrupar
+unos pocos, o partir un párrafo largo por frases. Con la misma semilla se obtiene siempre el
+mismo texto, así que los resultados de dos commits son comparables.
+"""
+
+import random
+
+WORDS = ("el", "camino", "hacia", "la", "casa", "era", "largo", "y", "silencioso", "pero", "nadie",
+         "parecía", "notarlo", "mientras", "caía", "la", "tarde", "sobre", "el", "pueblo")
+SENTENCE_POOL = 4096  # Frases distintas de las que se componen los párrafos
+# Frases por párrafo (mínimo, máximo) de cada distribución, con la longitud aproximada del párrafo.
+DISTRIBUTIONS = {
+    "dialogo": (1, 2),  # 60-200 caracteres: muchos párrafos que se agrupan
+    "novela": (3, 8),  # 250-800 caracteres: el caso típico
+    "ensayo": (20, 60),  # 1500-5000 caracteres: párrafos que a menudo superan el tamaño de fragmento
+    "sin-parrafos": (1500, 2500),  # ~150 KB por párrafo: casi todo se parte por frases
+}
+
+def _sentences(rng: random.Random) -> list[str]:
+    sentences = []
+    for _ in range(SENTENCE_POOL):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(6, 20))]
+        sentences.append(" ".join(words).capitalize() + rng.choice(".!?."))
+    return sentences
+
+def iter_paragraphs(chars: int, distribution: str = "novela", seed: int = 0):
+    """Párrafos de la distribución indicada hasta sumar unos `chars` caracteres (con separadores)."""
+    low, high = DISTRIBUTIONS[distribution]
+    rng = random.Random(seed)
+    sentences = _sentences(rng)
+    total = 0
+    while total < chars:
+        paragraph = " ".join(rng.choices(sentences, k=rng.randint(low, high)))
+        total += len(paragraph) + 2
+        yield paragraph
+
+def generate_text(chars: int, distribution: str = "novela", seed: int = 0) -> str:
+    """Texto de unos `chars` caracteres con párrafos separados por una línea en blanco."""
+    return "\n\n".join(iter_paragraphs(chars, distribution, seed))
+
+def write_corpus(path: str, chars: int, distribution: str = "novela", seed: int = 0) -> int:
+    """Escribe el mismo texto que generate_text sin tenerlo entero en memoria; devuelve los bytes escritos."""
+    written = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for i, paragraph in enumerate(iter_paragraphs(chars, distribution, seed)):
+            block = paragraph if i == 0 else "\n\n" + paragraph
+            f.write(block)
+            written += len(block.encode("utf-8"))
+    return written
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Servidor local que imita el protocolo websocket del servicio de edge-tts.
+
+Responde a `edge_tts.Communicate` igual que el servicio real en lo que este usa: mensajes
+turn.start, metadatos de límites de palabra o de frase, audio MP3 binario (tramas de silencio
+con la duración del texto, del motor `offline`) y turn.end, aceptando varios turnos por conexión.
+Permite simular la latencia (con varias distribuciones), respuestas de límite de uso (HTTP 429
+en el handshake) y conexiones cortadas, para medir el coste real de cada conexión sin depender
+del servicio de Microsoft.
+
+Uso independiente: `python benchmarks/edge_tts_server.py --port 8765 --latency 0.3`.
+Para apuntar edge-tts al servidor dentro de un proceso, `redirect_edge_tts(server)`.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import time
+import uuid
+from html import unescape
+
+from aiohttp import WSMsgType, web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audiolibro_backends import OfflineBackend
+
+WS_PATH = "/consumer/speech/synthesize/readaloud/edge/v1"
+VOICES_PATH = "/consumer/speech/synthesize/readaloud/voices/list"
+AUDIO_MESSAGE_SIZE = 4096  # Bytes de audio por mensaje binario
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "lognormal", "exponential")
+
+PROSODY_RE = re.compile(r"<prosody pitch='[^']*' rate='([^']*)' volume='[^']*'>(.*)</prosody>", re.DOTALL)
+SENTENCE_RE = re.compile(r"[^.!?]+[.!?]*")
+
+def _parse_text_message(data: str) -> tuple:
+    """Separa las cabeceras (diccionario) y el cuerpo de un mensaje de texto del protocolo."""
+    head, _, body = data.partition("\r\n\r\n")
+    headers = {}
+    for line in head.split("\r\n"):
+        key, _, value = line.partition(":")
+        headers[key] = value
+    return headers, body
+
+def _text_message(request_id: str, path: str, body: str) -> str:
+    return (
+        f"X-RequestId:{request_id}\r\n"
+        "Content-Type:application/json; charset=utf-8\r\n"
+        f"Path:{path}\r\n\r\n"
+        f"{body}"
+    )
+
+def _audio_message(request_id: str, stream_id: str, data: bytes) -> bytes:
+    """Mensaje binario de audio: longitud de la cabecera en 2 bytes, cabecera y datos."""
+    content_type = "Content-Type:audio/mpeg\r\n" if data else ""  # El mensaje final va sin tipo ni datos
+    header = f"X-RequestId:{request_id}\r\n{content_type}X-StreamId:{stream_id}\r\nPath:audio\r\n".encode()
+    return len(header).to_bytes(2, "big") + header + data
+
+class EdgeTTSStandIn:
+    """Servidor websocket compatible con edge-tts, con latencia, límite de uso y cortes configurables.
+
+    - `latency` (s), `latency_dist` y `jitter`: tiempo hasta el primer byte de audio; `jitter` es
+      la dispersión relativa de las distribuciones uniforme y log-normal.
+    - `latency_per_char`: latencia adicional por carácter del texto.
+    - `capacity`: conexiones simultáneas admitidas; las demás reciben HTTP 429 (0 = sin límite).
+    - `throttle_rate`: probabilidad de responder 429 aunque haya capacidad.
+    - `drop_rate`: probabilidad de cortar la conexión tras recibir el SSML; con
+      `drop_mid_stream` el corte llega después de enviar la mitad del audio.
+    - `realtime_factor`: si es mayor que 0, el audio se envía a ese múltiplo del tiempo real.
+    - `handshake_latency` (s): retardo al aceptar cada conexión, el coste de TCP y TLS en una red real.
+    """
+
+    def __init__(self, latency: float = 0.05, latency_dist: str = "lognormal", jitter: float = 0.3,
+                 latency_per_char: float = 0.0, capacity: int = 0, throttle_rate: float = 0.0,
+                 drop_rate: float = 0.0, drop_mid_stream: bool = False, realtime_factor: float = 0.0,
+                 chars_per_second: float = 15.0, handshake_latency: float = 0.0, seed: int = None):
+        if latency_dist not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Distribución de latencia desconocida: '{latency_dist}'")
+        self.latency = latency
+        self.latency_dist = latency_dist
+        self.jitter = jitter
+        self.latency_per_char = latency_per_char
+        self.capacity = capacity
+        self.throttle_rate = throttle_rate
+        self.drop_rate = drop_rate
+        self.drop_mid_stream = drop_mid_stream
+        self.realtime_factor = realtime_factor
+        self.handshake_latency = handshake_latency  # Simula los viajes de TCP, TLS y handshake de una red real
+        self.audio = OfflineBackend(chars_per_second=chars_per_second)
+        self.host = None
+        self.port = None
+        self.active = 0
+        self.stats = {
+            "connections": 0, "turns": 0, "throttled": 0, "dropped": 0, "audio_bytes": 0,
+            "peak_active": 0, "setup_s": 0.0, "service_s": 0.0,
+        }
+        self._random = random.Random(seed)
+        self._runner = None
+
+    @property
+    def ws_url(self) -> str:
+        return f"ws://{self.host}:{self.port}{WS_PATH}"
+
+    @property
+    def voices_url(self) -> str:
+        return f"http://{self.host}:{self.port}{VOICES_PATH}"
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0):
+        """Empieza a escuchar; con `port` 0 se elige un puerto libre."""
+        app = web.Application()
+        app.router.add_get(WS_PATH, self._handle_websocket)
+        app.router.add_get(VOICES_PATH, self._handle_voices)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        self.host = host
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def _sample_latency(self, chars: int) -> float:
+        base = self.latency
+        if self.latency_dist == "uniform":
+            base *= self._random.uniform(max(0.0, 1 - self.jitter), 1 + self.jitter)
+        elif self.latency_dist == "lognormal":
+            base *= self._random.lognormvariate(0, self.jitter)
+        elif self.latency_dist == "exponential":
+            base = self._random.expovariate(1 / base) if base > 0 else 0.0
+        return base + self.latency_per_char * chars
+
+    async def _handle_voices(self, request):
+        voices = [
+            dict(voice, Name=f"Microsoft Server Speech Text to Speech Voice ({voice['Locale']}, {voice['ShortName']})",
+                 FriendlyName=voice["ShortName"], Status="GA", SuggestedCodec="audio-24khz-48kbitrate-mono-mp3",
+                 VoiceTag={"ContentCategories": ["General"], "VoicePersonalities": ["Friendly"]})
+            for voice in OfflineBackend.VOICES
+        ]
+        return web.json_response(voices)
+
+    async def _handle_websocket(self, request):
+        if (self.capacity and self.active >= self.capacity) or self._random.random() < self.throttle_rate:
+            self.stats["throttled"] += 1
+            return web.Response(status=429, text="Too Many Requests")
+
+        self.active += 1
+        self.stats["connections"] += 1
+        self.stats["peak_active"] = max(self.stats["peak_active"], self.active)
+        connected = time.monotonic()
+        ws = web.WebSocketResponse()
+        try:
+            if self.handshake_latency > 0:
+                await asyncio.sleep(self.handshake_latency)
+            await ws.prepare(request)
+            word_boundary = False
+            async for message in ws:
+                if message.type != WSMsgType.TEXT:
+                    continue
+                headers, body = _parse_text_message(message.data)
+                path = headers.get("Path")
+                if path == "speech.config":
+                    options = json.loads(body)["context"]["synthesis"]["audio"]["metadataoptions"]
+                    word_boundary = options.get("wordBoundaryEnabled") == "true"
+                elif path == "ssml":
+                    if connected is not None:
+                        # Handshake y configuración: lo que se paga una vez por conexión.
+                        self.stats["setup_s"] += time.monotonic() - connected
+                        connected = None
+                    if not await self._respond(ws, headers.get("X-RequestId", ""), body, word_boundary):
+                        break
+        finally:
+            self.active -= 1
+            await ws.close()
+        return ws
+
+    async def _respond(self, ws, request_id: str, ssml: str, word_boundary: bool) -> bool:
+        """Responde a un turno SSML. Devuelve False si la conexión se ha cortado a propósito."""
+        started = time.monotonic()
+        self.stats["turns"] += 1
+        match = PROSODY_RE.search(ssml)
+        rate = match.group(1) if match else "+0%"
+        text = unescape(match.group(2)) if match else ""
+        stream_id = uuid.uuid4().hex.upper()
+
+        await ws.send_str(_text_message(request_id, "turn.start", '{"context":{"serviceTag":"standin"}}'))
+        await asyncio.sleep(self._sample_latency(len(text)))
+
+        audio = self.audio.render(text, rate) if text.strip() else b""
+        drop = self._random.random() < self.drop_rate
+        if drop and not self.drop_mid_stream:
+            self.stats["dropped"] += 1
+            await ws.close()
+            return False
+
+        if word_boundary:
+            boundaries = [("WordBoundary", offset, duration, word)
+                          for offset, duration, word in self.audio.word_boundaries(text, rate)]
+        else:
+            boundaries = []
+            offset = 0.0
+            for sentence in SENTENCE_RE.findall(text):
+                if sentence.strip():
+                    duration = self.audio.duration(sentence, rate)
+                    boundaries.append(("SentenceBoundary", offset, duration, sentence.strip()))
+                    offset += duration
+        for kind, offset, duration, word in boundaries:
+            metadata = {"Metadata": [{"Type": kind, "Data": {
+                "Offset": int(offset * 1e7), "Duration": int(duration * 1e7),
+                "text": {"Text": word, "Length": len(word), "BoundaryType": kind},
+            }}]}
+            await ws.send_str(_text_message(request_id, "audio.metadata", json.dumps(metadata)))
+
+        limit = len(audio) // 2 if drop else len(audio)
+        bytes_per_second = 6000  # 48 kbps
+        for start in range(0, limit, AUDIO_MESSAGE_SIZE):
+            piece = audio[start:min(start + AUDIO_MESSAGE_SIZE, limit)]
+            await ws.send_bytes(_audio_message(request_id, stream_id, piece))
+            self.stats["audio_bytes"] += len(piece)
+            if self.realtime_factor > 0:
+                await asyncio.sleep(len(piece) / bytes_per_second / self.realtime_factor)
+        if drop:
+            self.stats["dropped"] += 1
+            await ws.close()
+            return False
+
+        await ws.send_bytes(_audio_message(request_id, stream_id, b""))
+        await ws.send_str(_text_message(request_id, "turn.end", '{"webrtc":{"connectionId":"standin"}}'))
+        self.stats["service_s"] += time.monotonic() - started
+        return True
+
+def redirect_edge_tts(server: EdgeTTSStandIn):
+    """Hace que edge-tts use el servidor local en este proceso. Devuelve una función que lo revierte."""
+    import edge_tts.communicate
+    import edge_tts.voices
+    from edge_tts.constants import TRUSTED_CLIENT_TOKEN
+
+    previous = (edge_tts.communicate.WSS_URL, edge_tts.voices.VOICE_LIST)
+    edge_tts.communicate.WSS_URL = f"{server.ws_url}?TrustedClientToken={TRUSTED_CLIENT_TOKEN}"
+    edge_tts.voices.VOICE_LIST = f"{server.voices_url}?trustedclienttoken={TRUSTED_CLIENT_TOKEN}"
+
+    def restore():
+        edge_tts.communicate.WSS_URL, edge_tts.voices.VOICE_LIST = previous
+    return restore
+
+def add_server_arguments(parser: argparse.ArgumentParser):
+    """Opciones de simulación, compartidas con el generador de carga."""
+    parser.add_argument("--latency", type=float, default=0.3, help="Latencia media hasta el primer audio, en segundos (default: 0.3).")
+    parser.add_argument("--latency-dist", choices=LATENCY_DISTRIBUTIONS, default="lognormal", help="Distribución de la latencia (default: lognormal).")
+    parser.add_argument("--jitter", type=float, default=0.3, help="Dispersión relativa de la latencia (default: 0.3).")
+    parser.add_argument("--latency-per-char", type=float, default=0.0, help="Latencia adicional por carácter, en segundos (default: 0).")
+    parser.add_argument("--capacity", type=int, default=0, help="Conexiones simultáneas admitidas antes de responder 429 (default: sin límite).")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Probabilidad de responder 429 a una conexión (default: 0).")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Probabilidad de cortar la conexión durante un turno (default: 0).")
+    parser.add_argument("--drop-mid-stream", action="store_true", help="Cortar a mitad del audio en lugar de antes de enviarlo.")
+    parser.add_argument("--realtime-factor", type=float, default=0.0, help="Enviar el audio a este múltiplo del tiempo real (default: sin pausa).")
+    parser.add_argument("--handshake-latency", type=float, default=0.0, help="Retardo al abrir cada conexión, en segundos (default: 0).")
+    parser.add_argument("--seed", type=int, help="Semilla para que la simulación sea reproducible.")
+
+def server_from_args(args) -> EdgeTTSStandIn:
+    return EdgeTTSStandIn(
+        latency=args.latency, latency_dist=args.latency_dist, jitter=args.jitter,
+        latency_per_char=args.latency_per_char, capacity=args.capacity, throttle_rate=args.throttle_rate,
+        drop_rate=args.drop_rate, drop_mid_stream=args.drop_mid_stream,
+        realtime_factor=args.realtime_factor, handshake_latency=args.handshake_latency, seed=args.seed,
+    )
+
+async def serve(args):
+    server = server_from_args(args)
+    await server.start(args.host, args.port)
+    print(f"Servidor edge-tts local escuchando en {server.ws_url}")
+    print(f"Lista de voces en {server.voices_url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+        print(json.dumps(server.stats, indent=2))
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local que imita el protocolo websocket de edge-tts.")
+    parser.add_argument("--host", default="127.0.0.1", help="Dirección de escucha (default: 127.0.0.1).")
+    parser.add_argument("--port", type=int, default=8765, help="Puerto de escucha (default: 8765).")
+    add_server_arguments(parser)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga extremo a extremo contra el servidor local de edge-tts.
+
+Ejecuta `process_audiobook_creation` con el motor edge-tts real (la misma ruta websocket que en
+producción) apuntando a `edge_tts_server.EdgeTTSStandIn`, para uno o varios niveles de
+concurrencia, y muestra el rendimiento: caracteres por segundo, factor sobre tiempo real,
+latencia por petición y el coste de conexión que paga cada fragmento (latencia vista por el
+cliente menos el tiempo de servicio del servidor).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audiolibro_backends import EdgeTTSBackend
+from audiolibro_creator import DEFAULT_VOICE, process_audiobook_creation
+from audiolibro_metrics import MetricsRecorder
+from edge_tts_server import add_server_arguments, redirect_edge_tts, server_from_args
+
+BYTES_PER_SECOND = 6000  # Audio de edge-tts: 48 kbps
+WORDS = ("el", "camino", "hacia", "la", "casa", "era", "largo", "y", "silencioso", "pero", "nadie",
+         "parecía", "notarlo", "mientras", "caía", "la", "tarde", "sobre", "el", "pueblo")
+
+def generate_text(chars: int, seed: int = 0) -> str:
+    """Texto de relleno en párrafos de varias frases, de unos `chars` caracteres."""
+    rng = random.Random(seed)
+    paragraphs = []
+    total = 0
+    while total < chars:
+        sentences = []
+        for _ in range(rng.randint(3, 8)):
+            words = [rng.choice(WORDS) for _ in range(rng.randint(6, 20))]
+            sentences.append(" ".join(words).capitalize() + rng.choice(".!?."))
+        paragraph = " ".join(sentences)
+        paragraphs.append(paragraph)
+        total += len(paragraph) + 2
+    return "\n\n".join(paragraphs)
+
+def percentile(values: list, fraction: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+async def run_level(text_file: str, concurrency: int, pooled: bool, args, server) -> dict:
+    """Genera el audiolibro una vez con `concurrency` síntesis simultáneas y resume el resultado.
+
+    Con `pooled` los fragmentos reutilizan conexiones; sin él, cada uno abre la suya.
+    """
+    work_dir = tempfile.mkdtemp(prefix="load_test_")
+    before = dict(server.stats)
+    metrics_path = os.path.join(work_dir, "metrics.jsonl")
+    metrics = MetricsRecorder(metrics_path)
+    output_file = os.path.join(work_dir, "output.mp3")
+    error = None
+    backend = EdgeTTSBackend(pooled=pooled)
+    await backend.open(concurrency)
+    start = time.perf_counter()
+    try:
+        await process_audiobook_creation(
+            text_file, output_file, args.voice, args.retries, args.rate, args.strategy,
+            status_callback=lambda message: None, concurrency=concurrency,
+            temp_dir=os.path.join(work_dir, "chunks"), metrics=metrics, backend=backend,
+        )
+    except SystemExit:
+        error = "algún fragmento agotó sus reintentos"
+    finally:
+        await backend.close()
+        metrics.close()
+    wall = time.perf_counter() - start
+
+    try:
+        with open(metrics_path, encoding="utf-8") as f:
+            records = [json.loads(line) for line in f]
+        chunks = [r for r in records if r["type"] == "chunk"]
+        latencies = [r["latency_s"] for r in chunks if r["latency_s"] is not None]
+        audio_bytes = os.path.getsize(output_file) if error is None else 0
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    turns = server.stats["turns"] - before["turns"]
+    service = (server.stats["service_s"] - before["service_s"]) / turns if turns else None
+    chars = sum(r["chars"] for r in chunks)
+    mean_latency = statistics.fmean(latencies) if latencies else None
+    return {
+        "concurrency": concurrency,
+        "pooled": pooled,
+        "status": error or "ok",
+        "wall_s": round(wall, 3),
+        "chunks": len(chunks),
+        "chars": chars,
+        "chars_per_s": round(chars / wall, 1),
+        "audio_s": round(audio_bytes / BYTES_PER_SECOND, 1),
+        "realtime_factor": round(audio_bytes / BYTES_PER_SECOND / wall, 1),
+        "attempts": sum(r["attempts"] for r in chunks),
+        "latency_p50_s": percentile(latencies, 0.5),
+        "latency_p95_s": percentile(latencies, 0.95),
+        "server_service_s": round(service, 4) if service is not None else None,
+        # Lo que el cliente espera de más sobre el trabajo del servidor: TCP, handshake, configuración y cierre.
+        "connection_overhead_s": round(mean_latency - service, 4) if mean_latency is not None and service is not None else None,
+        "connections": server.stats["connections"] - before["connections"],
+        "throttled": server.stats["throttled"] - before["throttled"],
+        "dropped": server.stats["dropped"] - before["dropped"],
+    }
+
+async def run(args) -> list[dict]:
+    server = server_from_args(args)
+    await server.start()
+    restore = redirect_edge_tts(server)
+    text_dir = tempfile.mkdtemp(prefix="load_test_text_")
+    try:
+        text_file = args.text
+        if text_file is None:
+            text_file = os.path.join(text_dir, "texto.txt")
+            with open(text_file, "w", encoding="utf-8") as f:
+                f.write(generate_text(args.chars, args.seed or 0))
+        modes = {"on": [True], "off": [False], "both": [False, True]}[args.pooling]
+        return [await run_level(text_file, level, pooled, args, server) for level in args.concurrency for pooled in modes]
+    finally:
+        restore()
+        await server.stop()
+        shutil.rmtree(text_dir, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de la síntesis contra un servidor edge-tts local.")
+    parser.add_argument("--text", help="Archivo de texto a convertir (default: texto generado).")
+    parser.add_argument("--chars", type=int, default=100_000, help="Tamaño del texto generado (default: 100000).")
+    parser.add_argument("--concurrency", type=lambda v: [int(x) for x in v.split(",")], default=[1, 4, 8],
+                        help="Niveles de concurrencia separados por comas (default: 1,4,8).")
+    parser.add_argument("--retries", type=int, default=5, help="Reintentos por fragmento (default: 5).")
+    parser.add_argument("--strategy", choices=["smart", "legacy"], default="smart", help="Estrategia de fragmentación (default: smart).")
+    parser.add_argument("--voice", default=DEFAULT_VOICE, help=f"Voz (default: {DEFAULT_VOICE}).")
+    parser.add_argument("--rate", default="+0%", help="Velocidad (default: +0%%).")
+    parser.add_argument("--pooling", choices=["on", "off", "both"], default="both",
+                        help="Reutilizar conexiones entre fragmentos, abrir una por fragmento o comparar ambos (default: both).")
+    parser.add_argument("--json", dest="json_path", help="Guarda los resultados en este archivo JSON.")
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    for r in results:
+        p50 = f"{r['latency_p50_s']:.3f}" if r["latency_p50_s"] is not None else "-"
+        overhead = f"{r['connection_overhead_s'] * 1000:.1f} ms" if r["connection_overhead_s"] is not None else "-"
+        mode = "reutilizadas" if r["pooled"] else "una por fragmento"
+        print(f"concurrencia {r['concurrency']:>3} ({mode}): {r['status']}, {r['wall_s']:.2f} s, {r['chars_per_s']:.0f} car/s, "
+              f"x{r['realtime_factor']} tiempo real, p50 {p50} s, coste de conexión {overhead}, {r['connections']} conexiones, "
+              f"{r['attempts']} peticiones, {r['throttled']} rechazadas (429), {r['dropped']} cortadas")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
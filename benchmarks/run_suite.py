@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Ejecuta todos los benchmarks y guarda sus resultados en un único JSON comparable entre commits.
+
+Lanza cada benchmark (fragmentación, creación extremo a extremo con el motor offline,
+concatenación y arranque) en su propio proceso con un perfil de parámetros fijo, y reúne sus
+JSON junto con el commit, la versión de Python y la plataforma. Con `--compare` contrasta la
+métrica principal de cada caso con un resultado anterior y sale con código 1 si alguno empeora
+más que `--threshold`. Los casos se emparejan por sus parámetros (estrategia, distribución,
+tamaño, concurrencia...), así que solo se comparan ejecuciones con el mismo perfil.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+SUITE_VERSION = 1
+
+# Argumentos de cada benchmark por perfil. "quick" tarda un par de minutos; "full" llega al
+# corpus de 1 GB (necesita unos 4 GB de memoria) y a miles de fragmentos más largos.
+PROFILES = {
+    "quick": {
+        "chunking": ["--sizes", "100K,1M,10M", "--repeat", "3"],
+        "pipeline": ["--chars", "100000", "--concurrency", "1,4,16", "--latency", "0.1"],
+        "concat": ["--chunks", "2000", "--frames", "250"],
+        "startup": ["--repeat", "5"],
+    },
+    "full": {
+        "chunking": ["--sizes", "100K,1M,10M,100M,1G", "--repeat", "3"],
+        "pipeline": ["--chars", "1000000", "--concurrency", "1,4,8,16,32"],
+        "concat": ["--chunks", "5000", "--frames", "1250"],
+        "startup": ["--repeat", "7"],
+    },
+}
+SCRIPTS = {
+    "chunking": "bench_chunking.py",
+    "pipeline": "bench_pipeline.py",
+    "concat": "bench_concat.py",
+    "startup": "startup_time.py",
+}
+# Campos que identifican cada caso, métrica principal y si es mejor que sea mayor.
+METRICS = {
+    "chunking": (("strategy", "distribution", "chunk_size", "chars"), "mb_per_second", True),
+    "pipeline": (("concurrency",), "chars_per_s", True),
+    "concat": (("engine", "chunks", "input_bytes"), "mb_per_second", True),
+    "startup": (("scenario",), "import_ms", False),
+}
+
+def git_revision() -> dict:
+    """Commit actual y si hay cambios sin confirmar (None fuera de un repositorio git)."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+    return {"commit": commit, "dirty": bool(status.strip())}
+
+def run_benchmark(name: str, arguments: list[str], work_dir: str) -> dict:
+    """Ejecuta un benchmark; devuelve sus resultados, su duración y, si falló, el error."""
+    json_path = os.path.join(work_dir, f"{name}.json")
+    command = [sys.executable, os.path.join(BENCH_DIR, SCRIPTS[name])] + arguments + ["--json", json_path]
+    print(f"--- {name}: {' '.join(command[1:])}", flush=True)
+    start = time.perf_counter()
+    result = subprocess.run(command, cwd=work_dir)
+    entry = {"arguments": arguments, "seconds": round(time.perf_counter() - start, 1), "error": None, "results": []}
+    if result.returncode != 0:
+        entry["error"] = f"terminó con código {result.returncode}"
+    try:
+        with open(json_path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        entry["error"] = entry["error"] or "no escribió resultados"
+        return entry
+    # startup_time.py guarda también el arranque del intérprete junto a la lista de resultados.
+    if isinstance(data, dict):
+        entry["baseline_ms"] = data.get("baseline_ms")
+        data = data["results"]
+    entry["results"] = data
+    return entry
+
+def _best_by_case(name: str, rows: list[dict]) -> dict:
+    """{caso: mejor valor de la métrica principal}; con varias repeticiones de un caso se toma la mejor."""
+    fields, metric, higher = METRICS[name]
+    best = {}
+    for row in rows:
+        value = row.get(metric)
+        if value is None or row.get("status", "ok") != "ok":
+            continue
+        case = tuple(row.get(field) for field in fields)
+        if case not in best or (value > best[case] if higher else value < best[case]):
+            best[case] = value
+    return best
+
+def compare(base: dict, current: dict, threshold: float) -> list[dict]:
+    """Cambio relativo de la métrica principal de cada caso presente en ambos resultados."""
+    changes = []
+    for name, (fields, metric, higher) in METRICS.items():
+        before = _best_by_case(name, base.get("benchmarks", {}).get(name, {}).get("results", []))
+        after = _best_by_case(name, current.get("benchmarks", {}).get(name, {}).get("results", []))
+        for case in sorted(set(before) & set(after)):
+            if not before[case]:
+                continue
+            change = after[case] / before[case] - 1
+            worse = -change if higher else change
+            changes.append({
+                "benchmark": name,
+                "case": dict(zip(fields, case)),
+                "metric": metric,
+                "before": before[case],
+                "after": after[case],
+                "change": round(change, 4),
+                "regression": worse > threshold,
+            })
+    return changes
+
+def print_comparison(changes: list[dict], threshold: float):
+    if not changes:
+        print("No hay casos comunes que comparar (¿perfiles distintos?).")
+        return
+    for c in changes:
+        case = ", ".join(f"{value}" for value in c["case"].values())
+        verdict = "  EMPEORA" if c["regression"] else ""
+        print(f"{c['benchmark']:>9} [{case}] {c['metric']}: {c['before']} -> {c['after']} ({c['change']:+.1%}){verdict}")
+    regressions = sum(c["regression"] for c in changes)
+    print(f"{regressions} de {len(changes)} casos empeoran más de un {threshold:.0%}.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Ejecuta todos los benchmarks y compara sus resultados entre commits.")
+    parser.add_argument("--profile", choices=list(PROFILES), default="quick", help="Parámetros de los benchmarks (default: quick).")
+    parser.add_argument("--only", action="append", choices=list(SCRIPTS), help="Benchmark a ejecutar, repetible (default: todos).")
+    parser.add_argument("--json", dest="json_path", help="Guarda los resultados de la suite en este archivo JSON.")
+    parser.add_argument("--results", help="No ejecuta nada: usa estos resultados guardados (para comparar dos archivos).")
+    parser.add_argument("--compare", metavar="BASE", help="Compara con los resultados de este archivo JSON de una ejecución anterior.")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Empeoramiento relativo a partir del cual un caso cuenta como regresión (default: 0.10).")
+    args = parser.parse_args()
+
+    if args.results:
+        with open(args.results, encoding="utf-8") as f:
+            suite = json.load(f)
+    else:
+        suite = {
+            "suite_version": SUITE_VERSION,
+            **git_revision(),
+            "profile": args.profile,
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "benchmarks": {},
+        }
+        work_dir = tempfile.mkdtemp(prefix="bench_suite_")
+        try:
+            for name, arguments in PROFILES[args.profile].items():
+                if args.only and name not in args.only:
+                    continue
+                suite["benchmarks"][name] = run_benchmark(name, arguments, work_dir)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        if args.json_path:
+            with open(args.json_path, "w", encoding="utf-8") as f:
+                json.dump(suite, f, indent=2)
+
+    failed = [name for name, entry in suite["benchmarks"].items() if entry["error"]]
+    for name in failed:
+        print(f"{name}: {suite['benchmarks'][name]['error']}")
+
+    regressions = False
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            base = json.load(f)
+        print(f"\nComparación con {base.get('commit') or args.compare} ({base.get('profile')}):")
+        changes = compare(base, suite, args.threshold)
+        print_comparison(changes, args.threshold)
+        regressions = any(c["regression"] for c in changes)
+    if failed or regressions:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Benchmark de arranque en frío de la CLI con presupuesto.
+
+Lanza varias veces, cada una en un proceso nuevo, `audiolibro_creator.py --help`,
+`--list-voices` y un trabajo mínimo de un fragmento con el motor offline. Con `-X importtime`
+mide el tiempo de importación de cada uno (sin contar `site`, que no depende del proyecto) y
+lo desglosa por módulo; muestra también cuánto añade al arranque del intérprete (tiempo total
+menos el de `python -c pass`), más ruidoso. Sale con código 1 si la mediana del tiempo de
+importación de algún escenario supera su presupuesto, para detectar regresiones (por ejemplo,
+una importación pesada que vuelve a hacerse al cargar el módulo).
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CREATOR = os.path.join(ROOT, "audiolibro_creator.py")
+MAIN = os.path.join(ROOT, "main.py")
+
+# Milisegundos de importación admitidos en cada escenario (mediana). Rich cuesta unos 40 ms y
+# asyncio unos 50: --help no debe cargar Rich, y main.py no debe cargar nada del proyecto.
+BUDGETS_MS = {
+    "main-help": 20,
+    "help": 110,
+    "list-voices": 180,
+    "tiny-job": 200,
+}
+TINY_TEXT = "Érase una vez un libro de una sola frase."
+
+def scenarios(work_dir: str) -> dict:
+    """Argumentos de cada escenario; todos escriben solo dentro de `work_dir`."""
+    text_file = os.path.join(work_dir, "tiny.txt")
+    with open(text_file, "w", encoding="utf-8") as f:
+        f.write(TINY_TEXT)
+    cache_dir = os.path.join(work_dir, "cache")
+    return {
+        "main-help": [MAIN, "--help"],
+        "help": [CREATOR, "--help"],
+        # El catálogo de voces queda guardado tras la primera ejecución (de calentamiento).
+        "list-voices": [CREATOR, "--list-voices", "--backend", "offline", "--cache-dir", cache_dir],
+        "tiny-job": [CREATOR, "-t", text_file, "-o", os.path.join(work_dir, "out", "tiny.mp3"), "-v", "es-ES-AlvaroNeural",
+                     "--backend", "offline", "--no-cache", "--cache-dir", cache_dir],
+    }
+
+def run_once(argv: list[str], work_dir: str, importtime: bool = False) -> tuple:
+    """Ejecuta `argv` con el intérprete actual; devuelve (segundos, stderr)."""
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + argv
+    start = time.perf_counter()
+    result = subprocess.run(command, cwd=work_dir, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(argv)} terminó con código {result.returncode}:\n{result.stderr[-2000:]}")
+    return elapsed, result.stderr
+
+def parse_importtime(stderr: str) -> dict:
+    """Tiempo acumulado (ms) de cada importación de primer nivel en la salida de -X importtime."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Las importaciones de primer nivel llevan un solo espacio antes del nombre.
+        if name.startswith(" ") and not name.startswith("  "):
+            modules[name.strip()] = modules.get(name.strip(), 0) + int(cumulative) / 1000
+    return modules
+
+def measure(name: str, argv: list[str], work_dir: str, repeat: int, baseline: float) -> dict:
+    run_once(argv, work_dir)  # Calentamiento: caché de disco, .pyc y catálogo de voces
+    walls = [run_once(argv, work_dir)[0] for _ in range(repeat)]
+    imports = [parse_importtime(run_once(argv, work_dir, importtime=True)[1]) for _ in range(repeat)]
+    # El módulo site (y los .pth instalados) no dependen del proyecto.
+    import_totals = [sum(ms for module, ms in run.items() if module not in ("site", "encodings")) for run in imports]
+    median_run = sorted(imports, key=lambda run: sum(run.values()))[len(imports) // 2]
+    top = sorted(((ms, module) for module, ms in median_run.items() if module not in ("site", "encodings")), reverse=True)[:5]
+    wall = statistics.median(walls)
+    return {
+        "scenario": name,
+        "wall_ms": round(wall * 1000, 1),
+        "startup_ms": round(max(0.0, wall - baseline) * 1000, 1),
+        "import_ms": round(statistics.median(import_totals), 1),
+        "top_imports": [{"module": module, "ms": round(ms, 1)} for ms, module in top],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Mide el arranque en frío de la CLI y lo compara con un presupuesto.")
+    parser.add_argument("--repeat", type=int, default=7, help="Ejecuciones medidas por escenario; se toma la mediana (default: 7).")
+    parser.add_argument("--scenario", action="append", choices=list(BUDGETS_MS), help="Escenario a medir, repetible (default: todos).")
+    parser.add_argument("--budget-scale", type=float, default=1.0,
+                        help="Multiplica los presupuestos, para máquinas más lentas o más rápidas que la de referencia (default: 1).")
+    parser.add_argument("--json", dest="json_path", help="Guarda los resultados en este archivo JSON.")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="startup_time_")
+    try:
+        run_once(["-c", "pass"], work_dir)
+        baseline = statistics.median(run_once(["-c", "pass"], work_dir)[0] for _ in range(args.repeat))
+        results = []
+        for name, argv in scenarios(work_dir).items():
+            if args.scenario and name not in args.scenario:
+                continue
+            result = measure(name, argv, work_dir, args.repeat, baseline)
+            result["budget_ms"] = round(BUDGETS_MS[name] * args.budget_scale, 1)
+            result["within_budget"] = result["import_ms"] <= result["budget_ms"]
+            results.append(result)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"Arranque del intérprete (python -c pass): {baseline * 1000:.1f} ms")
+    for r in results:
+        verdict = "ok" if r["within_budget"] else "EXCEDIDO"
+        top = ", ".join(f"{t['module']} {t['ms']:.0f}" for t in r["top_imports"])
+        print(f"{r['scenario']:>12}: importaciones {r['import_ms']:.1f} ms (presupuesto {r['budget_ms']:.0f} ms, {verdict}) "
+              f"[{top}], arranque +{r['startup_ms']:.1f} ms")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"baseline_ms": round(baseline * 1000, 1), "results": results}, f, indent=2)
+    if not all(r["within_budget"] for r in results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
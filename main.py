@@ -22,6 +22,11 @@ def main():
         action="store_true", 
         help="Ejecutar interfaz de línea de comandos"
     )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Ejecutar el servidor de trabajos con API HTTP local\n(admite también --host, --port y las opciones de la CLI)"
+    )
     
     # Si no se especifica argumento, mostrar opciones
     if len(sys.argv) == 1:
@@ -39,8 +44,12 @@ def main():
         else:
             print("Opción no válida. Ejecutando CLI por defecto.")
             run_cli()
+    elif "--serve" in sys.argv[1:]:
+        # Las opciones del servidor las interpreta su propio analizador.
+        run_server(sys.argv[1:])
     else:
-        args = parser.parse_args()
+        # Las opciones de la CLI (-t, -v...) las interpreta audiolibro_creator.
+        args, _ = parser.parse_known_args()
         
         if args.gui:
             run_gui()
@@ -69,6 +78,8 @@ def run_cli():
     try:
         from audiolibro_creator import main as cli_main
         import asyncio
+        if "--cli" in sys.argv:
+            sys.argv.remove("--cli")
         asyncio.run(cli_main())
     except ImportError as e:
         print(f"Error al importar el script CLI: {e}")
@@ -77,5 +88,18 @@ def run_cli():
         print(f"Error al ejecutar la interfaz CLI: {e}")
         sys.exit(1)
 
+def run_server(argv):
+    """Ejecutar el servidor de trabajos"""
+    try:
+        from audiolibro_server import serve
+        import asyncio
+        asyncio.run(serve(argv))
+    except ImportError as e:
+        print(f"Error al importar el servidor: {e}")
+        print("Asegúrate de que aiohttp esté instalado: pip install aiohttp")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print("Servidor detenido. Los libros en curso se pueden reanudar enviándolos de nuevo con el mismo nombre.")
+
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Regenera expected.json con los fragmentos de la implementación original de la fragmentación.
+
+Toma `chunk_text_smart` y `chunk_text_legacy` de `audiolibro_creator.py` en la revisión indicada
+(por defecto el commit inicial del repositorio, antes del motor de una sola pasada) y fragmenta
+cada texto de este directorio con varios tamaños de fragmento. Aquellas funciones usaban la
+constante global CHUNK_MAX_SIZE, así que se cambia en su espacio de nombres para cada tamaño.
+Solo hace falta volver a ejecutarlo si se añaden textos o tamaños.
+
+    python tests/data/chunking/generate.py [REVISIÓN]
+"""
+
+import ast
+import glob
+import json
+import os
+import re
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SIZES = (80, 300, 1000, 2500)
+STRATEGIES = ("smart", "legacy")
+
+def baseline_chunkers(revision: str) -> dict:
+    source = subprocess.run(["git", "show", f"{revision}:audiolibro_creator.py"], cwd=HERE,
+                            capture_output=True, text=True, check=True).stdout
+    tree = ast.parse(source)
+    functions = [node for node in tree.body if isinstance(node, ast.FunctionDef)
+                 and node.name in ("chunk_text_smart", "chunk_text_legacy")]
+    namespace = {"re": re}
+    exec(compile(ast.Module(body=functions, type_ignores=[]), "baseline", "exec"), namespace)
+    return namespace
+
+def main():
+    if len(sys.argv) > 1:
+        revision = sys.argv[1]
+    else:
+        revision = subprocess.run(["git", "rev-list", "--max-parents=0", "HEAD"], cwd=HERE,
+                                  capture_output=True, text=True, check=True).stdout.split()[0]
+    namespace = baseline_chunkers(revision)
+    expected = {}
+    for path in sorted(glob.glob(os.path.join(HERE, "*.txt"))):
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+        for size in SIZES:
+            namespace["CHUNK_MAX_SIZE"] = size
+            for strategy in STRATEGIES:
+                key = f"{os.path.basename(path)}:{strategy}:{size}"
+                expected[key] = namespace[f"chunk_text_{strategy}"](text)
+    with open(os.path.join(HERE, "expected.json"), "w", encoding="utf-8") as f:
+        json.dump({"revision": revision, "chunks": expected}, f, ensure_ascii=False, indent=1)
+        f.write("\n")
+    print(f"{len(expected)} casos desde {revision[:12]}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+
+from audiolibro_batch import collect_text_files, output_collisions, process_batch
+
+
+def write(path, text="Hola."):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+    return path
+
+
+def test_same_basename_in_different_directories_collides(tmp_path):
+    write(tmp_path / "dirA" / "libro.txt")
+    write(tmp_path / "dirB" / "libro.txt")
+    write(tmp_path / "dirB" / "otro.txt")
+    text_files = collect_text_files([str(tmp_path / "dirA"), str(tmp_path / "dirB")])
+
+    assert len(text_files) == 3
+    collisions = output_collisions(text_files)
+    assert [[f.split("dir")[-1] for f in group] for group in collisions] == [["A/libro.txt", "B/libro.txt"]]
+
+
+def test_collision_ignores_case(tmp_path):
+    a = write(tmp_path / "a" / "Libro.txt")
+    b = write(tmp_path / "b" / "libro.txt")
+    assert output_collisions([str(a), str(b)]) == [[str(a), str(b)]]
+
+
+def test_distinct_names_do_not_collide(tmp_path):
+    a = write(tmp_path / "a" / "uno.txt")
+    b = write(tmp_path / "a" / "dos.txt")
+    assert output_collisions(collect_text_files([str(tmp_path / "a")])) == []
+    # El mismo archivo indicado dos veces no es una colisión: se ignora el duplicado.
+    assert output_collisions(collect_text_files([str(a), str(a), str(b)])) == []
+
+
+def test_process_batch_fails_before_starting_any_book(tmp_path):
+    a = write(tmp_path / "dirA" / "libro.txt")
+    b = write(tmp_path / "dirB" / "libro.txt")
+    # Sin motor de síntesis: si llegara a empezar un libro, fallaría con otro error.
+    with pytest.raises(ValueError, match="mismo archivo de salida"):
+        asyncio.run(process_batch([str(a), str(b)], "voz", 1, "+0%", "smart", backend=None))
@@ -0,0 +1,43 @@
+"""Los fragmentos del motor de una sola pasada deben ser idénticos a los de la implementación original.
+
+Los resultados esperados están en tests/data/chunking/expected.json y salen de las funciones
+originales (ver tests/data/chunking/generate.py).
+"""
+
+import json
+import os
+
+import pytest
+
+from audiolibro_creator import iter_chunks, iter_paragraphs, plan_chunks
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "chunking")
+
+with open(os.path.join(DATA_DIR, "expected.json"), encoding="utf-8") as f:
+    EXPECTED = json.load(f)["chunks"]
+
+
+def read_text(name: str) -> str:
+    with open(os.path.join(DATA_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("case", sorted(EXPECTED))
+def test_plan_chunks_matches_baseline(case):
+    name, strategy, size = case.split(":")
+    assert plan_chunks(read_text(name), strategy, int(size)) == EXPECTED[case]
+
+
+@pytest.mark.parametrize("case", sorted(EXPECTED))
+def test_streaming_chunks_match_baseline(case):
+    # Con --streaming el texto se lee por líneas y no pasa por plan_chunks.
+    name, strategy, size = case.split(":")
+    with open(os.path.join(DATA_DIR, name), encoding="utf-8") as f:
+        assert list(iter_chunks(iter_paragraphs(f), strategy, int(size))) == EXPECTED[case]
+
+
+def test_corpus_covers_both_strategies_and_several_sizes():
+    strategies = {case.split(":")[1] for case in EXPECTED}
+    sizes = {case.split(":")[2] for case in EXPECTED}
+    assert strategies == {"smart", "legacy"}
+    assert len(sizes) >= 3
@@ -0,0 +1,25 @@
+from audiolibro_dedup import DedupPlanner, normalize_segment
+
+
+def test_spaces_and_tabs_are_collapsed():
+    assert normalize_segment("Hola,   mundo.\tAdiós ") == normalize_segment("Hola, mundo. Adiós")
+    assert normalize_segment("Hola  \nmundo") == normalize_segment("Hola\n\tmundo")
+
+
+def test_unicode_forms_match():
+    assert normalize_segment("cancio\u0301n") == normalize_segment("canci\u00f3n")
+
+
+def test_newlines_are_kept():
+    assert normalize_segment("Fin del capítulo.\n\nOtro párrafo.") != normalize_segment("Fin del capítulo. Otro párrafo.")
+    assert normalize_segment("Una línea\npartida") != normalize_segment("Una línea partida")
+    assert normalize_segment("Texto.\n\n") != normalize_segment("Texto.")
+    assert normalize_segment("Uno.\r\n\r\nDos.") == normalize_segment("Uno.\n\nDos.")
+
+
+def test_planner_does_not_reuse_audio_across_a_paragraph_break():
+    planner = DedupPlanner()
+    assert planner.original(0, "Capítulo uno.\n\nEra de noche.") is None
+    assert planner.original(1, "Capítulo uno. Era de noche.") is None
+    assert planner.original(2, "Capítulo  uno.\n\nEra\tde noche.") == 0
+    assert planner.requests_saved == 1
@@ -0,0 +1,41 @@
+import asyncio
+import importlib
+import sys
+
+import pytest
+
+pytest.importorskip("edge_tts")
+
+import audiolibro_edge
+from audiolibro_backends import EdgeTTSBackend
+
+
+@pytest.fixture
+def edge_without_internals(monkeypatch):
+    # Una versión de edge-tts sin alguna de las partes internas que usan las conexiones reutilizables.
+    monkeypatch.setitem(sys.modules, "edge_tts.drm", None)
+    yield importlib.reload(audiolibro_edge)
+    monkeypatch.undo()
+    importlib.reload(audiolibro_edge)
+
+
+def test_installed_edge_tts_supports_pooling():
+    assert audiolibro_edge.POOL_SUPPORTED
+
+
+def test_missing_internals_disable_pooling(edge_without_internals):
+    assert not edge_without_internals.POOL_SUPPORTED
+
+    backend = EdgeTTSBackend()
+    asyncio.run(backend.open(4))
+    # Sin conjunto de conexiones, synthesize usa edge_tts.Communicate.
+    assert not backend.pooled
+    assert backend.connection_stats() == {}
+    asyncio.run(backend.close())
+
+
+def test_pooling_is_used_when_supported():
+    backend = EdgeTTSBackend()
+    asyncio.run(backend.open(4))
+    assert backend.pooled and backend._connections is not None
+    asyncio.run(backend.close())
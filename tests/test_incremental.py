@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+from audiolibro_backends import OfflineBackend
+from audiolibro_creator import DEFAULT_VOICE, process_audiobook_creation
+
+LONG_SENTENCE = "Una frase " + "muy larga " * 60 + "que termina aquí."
+PARAGRAPHS = [f"Párrafo {n}. " + "El camino hacia la casa era largo y silencioso. " * (n % 7 + 1) for n in range(40)]
+# Incluye un fragmento vacío (primera frase más larga que el fragmento) y párrafos repetidos.
+TEXT = "\n\n".join([LONG_SENTENCE + " Y otra corta."] + PARAGRAPHS + PARAGRAPHS[:5])
+CHUNK_SIZE = 500
+
+
+@pytest.fixture
+def text_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # Los directorios temporales de trabajo se crean en el directorio actual
+    path = tmp_path / "libro.txt"
+    path.write_text(TEXT, encoding="utf-8")
+    return str(path)
+
+
+def create(text_file, output_file, incremental, **backend_options):
+    async def run():
+        backend = OfflineBackend(latency=0, **backend_options)
+        await backend.open(4)
+        try:
+            await process_audiobook_creation(text_file, output_file, DEFAULT_VOICE, 1, "+0%", "smart", concurrency=4,
+                                             incremental=incremental, backend=backend, chunk_size=CHUNK_SIZE,
+                                             concat_engine="native")
+        finally:
+            await backend.close()
+    asyncio.run(run())
+    with open(output_file, "rb") as f:
+        return f.read()
+
+
+def test_incremental_output_matches_one_shot(tmp_path, text_file):
+    one_shot = create(text_file, str(tmp_path / "completo.mp3"), incremental=False)
+    incremental = create(text_file, str(tmp_path / "incremental.mp3"), incremental=True)
+    assert incremental == one_shot
+    # Empieza con la trama Info del archivo completo (MPEG-2 mono: la etiqueta va tras 4 + 9 bytes).
+    assert incremental[13:17] == b"Info"
+
+
+def test_resumed_incremental_output_matches_one_shot(tmp_path, text_file):
+    one_shot = create(text_file, str(tmp_path / "completo.mp3"), incremental=False)
+    output_file = str(tmp_path / "incremental.mp3")
+    with pytest.raises(SystemExit):
+        create(text_file, output_file, incremental=True, failure_rate=0.2, seed=3)
+    assert (tmp_path / "incremental.mp3.part").stat().st_size > 0
+    assert create(text_file, output_file, incremental=True) == one_shot
@@ -0,0 +1,102 @@
+import os
+
+import pytest
+
+import audiolibro_pack
+from audiolibro_pack import INDEX_RECORD, ChunkStore
+
+
+def key(n: int) -> bytes:
+    return bytes([n]) * 32
+
+
+@pytest.fixture
+def fsyncs(monkeypatch):
+    """Registra cada fsync con el tamaño que tenía entonces el índice vigente."""
+    calls = []
+    real_fsync = os.fsync
+
+    def spy(fd):
+        calls.append(os.fstat(fd).st_size)
+        real_fsync(fd)
+
+    monkeypatch.setattr(audiolibro_pack.os, "fsync", spy)
+    return calls
+
+
+def index_records(store: ChunkStore) -> int:
+    return os.path.getsize(store._index_path(store.generation)) // INDEX_RECORD.size
+
+
+def test_reopen_keeps_the_audio(tmp_path):
+    store = ChunkStore(str(tmp_path))
+    store.put(key(1), b"uno")
+    store.put(key(2), b"dos" * 100)
+    store.close()
+
+    store = ChunkStore(str(tmp_path))
+    assert store.read(key(1)) == b"uno" and store.read(key(2)) == b"dos" * 100
+    store.close()
+
+
+def test_index_records_are_written_after_the_pack_fsync(tmp_path, monkeypatch, fsyncs):
+    monkeypatch.setattr(audiolibro_pack, "SYNC_INTERVAL", 3600)
+    store = ChunkStore(str(tmp_path))
+    store.put(key(1), b"a" * 10)
+    store.put(key(2), b"b" * 20)
+    # Aún sin fsync: el índice no registra nada, aunque el audio ya se puede leer.
+    assert fsyncs == [] and index_records(store) == 0
+    assert store.read(key(2)) == b"b" * 20
+
+    store.sync()
+    assert fsyncs == [30]  # El paquete entero, antes de escribir los registros
+    assert index_records(store) == 2
+    store.close()
+
+
+def test_sync_interval_batches_the_fsyncs(tmp_path, monkeypatch, fsyncs):
+    clock = [0.0]
+    monkeypatch.setattr(audiolibro_pack.time, "monotonic", lambda: clock[0])
+    store = ChunkStore(str(tmp_path))
+    for n in range(10):
+        store.put(key(n), b"x")
+    assert fsyncs == []
+    clock[0] = audiolibro_pack.SYNC_INTERVAL
+    store.put(key(10), b"x")
+    assert len(fsyncs) == 1 and index_records(store) == 11
+    store.close()
+
+
+def test_unregistered_audio_is_discarded_after_a_crash(tmp_path, monkeypatch):
+    monkeypatch.setattr(audiolibro_pack, "SYNC_INTERVAL", 3600)
+    store = ChunkStore(str(tmp_path))
+    store.put(key(1), b"guardado")
+    store.sync()
+    store.put(key(2), b"pendiente")
+    # Corte antes del siguiente fsync: los archivos se cierran sin pasar por close().
+    store._pack.close()
+    store._index.close()
+
+    store = ChunkStore(str(tmp_path))
+    assert key(1) in store and key(2) not in store
+    assert os.path.getsize(store.path) == len(b"guardado")
+    store.close()
+
+
+def test_compact_syncs_the_new_generation_before_replacing(tmp_path, monkeypatch, fsyncs):
+    monkeypatch.setattr(audiolibro_pack, "COMPACT_MIN_BYTES", 1)
+    store = ChunkStore(str(tmp_path))
+    store.put(key(1), b"viejo" * 10)
+    store.put(key(2), b"nuevo")
+    del fsyncs[:]
+
+    assert store.compact([key(2)])
+    # Paquete nuevo, su índice (.part) y, en POSIX, el directorio tras el os.replace.
+    assert len(fsyncs) == (3 if os.name == "posix" else 2)
+    assert store.generation == 2 and store.read(key(2)) == b"nuevo" and key(1) not in store
+    store.close()
+
+    store = ChunkStore(str(tmp_path))
+    assert store.generation == 2 and store.read(key(2)) == b"nuevo"
+    assert sorted(os.listdir(tmp_path)) == ["chunks-0002.idx", "chunks-0002.pack"]
+    store.close()
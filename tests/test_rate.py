@@ -0,0 +1,131 @@
+import asyncio
+import heapq
+import itertools
+import random
+
+import audiolibro_rate
+from audiolibro_rate import AdaptiveLimiter
+
+def simulate(monkeypatch, jitter: float, capacity: int = 0, latency_backoff: bool = False, workers: int = 16,
+             requests: int = 3000, seed: int = 0) -> tuple:
+    """Simula `requests` peticiones contra un servicio con latencia log-normal; devuelve (limitador, límite medio).
+
+    Con `capacity`, el servicio atiende como mucho esas peticiones a la vez y las demás hacen
+    cola: la latencia crece con las peticiones en vuelo, como en un servicio saturado.
+    """
+    clock = [0.0]
+    monkeypatch.setattr(audiolibro_rate.time, "monotonic", lambda: clock[0])
+    rng = random.Random(seed)
+    limiter = AdaptiveLimiter(workers, latency_backoff=latency_backoff)
+    events = []
+    order = itertools.count()
+    launched = 0
+    limits = []
+    while True:
+        while limiter.in_flight < int(limiter.limit) and launched < requests:
+            started = limiter.acquire_now()
+            chars = rng.randint(1500, 2500)
+            latency = (0.3 + 0.0003 * chars) * rng.lognormvariate(0, jitter)
+            if capacity and limiter.in_flight > capacity:
+                latency *= limiter.in_flight / capacity
+            heapq.heappush(events, (clock[0] + latency, next(order), started, chars))
+            launched += 1
+        if not events:
+            return limiter, sum(limits) / len(limits)
+        clock[0], _, started, chars = heapq.heappop(events)
+        limiter.release(started, True, chars)
+        limits.append(limiter.limit)
+
+def test_jitter_alone_does_not_shrink_the_limit(monkeypatch):
+    for jitter in (0.3, 0.5, 0.8):
+        limiter, _ = simulate(monkeypatch, jitter)
+        assert limiter.decreases == 0, jitter
+        assert int(limiter.limit) == limiter.max_limit
+
+def test_latency_backoff_tolerates_moderate_jitter(monkeypatch):
+    for seed in range(3):
+        limiter, mean_limit = simulate(monkeypatch, 0.3, latency_backoff=True, seed=seed)
+        assert limiter.decreases <= 2, seed
+        assert mean_limit > limiter.max_limit - 1
+
+def test_latency_backoff_reacts_to_sustained_queueing(monkeypatch):
+    limiter, mean_limit = simulate(monkeypatch, 0.3, capacity=2, latency_backoff=True)
+    assert limiter.decreases > 0
+    assert mean_limit < limiter.max_limit * 0.75
+
+def test_failures_shrink_the_limit(monkeypatch):
+    monkeypatch.setattr(audiolibro_rate.time, "monotonic", lambda: 10.0)
+    limiter = AdaptiveLimiter(16)
+    limiter.limit = 8.0
+    limiter.release(limiter.acquire_now(), False, 2000)
+    assert limiter.limit == 4.0
+
+
+async def acquire_and_record(limiter, name, priority, order):
+    started = await limiter.acquire(priority)
+    order.append(name)
+    return started
+
+
+async def queue_waiters(limiter, names_and_priorities, order):
+    """Tareas que esperan turno, encoladas en el orden indicado."""
+    tasks = []
+    for name, priority in names_and_priorities:
+        tasks.append(asyncio.create_task(acquire_and_record(limiter, name, priority, order)))
+        await asyncio.sleep(0)
+    return tasks
+
+
+def test_released_slot_goes_to_the_queued_waiter_not_to_a_new_caller():
+    async def scenario():
+        limiter = AdaptiveLimiter(1)
+        started = await limiter.acquire()
+        order = []
+
+        async def high_priority():
+            started = await acquire_and_record(limiter, "alta", 0, order)
+            limiter.release(started, None, 0)
+
+        high = asyncio.create_task(high_priority())
+        await asyncio.sleep(0)
+        limiter.release(started, None, 0)
+        # Una petición menos prioritaria pide turno justo al liberarse el hueco, antes de que la
+        # que esperaba haya vuelto a ejecutarse: tiene que esperar a que esta termine.
+        await acquire_and_record(limiter, "baja", 5, order)
+        assert order == ["alta", "baja"] and limiter.in_flight == 1
+        await high
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_passes_its_granted_slot_on():
+    async def scenario():
+        limiter = AdaptiveLimiter(1)
+        started = await limiter.acquire()
+        order = []
+        first, second = await queue_waiters(limiter, [("primera", 0), ("segunda", 1)], order)
+
+        limiter.release(started, None, 0)  # El hueco ya es de "primera"...
+        first.cancel()  # ...pero se cancela antes de usarlo
+        await asyncio.gather(first, return_exceptions=True)
+        await second
+        assert order == ["segunda"] and limiter.in_flight == 1
+
+    asyncio.run(scenario())
+
+
+def test_new_caller_skips_the_queue_only_when_nobody_waits():
+    async def scenario():
+        limiter = AdaptiveLimiter(2, min_limit=2)
+        order = []
+        first = await limiter.acquire()
+        await limiter.acquire()
+        [waiting] = await queue_waiters(limiter, [("espera", 0)], order)
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        limiter.release(first, None, 0)
+        # La única espera se canceló: el hueco libre es para quien llega.
+        await asyncio.wait_for(limiter.acquire(), 1)
+        assert limiter.in_flight == 2
+
+    asyncio.run(scenario())
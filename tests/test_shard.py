@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+import audiolibro_shard
+from audiolibro_backends import OfflineBackend
+from audiolibro_creator import DEFAULT_VOICE, plan_chunks, process_audiobook_creation
+from audiolibro_manifest import ResumeManifest
+from audiolibro_shard import process_sharded_creation, run_shard_worker
+
+# La primera frase supera el tamaño de fragmento: la fragmentación emite un fragmento vacío antes de ella.
+LONG_SENTENCE = "Una frase " + "muy larga " * 60 + "que termina aquí."
+TEXT = f"{LONG_SENTENCE} Y otra corta.\n\nSegundo párrafo.\n\n{LONG_SENTENCE} Y otra más."
+CHUNK_SIZE = 500
+
+
+@pytest.fixture
+def book(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # Los directorios temporales de trabajo se crean en el directorio actual
+    monkeypatch.setattr(audiolibro_shard, "POLL_INTERVAL", 0.05)
+    text_file = tmp_path / "libro.txt"
+    text_file.write_text(TEXT, encoding="utf-8")
+    return tmp_path, str(text_file)
+
+
+def test_corpus_has_an_empty_chunk():
+    assert "" in plan_chunks(TEXT, "smart", CHUNK_SIZE)
+
+
+def test_silent_chunk_is_claimed_on_resume(tmp_path):
+    manifest = ResumeManifest(str(tmp_path))
+    manifest.record(0, "", DEFAULT_VOICE, "+0%")
+    manifest.save()
+    manifest.close()
+
+    manifest = ResumeManifest(str(tmp_path))
+    assert manifest.claim(0, "", DEFAULT_VOICE, "+0%")
+    assert manifest.size(0) == 0
+    # Otro texto en la misma posición sí tiene que generarse.
+    assert not ResumeManifest(str(tmp_path)).claim(0, "Hola.", DEFAULT_VOICE, "+0%")
+    manifest.close()
+
+
+def test_sharded_book_with_an_over_long_first_sentence(book):
+    directory, text_file = book
+
+    async def scenario():
+        backend = OfflineBackend(latency=0)
+        await backend.open(2)
+        try:
+            sharded = str(directory / "repartido.mp3")
+            coordinator = asyncio.ensure_future(process_sharded_creation(
+                text_file, sharded, DEFAULT_VOICE, "+0%", "smart", str(directory / "reparto"),
+                chunk_size=CHUNK_SIZE, concat_engine="native",
+            ))
+            await run_shard_worker(str(directory / "reparto"), backend, concurrency=2, worker_id="w1")
+            await asyncio.wait_for(coordinator, 30)
+
+            direct = str(directory / "directo.mp3")
+            await process_audiobook_creation(text_file, direct, DEFAULT_VOICE, 1, "+0%", "smart",
+                                             backend=backend, chunk_size=CHUNK_SIZE, concat_engine="native")
+            return sharded, direct
+        finally:
+            await backend.close()
+
+    sharded, direct = asyncio.run(scenario())
+    with open(sharded, "rb") as a, open(direct, "rb") as b:
+        assert a.read() == b.read()